@@ -0,0 +1,96 @@
+"""Fixtures for the CPU hot-path microbenchmarks.
+
+Run from backend/:
+
+    # compare against the committed reference run; fails if any median regresses >15%
+    python -m pytest benchmarks --benchmark-only --benchmark-storage=file://benchmarks/baselines \
+        --benchmark-compare=0001_reference --benchmark-compare-fail=median:15%
+    # re-record the reference after an intended change (delete the old file first)
+    python -m pytest benchmarks --benchmark-only --benchmark-storage=file://benchmarks/baselines \
+        --benchmark-save=reference
+
+The reference in benchmarks/baselines/ was recorded on one machine; timings
+only compare on similar hardware, so record a local baseline the same way
+(into the default backend/.benchmarks/) when working elsewhere.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+
+# Fixed fixture data so runs are comparable
+CUSTOMER_ID = "6f1c0a52-3a1e-4a53-9a0e-2f6a7d1f0c11"
+VEHICLE_ID = "0b8e4c3f-5d4a-4d27-8f5e-1c2b3a4d5e6f"
+
+
+@pytest.fixture
+def customer_payload():
+    return {
+        "full_name": "Arjun Sharma",
+        "phone_number": "+91-9876543210",
+        "whatsapp_number": "+91-9876543210",
+        "email": "arjun.sharma@example.com",
+        "address": "221, Indiranagar, Bengaluru",
+        "gst_number": "29ABCDE1234F1Z5",
+    }
+
+
+@pytest.fixture
+def vehicle_payload():
+    return {
+        "customer_id": CUSTOMER_ID,
+        "make": "Volkswagen",
+        "model": "Polo",
+        "variant": "GT TSI",
+        "engine_code": "CZCA",
+        "ecu_type": "Bosch MED17.5.25",
+        "vin": "MA3EWDE1S00123456",
+        "registration_number": "KA01AB1234",
+        "year": 2019,
+        "fuel_type": "Petrol",
+        "gearbox": "DSG",
+        "odometer_at_last_visit": 48200,
+    }
+
+
+@pytest.fixture
+def job_payload():
+    return {
+        "vehicle_id": VEHICLE_ID,
+        "customer_id": CUSTOMER_ID,
+        "date": "2025-11-14",
+        "technician_name": "Farhan",
+        "work_performed": "Stage 1 remap with custom boost table",
+        "tune_stage": "Stage 1",
+        "mods_installed": "Downpipe, Intake",
+        "dyno_results": "178 hp / 286 Nm",
+        "before_ecu_map_version": "v1.0",
+        "after_ecu_map_version": "v1.3",
+        "calibration_notes": "Reduced timing in 5-6k band on 91 RON",
+        "road_test_notes": "No knock, AFR stable",
+        "odometer_at_visit": 48200,
+    }
+
+
+@pytest.fixture
+def job_documents(job_payload):
+    """A 100-row page of stored job documents, as the jobs list endpoint returns them."""
+    from models.job import Job
+
+    return [Job(**job_payload).model_dump() for _ in range(100)]
+
+
+@pytest.fixture
+def vehicle_documents(vehicle_payload):
+    """A 100-row page of stored vehicle documents, QR data URI included."""
+    from models.vehicle import Vehicle
+    from utils.qr import render_qr_data_uri
+
+    qr_code = render_qr_data_uri(f"http://localhost:3000/vehicles/{VEHICLE_ID}")
+    return [Vehicle(**vehicle_payload, qr_code=qr_code).model_dump() for _ in range(100)]
@@ -0,0 +1,82 @@
+"""Microbenchmarks for the per-request CPU work in the API."""
+
+import json
+from typing import List
+
+import pytest
+from pydantic import TypeAdapter
+
+from models.customer import Customer, CustomerCreate
+from models.job import Job, JobCreate
+from models.vehicle import Vehicle, VehicleCreate
+from utils.auth import create_access_token, get_password_hash, verify_password, SECRET_KEY, ALGORITHM
+from utils.qr import render_qr_data_uri
+from jose import jwt
+
+
+# ==================== PYDANTIC MODELS ====================
+
+def test_job_create_and_dump(benchmark, job_payload):
+    # Mirrors create_job: validate the request body, build the stored model, dump it
+    def run():
+        return Job(**JobCreate(**job_payload).model_dump()).model_dump()
+
+    benchmark(run)
+
+
+def test_vehicle_create_and_dump(benchmark, vehicle_payload):
+    def run():
+        return Vehicle(**VehicleCreate(**vehicle_payload).model_dump()).model_dump()
+
+    benchmark(run)
+
+
+def test_customer_create_and_dump(benchmark, customer_payload):
+    def run():
+        return Customer(**CustomerCreate(**customer_payload).model_dump()).model_dump()
+
+    benchmark(run)
+
+
+def test_model_default_factories(benchmark, job_payload):
+    # uuid4 plus two datetime.now() calls per stored model
+    payload = JobCreate(**job_payload).model_dump()
+    benchmark(Job, **payload)
+
+
+# ==================== AUTH ====================
+
+def test_jwt_encode(benchmark):
+    benchmark(create_access_token, {"sub": "admin"})
+
+
+def test_jwt_decode(benchmark):
+    token = create_access_token({"sub": "admin"})
+    benchmark(jwt.decode, token, SECRET_KEY, algorithms=[ALGORITHM])
+
+
+def test_bcrypt_verify(benchmark):
+    hashed = get_password_hash("IgnLabDyN@2025")
+    # bcrypt is deliberately slow; a few rounds are enough for a stable median
+    result = benchmark.pedantic(verify_password, args=("IgnLabDyN@2025", hashed), rounds=5, iterations=1)
+    assert result
+
+
+# ==================== QR CODES ====================
+
+def test_vehicle_qr_render(benchmark):
+    benchmark(render_qr_data_uri, "http://localhost:3000/vehicles/0b8e4c3f-5d4a-4d27-8f5e-1c2b3a4d5e6f")
+
+
+# ==================== LIST SERIALIZATION ====================
+
+@pytest.mark.parametrize("model, documents", [(Job, "job_documents"), (Vehicle, "vehicle_documents")])
+def test_list_response_serialization(benchmark, request, model, documents):
+    # What FastAPI does for response_model=List[...]: validate, dump to JSON-able, encode
+    adapter = TypeAdapter(List[model])
+    rows = request.getfixturevalue(documents)
+
+    def run():
+        return json.dumps(adapter.dump_python(adapter.validate_python(rows), mode="json")).encode()
+
+    benchmark(run)
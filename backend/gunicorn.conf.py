@@ -0,0 +1,17 @@
+# Multi-worker serving: gunicorn -c gunicorn.conf.py server:app
+#
+# The app is imported once in the master and forked into the workers. The
+# Motor client does not connect until first use, so each worker opens its own
+# connection pool; startup tasks are idempotent, singleton jobs run on the
+# worker holding the Mongo lease, and caches are kept coherent through the
+# invalidation channel (see utils/cluster.py).
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:8001')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'uvicorn.workers.UvicornWorker'
+preload_app = True
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Convert date fields stored as ISO strings to native BSON dates.
+
+Walks each collection in _id order, converting `created_at`, `updated_at`,
+`Job.date`, `Reminder.reminder_date` and `Appointment.appointment_date` in
+batches while the server keeps running. A document is only rewritten if
+the strings are unchanged since the batch read them, so writes made by the
+server in the meantime are never overwritten. Progress is checkpointed in
+the `migrations` collection, so an interrupted run resumes where it
+stopped:
+
+    python migrate_dates.py
+    python migrate_dates.py --batch-size 500 --pause-ms 50
+    python migrate_dates.py --restart
+
+Until a collection is done, date range filters miss its documents that
+still hold strings. Analytics buckets are rebuilt from scratch at the end.
+
+Uses MONGO_URL and DB_NAME from backend/.env like the server.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from utils.analytics import DailyBuckets
+from utils.dates import to_datetime
+from utils.migrations import convert_string_fields
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+MIGRATION_ID = "native_dates"
+DATE_FIELDS = {
+    "users": ("created_at",),
+    "customers": ("created_at", "updated_at"),
+    "vehicles": ("created_at", "updated_at"),
+    "jobs": ("date", "created_at", "updated_at"),
+    "tune_revisions": ("created_at",),
+    "billing": ("created_at", "updated_at"),
+    "reminders": ("reminder_date", "created_at", "updated_at"),
+    "appointments": ("appointment_date", "created_at", "updated_at"),
+}
+
+
+async def migrate(args):
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True, uuidRepresentation="standard")
+    db = client[os.environ['DB_NAME']]
+
+    if args.restart:
+        await db.migrations.delete_one({"_id": MIGRATION_ID})
+
+    started = time.monotonic()
+    for collection, fields in DATE_FIELDS.items():
+        counts = await convert_string_fields(
+            db, MIGRATION_ID, collection, fields, to_datetime, args.batch_size, args.pause_ms / 1000
+        )
+        print(f"  {collection:<16}{counts['converted']:>10} converted{counts['skipped']:>8} changed meanwhile"
+              f"{counts['invalid']:>8} unparseable")
+
+    # Buckets built while documents still held strings may be missing them
+    await DailyBuckets().reset(db)
+    await db.migrations.update_one(
+        {"_id": MIGRATION_ID}, {"$set": {"completed_in_seconds": round(time.monotonic() - started, 1)}}, upsert=True
+    )
+    print(f"Done in {time.monotonic() - started:.1f}s")
+    client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--pause-ms", type=int, default=0, help="sleep between batches to limit load on a live database")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and scan every collection again")
+    asyncio.run(migrate(parser.parse_args()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
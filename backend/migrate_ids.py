@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Convert ids stored as 36-character strings to BSON binary UUIDs.
+
+Rewrites every `id` and foreign key (`customer_id`, `vehicle_id`,
+`job_id`, slot `appointment_id`, change log `id`) as a 16-byte binary UUID,
+in batches and checkpointed in the `migrations` collection like
+migrate_dates.py, so an interrupted run resumes where it stopped:
+
+    python migrate_ids.py
+    python migrate_ids.py --batch-size 500 --pause-ms 50
+    python migrate_ids.py --restart
+
+The server looks ids up in binary form only, so it refuses to start until
+this has finished. Deploy, run it with the server stopped (ideally while
+the workshop is closed), then start the server.
+
+Uses MONGO_URL and DB_NAME from backend/.env like the server.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from utils.ids import BINARY_IDS_MIGRATION, ID_FIELDS, to_uuid
+from utils.migrations import convert_string_fields
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+MIGRATION_ID = BINARY_IDS_MIGRATION
+
+
+async def migrate(args):
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True, uuidRepresentation="standard")
+    db = client[os.environ['DB_NAME']]
+
+    if args.restart:
+        await db.migrations.delete_one({"_id": MIGRATION_ID})
+
+    started = time.monotonic()
+    for collection, fields in ID_FIELDS.items():
+        counts = await convert_string_fields(
+            db, MIGRATION_ID, collection, fields, to_uuid, args.batch_size, args.pause_ms / 1000
+        )
+        print(f"  {collection:<18}{counts['converted']:>10} converted{counts['skipped']:>8} changed meanwhile"
+              f"{counts['invalid']:>8} not UUIDs{counts['conflicts']:>8} duplicates")
+
+    # A document written since the deploy already has a change entry under
+    # its binary id, which supersedes the legacy one the unique index kept
+    result = await db.changes.delete_many({"id": {"$type": "string"}})
+    if result.deleted_count:
+        print(f"  removed {result.deleted_count} superseded change log entries")
+
+    await db.migrations.update_one(
+        {"_id": MIGRATION_ID}, {"$set": {"completed_in_seconds": round(time.monotonic() - started, 1)}}, upsert=True
+    )
+    print(f"Done in {time.monotonic() - started:.1f}s")
+    client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--pause-ms", type=int, default=0, help="sleep between batches to limit load on a live database")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and scan every collection again")
+    asyncio.run(migrate(parser.parse_args()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,29 +1,57 @@
 from pydantic import BaseModel, Field, ConfigDict
 from typing import Optional
-import uuid
 from datetime import datetime, timezone
+from utils.dates import DateValue, Timestamp
+from utils.ids import EntityId, new_id
+from utils.scheduling import MIN_DURATION_MINUTES
+from models.customer import CustomerSummary
+from models.vehicle import VehicleSummary
 
 class Appointment(BaseModel):
     model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    customer_id: str
-    vehicle_id: str
-    appointment_date: str
+    id: EntityId = Field(default_factory=new_id)
+    customer_id: EntityId
+    vehicle_id: EntityId
+    appointment_date: DateValue
     appointment_time: str
     service_type: str
+    bay: Optional[str] = None
+    technician_name: Optional[str] = None
+    duration_minutes: Optional[int] = Field(None, ge=MIN_DURATION_MINUTES)
     notes: Optional[str] = None
     status: str = "scheduled"  # scheduled, confirmed, completed, cancelled
-    created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
-    updated_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    created_at: Timestamp = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: Timestamp = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class AppointmentCreate(BaseModel):
-    customer_id: str
-    vehicle_id: str
-    appointment_date: str
+    customer_id: EntityId
+    vehicle_id: EntityId
+    appointment_date: DateValue
     appointment_time: str
     service_type: str
+    bay: Optional[str] = None  # assigned automatically when omitted
+    technician_name: Optional[str] = None
+    duration_minutes: Optional[int] = Field(None, ge=MIN_DURATION_MINUTES)  # defaults from service_type
     notes: Optional[str] = None
     status: str = "scheduled"
 
 class StatusUpdate(BaseModel):
     status: str
+
+class AvailabilitySlot(BaseModel):
+    date: str
+    bay: str
+    start_time: str
+    end_time: str
+
+class CalendarEntry(BaseModel):
+    id: EntityId
+    appointment_date: DateValue
+    appointment_time: str
+    service_type: str
+    status: str
+    customer_name: Optional[str] = None
+
+class AppointmentExpanded(Appointment):
+    customer: Optional[CustomerSummary] = None
+    vehicle: Optional[VehicleSummary] = None
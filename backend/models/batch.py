@@ -0,0 +1,18 @@
+from pydantic import BaseModel, Field
+from typing import Any, List, Literal, Optional
+
+class BatchItem(BaseModel):
+    id: Optional[str] = None  # echoed back so callers can match results
+    method: Literal["GET"] = "GET"
+    path: str  # e.g. /api/vehicles?customer_id=...
+
+class BatchRequest(BaseModel):
+    requests: List[BatchItem] = Field(..., min_length=1, max_length=25)
+
+class BatchResult(BaseModel):
+    id: Optional[str] = None
+    status: int
+    body: Any = None
+
+class BatchResponse(BaseModel):
+    results: List[BatchResult]
@@ -1,12 +1,16 @@
 from pydantic import BaseModel, Field, ConfigDict
 from typing import Optional
-import uuid
 from datetime import datetime, timezone
+from utils.dates import Timestamp
+from utils.ids import EntityId, new_id
+from models.customer import CustomerSummary
+from models.vehicle import VehicleSummary
+from models.job import JobSummary
 
 class Billing(BaseModel):
     model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    job_id: str
+    id: EntityId = Field(default_factory=new_id)
+    job_id: EntityId
     quoted_amount: float
     final_billed_amount: float
     payment_method: str
@@ -15,11 +19,11 @@ class Billing(BaseModel):
     discounts: Optional[float] = None
     refunds: Optional[float] = None
     notes: Optional[str] = None
-    created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
-    updated_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    created_at: Timestamp = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: Timestamp = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class BillingCreate(BaseModel):
-    job_id: str
+    job_id: EntityId
     quoted_amount: float
     final_billed_amount: float
     payment_method: str
@@ -28,3 +32,8 @@ class BillingCreate(BaseModel):
     discounts: Optional[float] = None
     refunds: Optional[float] = None
     notes: Optional[str] = None
+
+class BillingExpanded(Billing):
+    job: Optional[JobSummary] = None
+    customer: Optional[CustomerSummary] = None
+    vehicle: Optional[VehicleSummary] = None
@@ -1,11 +1,12 @@
 from pydantic import BaseModel, Field, ConfigDict
 from typing import Optional
-import uuid
 from datetime import datetime, timezone
+from utils.dates import Timestamp
+from utils.ids import EntityId, new_id
 
 class Customer(BaseModel):
     model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: EntityId = Field(default_factory=new_id)
     full_name: str
     phone_number: str
     whatsapp_number: Optional[str] = None
@@ -16,8 +17,8 @@ class Customer(BaseModel):
     id_proof_reference: Optional[str] = None
     consent_docs_reference: Optional[str] = None
     notes: Optional[str] = None
-    created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
-    updated_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    created_at: Timestamp = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: Timestamp = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class CustomerCreate(BaseModel):
     full_name: str
@@ -28,3 +29,9 @@ class CustomerCreate(BaseModel):
     address: Optional[str] = None
     gst_number: Optional[str] = None
     notes: Optional[str] = None
+
+class CustomerSummary(BaseModel):
+    """Slim customer embedded by ?expand=customer."""
+    id: EntityId
+    full_name: str
+    phone_number: Optional[str] = None
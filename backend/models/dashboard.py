@@ -1,5 +1,6 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
+from models.job import Job
 
 class DashboardStats(BaseModel):
     jobs_this_week: int
@@ -10,4 +11,23 @@ class DashboardStats(BaseModel):
     weekly_income: float
     monthly_income: float
     all_time_income: float
-    recent_jobs: List[dict]
+    recent_jobs: List[Job]
+
+class AnalyticsRow(BaseModel):
+    key: str
+    jobs: float
+    invoices: float
+    billed: float
+    paid: float
+    outstanding: float
+    discounts: float
+    refunds: float
+
+class AnalyticsReport(BaseModel):
+    from_date: str
+    to_date: str
+    group_by: str
+    # Last day the buckets have been built for; None until the first build
+    built_through: Optional[str] = None
+    totals: dict
+    rows: List[AnalyticsRow]
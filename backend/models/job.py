@@ -1,14 +1,17 @@
 from pydantic import BaseModel, Field, ConfigDict
 from typing import Optional, List
-import uuid
 from datetime import datetime, timezone
+from utils.dates import DateValue, Timestamp
+from utils.ids import EntityId, new_id
+from models.customer import CustomerSummary
+from models.vehicle import VehicleSummary
 
 class Job(BaseModel):
     model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    vehicle_id: str
-    customer_id: str
-    date: str
+    id: EntityId = Field(default_factory=new_id)
+    vehicle_id: EntityId
+    customer_id: EntityId
+    date: DateValue
     technician_name: str
     work_performed: Optional[str] = None
     tune_stage: Optional[str] = None
@@ -23,13 +26,13 @@ class Job(BaseModel):
     next_recommendations: Optional[str] = None
     warranty_or_retune_status: Optional[str] = None
     odometer_at_visit: Optional[int] = None
-    created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
-    updated_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    created_at: Timestamp = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: Timestamp = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class JobCreate(BaseModel):
-    vehicle_id: str
-    customer_id: str
-    date: str
+    vehicle_id: EntityId
+    customer_id: EntityId
+    date: DateValue
     technician_name: str
     work_performed: Optional[str] = None
     tune_stage: Optional[str] = None
@@ -42,3 +45,14 @@ class JobCreate(BaseModel):
     next_recommendations: Optional[str] = None
     warranty_or_retune_status: Optional[str] = None
     odometer_at_visit: Optional[int] = None
+
+class JobSummary(BaseModel):
+    """Slim job embedded by ?expand=job."""
+    id: EntityId
+    date: Optional[DateValue] = None
+    technician_name: Optional[str] = None
+    tune_stage: Optional[str] = None
+
+class JobExpanded(Job):
+    customer: Optional[CustomerSummary] = None
+    vehicle: Optional[VehicleSummary] = None
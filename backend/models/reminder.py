@@ -1,25 +1,34 @@
 from pydantic import BaseModel, Field, ConfigDict
 from typing import Optional
-import uuid
 from datetime import datetime, timezone
+from utils.dates import DateValue, Timestamp
+from utils.ids import EntityId, new_id
+from models.customer import CustomerSummary
+from models.vehicle import VehicleSummary
+from models.job import JobSummary
 
 class Reminder(BaseModel):
     model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    vehicle_id: str
-    customer_id: str
-    job_id: Optional[str] = None
+    id: EntityId = Field(default_factory=new_id)
+    vehicle_id: EntityId
+    customer_id: EntityId
+    job_id: Optional[EntityId] = None
     reminder_type: str  # follow_up, service, retune
-    reminder_date: str
+    reminder_date: DateValue
     message: str
     status: str = "pending"  # pending, completed, cancelled
-    created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
-    updated_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    created_at: Timestamp = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: Timestamp = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class ReminderCreate(BaseModel):
-    vehicle_id: str
-    customer_id: str
-    job_id: Optional[str] = None
+    vehicle_id: EntityId
+    customer_id: EntityId
+    job_id: Optional[EntityId] = None
     reminder_type: str
-    reminder_date: str
+    reminder_date: DateValue
     message: str
+
+class ReminderExpanded(Reminder):
+    job: Optional[JobSummary] = None
+    customer: Optional[CustomerSummary] = None
+    vehicle: Optional[VehicleSummary] = None
@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+from typing import Dict, List
+from utils.ids import EntityId
+
+class SyncResponse(BaseModel):
+    token: int  # pass back as ?since= for the next page or the next sync
+    has_more: bool
+    changes: Dict[str, List[dict]]  # collection -> created or updated documents
+    deleted: Dict[str, List[EntityId]]  # collection -> ids of deleted documents
@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from typing import Any, Literal, Optional
+from utils.dates import Timestamp
+from utils.ids import EntityId
+
+class TaskStatus(BaseModel):
+    id: EntityId
+    name: str
+    status: Literal["queued", "running", "done", "failed"]
+    priority: int
+    attempts: int  # includes the one running now
+    max_attempts: int
+    error: Optional[str] = None  # last failure, kept while the task is retried
+    result: Any = None
+    created_at: Timestamp
+    started_at: Optional[Timestamp] = None
+    finished_at: Optional[Timestamp] = None
@@ -0,0 +1,22 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from models.customer import Customer
+from models.vehicle import Vehicle
+from models.job import Job
+from models.tune_revision import TuneRevision
+from models.billing import Billing
+from models.reminder import Reminder
+
+class TimelineJob(Job):
+    tune_revisions: List[TuneRevision] = []
+    billing: List[Billing] = []
+    reminders: List[Reminder] = []
+
+class VehicleTimeline(BaseModel):
+    vehicle: Vehicle
+    customer: Optional[Customer] = None
+    jobs: List[TimelineJob]  # newest first, one page
+    reminders: List[Reminder]  # not tied to a job
+    total_jobs: int
+    skip: int
+    limit: int
@@ -1,22 +1,23 @@
 from pydantic import BaseModel, Field, ConfigDict
 from typing import Optional
-import uuid
 from datetime import datetime, timezone
+from utils.dates import Timestamp
+from utils.ids import EntityId, new_id
 
 class TuneRevision(BaseModel):
     model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    job_id: str
-    vehicle_id: str
+    id: EntityId = Field(default_factory=new_id)
+    job_id: EntityId
+    vehicle_id: EntityId
     revision_label: str
     description: Optional[str] = None
     base_file_reference: Optional[str] = None
     diff_notes: Optional[str] = None
-    created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    created_at: Timestamp = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class TuneRevisionCreate(BaseModel):
-    job_id: str
-    vehicle_id: str
+    job_id: EntityId
+    vehicle_id: EntityId
     revision_label: str
     description: Optional[str] = None
     diff_notes: Optional[str] = None
@@ -0,0 +1,23 @@
+from pydantic import BaseModel, Field, ConfigDict, model_validator
+from typing import Optional
+from datetime import datetime, timezone
+from utils.dates import Timestamp
+from utils.ids import EntityId, new_id
+
+class Upload(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: EntityId = Field(default_factory=new_id)
+    filename: str
+    job_id: Optional[EntityId] = None
+    revision_id: Optional[EntityId] = None
+    created_at: Timestamp = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class UploadAttach(BaseModel):
+    job_id: Optional[EntityId] = None
+    revision_id: Optional[EntityId] = None
+
+    @model_validator(mode="after")
+    def one_owner(self):
+        if (self.job_id is None) == (self.revision_id is None):
+            raise ValueError("Give exactly one of job_id or revision_id")
+        return self
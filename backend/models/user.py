@@ -1,15 +1,16 @@
 from pydantic import BaseModel, Field, ConfigDict
 from typing import Optional
-import uuid
 from datetime import datetime, timezone
+from utils.dates import Timestamp
+from utils.ids import EntityId, new_id
 
 class User(BaseModel):
     model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: EntityId = Field(default_factory=new_id)
     username: str
     hashed_password: str
     role: str = "admin"  # admin, technician
-    created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    created_at: Timestamp = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class UserLogin(BaseModel):
     username: str
@@ -31,7 +32,7 @@ class RoleUpdate(BaseModel):
 
 class UserResponse(BaseModel):
     model_config = ConfigDict(extra="ignore")
-    id: str
+    id: EntityId
     username: str
     role: str
-    created_at: str
+    created_at: Timestamp
@@ -1,12 +1,13 @@
 from pydantic import BaseModel, Field, ConfigDict
 from typing import Optional
-import uuid
 from datetime import datetime, timezone
+from utils.dates import Timestamp
+from utils.ids import EntityId, new_id
 
 class Vehicle(BaseModel):
     model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    customer_id: str
+    id: EntityId = Field(default_factory=new_id)
+    customer_id: EntityId
     make: str
     model: str
     variant: str
@@ -20,11 +21,11 @@ class Vehicle(BaseModel):
     odometer_at_last_visit: Optional[int] = None
     notes: Optional[str] = None
     qr_code: Optional[str] = None
-    created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
-    updated_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    created_at: Timestamp = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: Timestamp = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class VehicleCreate(BaseModel):
-    customer_id: str
+    customer_id: EntityId
     make: str
     model: str
     variant: str
@@ -37,3 +38,10 @@ class VehicleCreate(BaseModel):
     gearbox: str
     odometer_at_last_visit: Optional[int] = None
     notes: Optional[str] = None
+
+class VehicleSummary(BaseModel):
+    """Slim vehicle embedded by ?expand=vehicle."""
+    id: EntityId
+    make: Optional[str] = None
+    model: Optional[str] = None
+    registration_number: Optional[str] = None
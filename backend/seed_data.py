@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""Populate the database with synthetic, referentially consistent workshop data.
+
+Generates customers -> vehicles -> jobs -> tune_revisions / billing ->
+reminders, plus appointments booked onto free bay slots, following the
+schemas in models/. Documents
+are built through the Pydantic models and written with concurrent bulk
+inserts, so 10k to 10M documents can be loaded for scale testing:
+
+    python seed_data.py --documents 100000 --drop
+    python seed_data.py --documents 5000000 --workers 16 --uploads
+
+Uses MONGO_URL and DB_NAME from backend/.env like the server.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from models.customer import Customer
+from models.vehicle import Vehicle
+from models.job import Job
+from models.tune_revision import TuneRevision
+from models.billing import Billing
+from models.reminder import Reminder
+from models.appointment import Appointment
+from models.upload import Upload
+from utils.analytics import DailyBuckets
+from utils.archive import ARCHIVED_COLLECTIONS, archive_name
+from utils.indexes import ensure_indexes
+from utils.scheduling import INACTIVE_STATUSES, IntervalIndex, SlotEngine, format_time, service_duration
+from utils.sync import ChangeLog
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+COLLECTIONS = ["customers", "vehicles", "jobs", "tune_revisions", "billing", "reminders", "appointments",
+               "appointment_slots", "uploads"]
+# Derived from the seeded collections, so --drop clears them too
+DERIVED_COLLECTIONS = ["changes", "events", *(archive_name(name) for name in ARCHIVED_COLLECTIONS)]
+
+FIRST_NAMES = ["Arjun", "Priya", "Rahul", "Sneha", "Vikram", "Ananya", "Karan", "Meera", "Rohan", "Divya",
+               "Aditya", "Kavya", "Siddharth", "Ishita", "Nikhil", "Pooja", "Varun", "Neha", "Aman", "Riya"]
+LAST_NAMES = ["Sharma", "Patel", "Reddy", "Iyer", "Nair", "Gupta", "Singh", "Menon", "Rao", "Kapoor",
+              "Joshi", "Mehta", "Shetty", "Kulkarni", "Das", "Bose", "Pillai", "Verma", "Chopra", "Malhotra"]
+# make, model, variant, engine code, ECU type, fuel
+VEHICLES = [
+    ("Volkswagen", "Polo", "GT TSI", "CZCA", "Bosch MED17.5.25", "Petrol"),
+    ("Volkswagen", "Virtus", "GT", "DKRF", "Bosch MG1CS111", "Petrol"),
+    ("Skoda", "Octavia", "RS 245", "DLBA", "Simos 18.10", "Petrol"),
+    ("BMW", "330i", "M Sport", "B48B20", "Bosch MG1CS003", "Petrol"),
+    ("BMW", "320d", "Luxury", "B47D20", "Bosch EDC17C50", "Diesel"),
+    ("Mercedes-Benz", "C300", "AMG Line", "M264", "Bosch MED17.7.7", "Petrol"),
+    ("Hyundai", "i20", "N Line", "G3LE", "Kefico CPEGP", "Petrol"),
+    ("Hyundai", "Creta", "SX", "D4FE", "Bosch EDC17C57", "Diesel"),
+    ("Mahindra", "Thar", "LX", "mHawk130", "Bosch MD1CS006", "Diesel"),
+    ("Toyota", "Fortuner", "Legender", "2GD-FTV", "Denso 89663", "Diesel"),
+    ("Ford", "EcoSport", "Titanium", "M1JA", "Bosch MED17.0.1", "Petrol"),
+    ("Kia", "Seltos", "GTX+", "G4LD", "Kefico CPEGP", "Petrol"),
+]
+TECHNICIANS = ["Arjun", "Farhan", "Deepak", "Lakshmi", "Manoj"]
+TUNE_STAGES = ["Stage 1", "Stage 1", "Stage 1", "Stage 2", "Stage 2", "Stage 3", None]
+PAYMENT_METHODS = ["upi", "upi", "card", "cash", "bank_transfer"]
+SERVICE_TYPES = ["ECU Tuning", "Stage 1 Upgrade", "Stage 2 Upgrade", "Diagnostics", "Dyno Run", "Retune", "Service"]
+
+# Expected documents generated per customer with the distributions below,
+# used to turn --documents into a customer count.
+DOCUMENTS_PER_CUSTOMER = 17
+
+
+class Seeder:
+    def __init__(self, db, rng: random.Random, years: float, batch_size: int, workers: int, uploads: bool):
+        self.db = db
+        self.rng = rng
+        self.today = datetime.now(timezone.utc).date()
+        self.history_days = int(years * 365)
+        self.batch_size = batch_size
+        self.uploads = uploads
+        self.buffers = {name: [] for name in COLLECTIONS}
+        self.counts = {name: 0 for name in COLLECTIONS}
+        self.pending = set()
+        self.semaphore = asyncio.Semaphore(workers)
+        self.upload_dir = ROOT_DIR / "uploads"
+        # The server's bays and hours; appointments are only put where one fits
+        self.slot_engine = SlotEngine(
+            bays=[b.strip() for b in os.environ.get('WORKSHOP_BAYS', 'Bay 1,Bay 2').split(',') if b.strip()],
+            opening_time=os.environ.get('WORKSHOP_OPENING_TIME', '09:00'),
+            closing_time=os.environ.get('WORKSHOP_CLOSING_TIME', '18:00'),
+            granularity=int(os.environ.get('SLOT_GRANULARITY_MINUTES', '30')),
+        )
+        self.bookings = {}
+
+    async def add(self, collection: str, model):
+        buffer = self.buffers[collection]
+        buffer.append(model if isinstance(model, dict) else model.model_dump())
+        if len(buffer) >= self.batch_size:
+            self.buffers[collection] = []
+            await self.flush(collection, buffer)
+
+    async def flush(self, collection: str, documents: list):
+        await self.semaphore.acquire()
+        task = asyncio.create_task(self._insert(collection, documents))
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+
+    async def _insert(self, collection: str, documents: list):
+        try:
+            await self.db[collection].insert_many(documents, ordered=False)
+            self.counts[collection] += len(documents)
+        finally:
+            self.semaphore.release()
+
+    async def finish(self):
+        for collection, buffer in self.buffers.items():
+            if buffer:
+                self.buffers[collection] = []
+                await self.flush(collection, buffer)
+        await asyncio.gather(*self.pending)
+
+    def timestamp(self, day: date) -> datetime:
+        return datetime.combine(day, dt_time(self.rng.randint(9, 18), self.rng.randint(0, 59)), tzinfo=timezone.utc)
+
+    def random_day(self) -> date:
+        # Skew towards recent history: the workshop has grown over time
+        offset = int(self.history_days * (1 - self.rng.random() ** 0.7))
+        return self.today - timedelta(days=offset)
+
+    async def dummy_upload(self, job: Job) -> str:
+        upload = Upload(filename="calibration.bin", job_id=job.id, created_at=job.created_at)
+        (self.upload_dir / f"{upload.id}.bin").write_bytes(os.urandom(self.rng.randint(1_000, 50_000)))
+        await self.add("uploads", upload)
+        return str(upload.id)
+
+    async def customer(self, index: int):
+        rng = self.rng
+        first_visit = self.random_day()
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        phone = f"+91-{rng.randint(7000000000, 9999999999)}"
+        customer = Customer(
+            full_name=name,
+            phone_number=phone,
+            whatsapp_number=phone if rng.random() < 0.8 else None,
+            email=f"{name.lower().replace(' ', '.')}{index}@example.com" if rng.random() < 0.7 else None,
+            instagram_handle=f"@{name.split()[0].lower()}_{index}" if rng.random() < 0.3 else None,
+            address=f"{rng.randint(1, 999)}, {rng.choice(['Indiranagar', 'Koramangala', 'Whitefield', 'HSR Layout'])}, Bengaluru",
+            gst_number=f"29ABCDE{rng.randint(1000, 9999)}F1Z{rng.randint(1, 9)}" if rng.random() < 0.15 else None,
+            created_at=self.timestamp(first_visit),
+            updated_at=self.timestamp(first_visit),
+        )
+        await self.add("customers", customer)
+
+        vehicle_count = rng.choices([1, 2, 3], [75, 20, 5])[0]
+        for _ in range(vehicle_count):
+            await self.vehicle(customer, first_visit)
+
+    async def vehicle(self, customer: Customer, first_visit: date):
+        rng = self.rng
+        make, model, variant, engine_code, ecu_type, fuel = rng.choice(VEHICLES)
+        vehicle = Vehicle(
+            customer_id=customer.id,
+            make=make, model=model, variant=variant, engine_code=engine_code, ecu_type=ecu_type,
+            vin=f"MA{rng.randint(10**14, 10**15 - 1)}",
+            registration_number=f"KA{rng.randint(1, 53):02d}{rng.choice('ABCDEFGHJKMNPRSTUVWXYZ')}"
+                                f"{rng.choice('ABCDEFGHJKMNPRSTUVWXYZ')}{rng.randint(1, 9999):04d}",
+            year=rng.randint(2012, self.today.year),
+            fuel_type=fuel,
+            gearbox=rng.choice(["Manual", "Automatic", "DSG"]),
+            created_at=self.timestamp(first_visit),
+            updated_at=self.timestamp(first_visit),
+        )
+
+        # Most vehicles come once or twice; a few regulars keep coming back
+        job_count = min(int(rng.expovariate(1 / 2.5)) + 1, 40)
+        visit_days = sorted(
+            first_visit + timedelta(days=rng.randint(0, max((self.today - first_visit).days, 0)))
+            for _ in range(job_count)
+        )
+        odometer = rng.randint(5_000, 60_000)
+        for visit_day in visit_days:
+            odometer += rng.randint(500, 15_000)
+            await self.job(vehicle, visit_day, odometer)
+        vehicle.odometer_at_last_visit = odometer
+        await self.add("vehicles", vehicle)
+
+        if rng.random() < 0.6:
+            await self.appointment(vehicle)
+
+    async def job(self, vehicle: Vehicle, day: date, odometer: int):
+        rng = self.rng
+        stage = rng.choice(TUNE_STAGES)
+        job = Job(
+            vehicle_id=vehicle.id,
+            customer_id=vehicle.customer_id,
+            date=day.isoformat(),
+            technician_name=rng.choice(TECHNICIANS),
+            work_performed=f"{stage or 'Diagnostics'} on {vehicle.engine_code}",
+            tune_stage=stage,
+            mods_installed=rng.choice([None, "Intake", "Downpipe", "Intercooler", "Downpipe, Intake"]),
+            dyno_results=f"{rng.randint(110, 400)} hp / {rng.randint(180, 650)} Nm" if stage else None,
+            before_ecu_map_version=f"v{rng.randint(1, 5)}.0",
+            after_ecu_map_version=f"v{rng.randint(1, 5)}.{rng.randint(1, 9)}",
+            warranty_or_retune_status=rng.choice([None, "warranty", "retune_due"]),
+            odometer_at_visit=odometer,
+            created_at=self.timestamp(day),
+            updated_at=self.timestamp(day),
+        )
+        if self.uploads and rng.random() < 0.1:
+            job.files_uploaded = [await self.dummy_upload(job)]
+        await self.add("jobs", job)
+
+        for revision in range(rng.choices([0, 1, 2, 3], [30, 35, 25, 10])[0]):
+            await self.add("tune_revisions", TuneRevision(
+                job_id=job.id,
+                vehicle_id=vehicle.id,
+                revision_label=f"R{revision + 1}",
+                description=rng.choice(["Timing adjustment", "Boost target raised", "Fuel trim", "Torque limiter"]),
+                created_at=self.timestamp(day),
+            ))
+
+        if rng.random() < 0.9:
+            quoted = float(rng.choice([4999, 7999, 12999, 18999, 24999, 34999, 49999]))
+            discount = float(rng.choice([500, 1000, 2000])) if rng.random() < 0.2 else None
+            refund = float(rng.randint(500, 5000)) if rng.random() < 0.02 else None
+            # Older bills are almost always settled
+            age_days = (self.today - day).days
+            status = rng.choices(["paid", "pending", "partial"], [97, 2, 1] if age_days > 60 else [70, 20, 10])[0]
+            await self.add("billing", Billing(
+                job_id=job.id,
+                quoted_amount=quoted,
+                final_billed_amount=quoted - (discount or 0) - (refund or 0),
+                payment_method=rng.choice(PAYMENT_METHODS),
+                payment_status=status,
+                gst_invoice_number=f"ILD/{day.year}/{rng.randint(1, 999999):06d}" if rng.random() < 0.6 else None,
+                discounts=discount,
+                refunds=refund,
+                created_at=self.timestamp(day),
+                updated_at=self.timestamp(day),
+            ))
+
+        if rng.random() < 0.4:
+            reminder_day = day + timedelta(days=rng.choice([30, 90, 180]))
+            await self.add("reminders", Reminder(
+                vehicle_id=vehicle.id,
+                customer_id=vehicle.customer_id,
+                job_id=job.id,
+                reminder_type=rng.choice(["follow_up", "service", "retune"]),
+                reminder_date=reminder_day.isoformat(),
+                message="Follow-up after tune",
+                status="pending" if reminder_day >= self.today else rng.choices(["completed", "cancelled"], [85, 15])[0],
+                created_at=self.timestamp(day),
+                updated_at=self.timestamp(day),
+            ))
+
+    def place(self, day: date, duration: int):
+        """A free bay and start time for `duration` minutes on `day`, or None when the day is full."""
+        engine = self.slot_engine
+        indexes = self.bookings.setdefault(day, {bay: IntervalIndex() for bay in engine.bays})
+        starts = list(range(engine.opening, engine.closing - duration + 1, engine.granularity))
+        self.rng.shuffle(starts)
+        for start in starts:
+            for bay in engine.bays:
+                if not indexes[bay].overlaps(start, start + duration):
+                    return bay, start
+        return None
+
+    async def appointment(self, vehicle: Vehicle):
+        rng = self.rng
+        day = self.today + timedelta(days=rng.randint(-self.history_days, 60))
+        upcoming = day >= self.today
+        service_type = rng.choice(SERVICE_TYPES)
+        status = rng.choice(["scheduled", "confirmed"]) if upcoming else rng.choices(["completed", "cancelled"], [90, 10])[0]
+        duration = service_duration(service_type)
+        # Booked like the server would, so no two overlap on a bay and each holds its slots
+        placed = None if status in INACTIVE_STATUSES else self.place(day, duration)
+        if placed is None:
+            status = "cancelled"
+        bay, start = placed or (None, self.slot_engine.opening)
+        appointment = Appointment(
+            customer_id=vehicle.customer_id,
+            vehicle_id=vehicle.id,
+            appointment_date=day.isoformat(),
+            appointment_time=format_time(start),
+            service_type=service_type,
+            bay=bay,
+            duration_minutes=duration,
+            status=status,
+            created_at=self.timestamp(day - timedelta(days=rng.randint(1, 30))),
+            updated_at=self.timestamp(day),
+        )
+        if placed:
+            self.bookings[day][bay].add(start, start + duration, appointment.id)
+            for slot in self.slot_engine.slot_documents(appointment.model_dump(), start, start + duration):
+                await self.add("appointment_slots", slot)
+        await self.add("appointments", appointment)
+
+
+async def seed(args):
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], uuidRepresentation="standard")
+    db = client[os.environ['DB_NAME']]
+
+    if args.drop:
+        # Files the uploads collection knows of go with it; anything else in the directory is left alone
+        upload_dir = ROOT_DIR / "uploads"
+        async for upload in db.uploads.find({}, {"_id": 0, "id": 1}):
+            for path in upload_dir.glob(f"{upload['id']}.*"):
+                path.unlink(missing_ok=True)
+        for name in COLLECTIONS + DERIVED_COLLECTIONS:
+            await db[name].drop()
+
+    customers = max(1, args.documents // DOCUMENTS_PER_CUSTOMER)
+    print(f"Seeding ~{args.documents} documents ({customers} customers) into {os.environ['DB_NAME']}...")
+    seeder = Seeder(db, random.Random(args.seed), args.years, args.batch_size, args.workers, args.uploads)
+    if args.uploads:
+        seeder.upload_dir.mkdir(exist_ok=True)
+
+    started = time.monotonic()
+    for index in range(customers):
+        await seeder.customer(index)
+        if index and index % 10_000 == 0:
+            print(f"  {index}/{customers} customers generated ({time.monotonic() - started:.0f}s)")
+    await seeder.finish()
+
+    print("Building indexes...")
+    await ensure_indexes(db)
+    # Seeded history bypasses the handlers' dirty marks, so analytics rebuild from scratch
+    await DailyBuckets().reset(db)
+    # ...and give the seeded documents their delta sync entries
+    await ChangeLog().backfill(db, force=True)
+
+    elapsed = time.monotonic() - started
+    total = sum(seeder.counts.values())
+    for name, count in seeder.counts.items():
+        print(f"  {name:<16}{count:>12}")
+    print(f"Inserted {total} documents in {elapsed:.1f}s ({total / elapsed:.0f} docs/s)")
+    client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=10_000, help="approximate total documents to generate")
+    parser.add_argument("--years", type=float, default=3, help="years of history to spread dates over")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=8, help="concurrent insert_many batches")
+    parser.add_argument("--uploads", action="store_true", help="write dummy files for ~10%% of jobs")
+    parser.add_argument("--drop", action="store_true", help="drop the seeded collections first")
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(seed(parser.parse_args()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
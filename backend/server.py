@@ -1,28 +1,35 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File, Form, Query, Request, Response
+from fastapi.security import HTTPAuthorizationCredentials
+from fastapi.responses import FileResponse, StreamingResponse, PlainTextResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from pydantic import BaseModel
 import os
 import logging
 from pathlib import Path
 from typing import List, Optional
-from datetime import datetime, timezone, timedelta
-import qrcode
-from io import BytesIO
-import base64
+from datetime import datetime, timezone, timedelta, date
+import asyncio
+import uuid
 
 # Import organized models
 from models.user import User, UserLogin, Token, UserCreate, RoleUpdate, UserResponse
 from models.customer import Customer, CustomerCreate
 from models.vehicle import Vehicle, VehicleCreate
-from models.job import Job, JobCreate
+from models.job import Job, JobCreate, JobExpanded
 from models.tune_revision import TuneRevision, TuneRevisionCreate, TuneRevisionUpdate
-from models.billing import Billing, BillingCreate
-from models.reminder import Reminder, ReminderCreate
-from models.appointment import Appointment, AppointmentCreate, StatusUpdate
-from models.dashboard import DashboardStats
+from models.billing import Billing, BillingCreate, BillingExpanded
+from models.reminder import Reminder, ReminderCreate, ReminderExpanded
+from models.appointment import Appointment, AppointmentCreate, AppointmentExpanded, StatusUpdate, AvailabilitySlot, CalendarEntry
+from models.dashboard import DashboardStats, AnalyticsReport
+from models.timeline import VehicleTimeline
+from models.batch import BatchRequest, BatchResponse
+from models.sync import SyncResponse
+from models.task import TaskStatus
+from models.upload import Upload, UploadAttach
 
 # Import auth utilities
 from utils.auth import (
@@ -30,46 +37,299 @@ from utils.auth import (
     get_password_hash, 
     create_access_token,
     security,
-    ACCESS_TOKEN_EXPIRE_MINUTES
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    EVENTS_TICKET_SCOPE,
+    EVENTS_TICKET_EXPIRE_SECONDS
+)
+from utils.scheduling import SlotEngine, SlotUnavailableError, service_duration, MIN_DURATION_MINUTES
+from utils.calendar import parse_date_range, date_range_query, ics_header, ics_event, ics_footer
+from utils.indexes import ensure_indexes
+from utils.events import (
+    EventBus,
+    job_event_data,
+    billing_event_data,
+    appointment_event_data,
+    format_sse,
+    format_resync,
+    HEARTBEAT_SECONDS,
+    RETRY_MILLISECONDS
+)
+from utils.metrics import (
+    registry as metrics_registry,
+    mongo_pool_max_size,
+    entity_cache_entries,
+    entity_cache_bytes,
+    CommandMetricsListener,
+    PoolMetricsListener,
+    MetricsMiddleware,
+    MetricsRoute,
+    pool_snapshot
+)
+from utils.database import mongo_client_options, analytics_read_preference
+from utils.health import DatabaseMonitor, CircuitBreakerMiddleware
+from utils.cluster import LeaderLease, InvalidationChannel, every
+from utils.analytics import DailyBuckets, DIMENSIONS as ANALYTICS_DIMENSIONS, TIME_GROUPS
+from utils.expand import RelationLoader, parse_expand
+from utils.batch import BatchDispatcher, batch_user
+from utils.cache import EntityCache, cache_backend
+from utils.coalesce import SingleFlight
+from utils.sync import ChangeLog, SyncTokenExpired
+from utils.archive import Archive, archive_name
+from utils.ids import IdParam, binary_ids_ready
+from utils.profiler import SlowQueryProfiler
+from utils.qr import render_qr_data_uri
+from utils.files import UploadCollector, write_file
+from utils.integrity import Integrity, DeleteRestricted
+from utils.invoices import InvoiceRenderer, invoice_filename
+from utils.tasks import TaskQueue, WorkerPool, PRIORITY_HIGH
+from utils.tracing import (
+    Tracer,
+    SpanExporter,
+    TracingMiddleware,
+    CommandTracingListener,
+    trace_span,
+    configure as configure_tracing
 )
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Request tracing (TRACE_SAMPLE_RATE=0 traces only requests the caller marks as sampled)
+tracer = Tracer(
+    sample_rate=float(os.environ.get('TRACE_SAMPLE_RATE', '0')),
+    exporter=SpanExporter(
+        path=Path(os.environ.get('TRACE_EXPORT_PATH', ROOT_DIR / 'traces' / 'spans.jsonl')),
+        otlp_endpoint=os.environ.get('TRACE_OTLP_ENDPOINT') or None,
+    ),
+)
+configure_tracing(tracer)
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+slow_query_profiler = SlowQueryProfiler(
+    threshold_ms=float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', '100')),
+    buffer_size=int(os.environ.get('SLOW_QUERY_BUFFER_SIZE', '200')),
+)
+client = AsyncIOMotorClient(
+    mongo_url,
+    event_listeners=[
+        CommandMetricsListener(),
+        PoolMetricsListener(),
+        slow_query_profiler,
+        CommandTracingListener()
+    ],
+    **mongo_client_options()
+)
 db = client[os.environ['DB_NAME']]
+# Dashboard, report and export reads go to secondaries when the deployment has them
+analytics_db = client.get_database(os.environ['DB_NAME'], read_preference=analytics_read_preference())
+
+# Appointment slot engine (workshop bays and opening hours)
+slot_engine = SlotEngine(
+    bays=[b.strip() for b in os.environ.get('WORKSHOP_BAYS', 'Bay 1,Bay 2').split(',') if b.strip()],
+    opening_time=os.environ.get('WORKSHOP_OPENING_TIME', '09:00'),
+    closing_time=os.environ.get('WORKSHOP_CLOSING_TIME', '18:00'),
+    granularity=int(os.environ.get('SLOT_GRANULARITY_MINUTES', '30')),
+)
+
+# Cached database health for probes, and the circuit breaker requests go through
+db_monitor = DatabaseMonitor(
+    interval=float(os.environ.get('DB_HEALTH_INTERVAL_SECONDS', '5')),
+    failure_threshold=int(os.environ.get('DB_CIRCUIT_FAILURE_THRESHOLD', '2')),
+)
+
+# Live change feed for dashboards and appointment boards
+event_bus = EventBus(db)
+background_tasks = []
+
+# Shared state across worker processes: one leader runs singleton jobs, and
+# per-process caches drop entries other workers invalidate
+leader_lease = LeaderLease(db)
+invalidations = InvalidationChannel(db)
+slot_engine.on_change = lambda day: invalidations.publish("slot_day", day)
+invalidations.subscribe("slot_day", slot_engine.invalidate)
+event_bus.relay = lambda: invalidations.publish("event")
+invalidations.subscribe("event", event_bus.notify)
+# Hot single documents (the scanned vehicle, its customer, the job being edited)
+entity_cache = EntityCache(
+    max_entries=int(os.environ.get('ENTITY_CACHE_MAX_ENTRIES', '5000')),
+    max_bytes=int(os.environ.get('ENTITY_CACHE_MAX_BYTES', str(64 * 1024 * 1024))),
+    ttl=float(os.environ.get('ENTITY_CACHE_TTL_SECONDS', '60')),
+    negative_ttl=float(os.environ.get('ENTITY_CACHE_NEGATIVE_TTL_SECONDS', '5')),
+    backend=cache_backend(os.environ.get('ENTITY_CACHE_URL')),
+)
+entity_cache.on_invalidate = lambda keys: invalidations.publish("entity", keys)
+invalidations.subscribe("entity", entity_cache.drop)
+# Identical concurrent reads of the shift-start endpoints share one computation
+single_flight = SingleFlight(ttl=float(os.environ.get('COALESCE_CACHE_TTL_SECONDS', '0')))
+# Daily revenue/workload buckets; reports only read them, and the leader
+# builds them on taking the lease and then keeps them current
+analytics = DailyBuckets()
+leader_lease.add_job("analytics-refresh", lambda: every(
+    float(os.environ.get('ANALYTICS_REFRESH_SECONDS', '60')), lambda: analytics.refresh(db), "Analytics refresh",
+    immediately=True,
+))
+# Change sequence behind /api/sync; tombstones are pruned daily by the leader
+change_log = ChangeLog(
+    settle_seconds=float(os.environ.get('SYNC_SETTLE_SECONDS', '2')),
+    tombstone_retention=timedelta(days=int(os.environ.get('SYNC_TOMBSTONE_RETENTION_DAYS', '30'))),
+)
+leader_lease.add_job("tombstone-pruner", lambda: every(86400, lambda: change_log.prune(db), "Tombstone prune"))
+# Documents from before the change log get their entries once, on one worker;
+# after that each run is a single lookup of the completion marker
+leader_lease.add_job(
+    "change-log-backfill",
+    lambda: every(3600, lambda: change_log.backfill(db), "Change log backfill", immediately=True)
+)
+# Closed jobs older than ARCHIVE_AFTER_DAYS (0 disables) move to the archive
+# collections daily; reads of single records and vehicle history fall through
+archive = Archive(
+    after=timedelta(days=int(os.environ.get('ARCHIVE_AFTER_DAYS', '730'))) or None,
+    batch_size=int(os.environ.get('ARCHIVE_BATCH_SIZE', '500')),
+)
+
+async def archive_history():
+    # Rebuild the moved days once the move is complete, so no build counts a record twice
+    await analytics.mark_days(db, await archive.run(db))
+
+leader_lease.add_job("archiver", lambda: every(86400, archive_history, "Archive"))
+# Heavy work (QR rendering, delete cascades) is queued in
+# Mongo. Web workers run it too unless TASK_WORKER_IN_APP is off, in which
+# case `python worker.py` processes do; TASK_EXECUTOR=process moves CPU-bound
+# steps off the GIL.
+task_queue = TaskQueue(
+    db,
+    pool=WorkerPool(
+        os.environ.get('TASK_EXECUTOR', 'thread'),
+        int(os.environ.get('TASK_EXECUTOR_WORKERS', '4')),
+    ),
+    concurrency=int(os.environ.get('TASK_CONCURRENCY', '4')),
+    lease=float(os.environ.get('TASK_LEASE_SECONDS', '60')),
+    max_attempts=int(os.environ.get('TASK_MAX_ATTEMPTS', '5')),
+)
+# Invoice PDFs render in their own process pool and are cached on disk by content.
+# Both pools are started per worker in the startup hook, never at import.
+invoice_renderer = InvoiceRenderer(
+    Path(os.environ.get('INVOICE_CACHE_DIR', ROOT_DIR / 'invoices')),
+    pool=WorkerPool('process', int(os.environ.get('INVOICE_RENDER_WORKERS', '2'))),
+    issuer={
+        "name": os.environ.get('INVOICE_ISSUER_NAME', 'IgnitionLab Dynamics'),
+        "address": [line.strip() for line in os.environ.get('INVOICE_ISSUER_ADDRESS', '').split(';') if line.strip()],
+        "gstin": os.environ.get('INVOICE_ISSUER_GSTIN', ''),
+    },
+    concurrency=int(os.environ.get('INVOICE_RENDER_CONCURRENCY', '8')),
+)
+INVOICE_BULK_MAX = int(os.environ.get('INVOICE_BULK_MAX', '1000'))
+# Deletes check references and cascade to dependent records, in a
+# transaction where the deployment supports one
+integrity = Integrity()
+leader_lease.add_job(
+    "slot-sweeper",
+    lambda: every(3600, lambda: slot_engine.sweep_orphans(db), "Orphan slot sweep")
+)
 
 # Create the main app
 app = FastAPI(title="IgnitionLab Dynamics API", version="1.0.0")
+app.router.route_class = MetricsRoute
 
 # Create API router with /api prefix
-api_router = APIRouter(prefix="/api")
+api_router = APIRouter(prefix="/api", route_class=MetricsRoute)
 
 # File upload directory
 UPLOAD_DIR = ROOT_DIR / "uploads"
 UPLOAD_DIR.mkdir(exist_ok=True)
+# Recorded uploads no job or tune revision owns or refers to are removed once
+# older than UPLOAD_GC_GRACE_DAYS (0 disables)
+upload_collector = UploadCollector(
+    UPLOAD_DIR,
+    grace=timedelta(days=float(os.environ.get('UPLOAD_GC_GRACE_DAYS', '7'))),
+    batch_size=int(os.environ.get('UPLOAD_GC_BATCH_SIZE', '500')),
+)
+if upload_collector.grace:
+    leader_lease.add_job("upload-collector", lambda: every(3600, lambda: upload_collector.run(db), "Upload GC"))
 
 # Custom dependency wrapper for get_current_user that includes db
 async def get_current_user_with_db(credentials = Depends(security)):
     """Dependency to get current user with database access."""
     from utils.auth import get_current_user
+    # Sub-requests of a batch reuse the user the batch authenticated as
+    user = batch_user.get()
+    if user is not None:
+        return user
     return await get_current_user(credentials, db=db)
 
+async def get_current_user_for_stream(request: Request, ticket: Optional[str] = None):
+    """Like get_current_user_with_db, but EventSource cannot send headers so a stream ticket query parameter is also accepted."""
+    from utils.auth import get_current_user
+    authorization = request.headers.get("Authorization", "")
+    if authorization.lower().startswith("bearer "):
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=authorization[7:])
+        return await get_current_user(credentials, db=db)
+    if not ticket:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=ticket)
+    return await get_current_user(credentials, db=db, scope=EVENTS_TICKET_SCOPE)
+
+def get_relation_loader() -> RelationLoader:
+    """Per-request loader for ?expand=, so lookups are batched and memoised within one request."""
+    return RelationLoader(db)
+
+async def expand_relations(rows: List[dict], expand: Optional[str], allowed: tuple, loader: RelationLoader) -> List[dict]:
+    try:
+        relations = parse_expand(expand, allowed)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await loader.expand(rows, relations)
+
 # ==================== INITIALIZE DEFAULT ADMIN ====================
 @app.on_event("startup")
 async def startup_event():
+    # Lookups by id only match binary ids; serving before the migration would 404 every older record
+    if not await binary_ids_ready(db):
+        raise RuntimeError("Ids are still stored as strings. Run `python migrate_ids.py`, then start the server.")
+    # Archive collections are created explicitly so they get their compression
+    await archive.ensure(db)
+    # Indexes first: the unique username index makes the admin upsert race-free
+    # when several workers start at once
+    await ensure_indexes(db)
+    
     # Create default admin user if not exists
-    admin_exists = await db.users.find_one({"username": "admin"})
-    if not admin_exists:
+    if not await db.users.find_one({"username": "admin"}, {"_id": 1}):
         admin_user = User(
             username="admin",
             hashed_password=get_password_hash("admin"),
             role="admin"
         )
-        await db.users.insert_one(admin_user.model_dump())
-        logger.info("Default admin user created")
+        try:
+            result = await db.users.update_one(
+                {"username": "admin"},
+                {"$setOnInsert": admin_user.model_dump()},
+                upsert=True
+            )
+            if result.upserted_id is not None:
+                logger.info("Default admin user created")
+        except DuplicateKeyError:
+            pass
+
+    await slot_engine.ensure_indexes(db)
+    # After the fork, so every worker has pools of its own
+    task_queue.pool.start()
+    invoice_renderer.pool.start()
+    slow_query_profiler.attach(client, asyncio.get_running_loop())
+    background_tasks.append(asyncio.create_task(tracer.exporter.run()))
+    await db_monitor.check(db)
+    background_tasks.append(asyncio.create_task(db_monitor.run(db)))
+    await invalidations.ensure()
+    background_tasks.append(asyncio.create_task(invalidations.run()))
+    await event_bus.ensure()
+    background_tasks.append(asyncio.create_task(event_bus.run()))
+    background_tasks.append(asyncio.create_task(leader_lease.run()))
+
+    if os.environ.get('TASK_WORKER_IN_APP', 'true').lower() in ('1', 'true', 'yes'):
+        background_tasks.append(asyncio.create_task(task_queue.run()))
+
+    if os.environ.get('EVENTS_CHANGE_STREAMS', '').lower() in ('1', 'true', 'yes'):
+        background_tasks.append(asyncio.create_task(event_bus.watch_change_streams(db)))
 
 # ==================== AUTH ROUTES ====================
 
@@ -115,7 +375,13 @@ async def register(user_login: UserLogin):
         hashed_password=get_password_hash(user_login.password),
         role="technician"  # Default role for new registrations
     )
-    await db.users.insert_one(new_user.model_dump())
+    try:
+        await db.users.insert_one(new_user.model_dump())
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username already exists"
+        )
     
     return {"message": "User created successfully", "username": new_user.username}
 
@@ -148,10 +414,16 @@ async def update_username(
         )
     
     # Update username
-    result = await db.users.update_one(
-        {"id": current_user["id"]},
-        {"$set": {"username": request.new_username}}
-    )
+    try:
+        result = await db.users.update_one(
+            {"id": current_user["id"]},
+            {"$set": {"username": request.new_username}}
+        )
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username already taken"
+        )
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
@@ -214,7 +486,10 @@ async def create_user(user_data: UserCreate, current_user: dict = Depends(get_cu
         hashed_password=get_password_hash(user_data.password),
         role=user_data.role
     )
-    await db.users.insert_one(new_user.model_dump())
+    try:
+        await db.users.insert_one(new_user.model_dump())
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Username already exists")
     
     # Return without password
     return UserResponse(
@@ -225,7 +500,7 @@ async def create_user(user_data: UserCreate, current_user: dict = Depends(get_cu
     )
 
 @api_router.put("/users/{user_id}/role")
-async def update_user_role(user_id: str, role_update: RoleUpdate, current_user: dict = Depends(get_current_user_with_db)):
+async def update_user_role(user_id: IdParam, role_update: RoleUpdate, current_user: dict = Depends(get_current_user_with_db)):
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
     
@@ -240,7 +515,7 @@ async def update_user_role(user_id: str, role_update: RoleUpdate, current_user:
     return {"message": "User role updated successfully"}
 
 @api_router.delete("/users/{user_id}")
-async def delete_user(user_id: str, current_user: dict = Depends(get_current_user_with_db)):
+async def delete_user(user_id: IdParam, current_user: dict = Depends(get_current_user_with_db)):
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
     
@@ -262,6 +537,7 @@ async def delete_user(user_id: str, current_user: dict = Depends(get_current_use
 async def create_customer(customer: CustomerCreate, current_user: dict = Depends(get_current_user_with_db)):
     customer_obj = Customer(**customer.model_dump())
     await db.customers.insert_one(customer_obj.model_dump())
+    await change_log.record(db, "customers", [customer_obj.id])
     return customer_obj
 
 @api_router.get("/customers", response_model=List[Customer])
@@ -270,25 +546,27 @@ async def get_customers(current_user: dict = Depends(get_current_user_with_db)):
     return customers
 
 @api_router.get("/customers/{customer_id}", response_model=Customer)
-async def get_customer(customer_id: str, current_user: dict = Depends(get_current_user_with_db)):
-    customer = await db.customers.find_one({"id": customer_id}, {"_id": 0})
+async def get_customer(customer_id: IdParam, current_user: dict = Depends(get_current_user_with_db)):
+    customer = await entity_cache.get(db, "customers", customer_id)
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
     return customer
 
 @api_router.put("/customers/{customer_id}", response_model=Customer)
-async def update_customer(customer_id: str, customer_update: CustomerCreate, current_user: dict = Depends(get_current_user_with_db)):
+async def update_customer(customer_id: IdParam, customer_update: CustomerCreate, current_user: dict = Depends(get_current_user_with_db)):
     update_data = customer_update.model_dump()
-    update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update_data["updated_at"] = datetime.now(timezone.utc)
     
     result = await db.customers.update_one(
         {"id": customer_id},
         {"$set": update_data}
     )
     
+    await entity_cache.invalidate("customers", customer_id)
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Customer not found")
     
+    await change_log.record(db, "customers", [customer_id])
     customer = await db.customers.find_one({"id": customer_id}, {"_id": 0})
     return customer
 
@@ -307,75 +585,132 @@ async def search_customers(query: str, current_user: dict = Depends(get_current_
     return customers
 
 @api_router.delete("/customers/{customer_id}")
-async def delete_customer(customer_id: str, current_user: dict = Depends(get_current_user_with_db)):
-    # Check if customer has vehicles
-    vehicles = await db.vehicles.find({"customer_id": customer_id}).to_list(10)
-    if vehicles:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Cannot delete customer. Please delete {len(vehicles)} associated vehicle(s) first."
-        )
-    
-    result = await db.customers.delete_one({"id": customer_id})
+async def delete_customer(customer_id: IdParam, current_user: dict = Depends(get_current_user_with_db)):
+    try:
+        deleted = await integrity.delete(db, "customers", customer_id)
+    except DeleteRestricted as e:
+        raise HTTPException(status_code=400, detail=f"Cannot delete customer. {e}")
+    await entity_cache.invalidate("customers", customer_id)
     
-    if result.deleted_count == 0:
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Customer not found")
     
+    await change_log.record(db, "customers", [customer_id], deleted=True)
     return {"message": "Customer deleted successfully"}
 
 # ==================== VEHICLE ROUTES ====================
 
-@api_router.post("/vehicles", response_model=Vehicle)
-async def create_vehicle(vehicle: VehicleCreate, current_user: dict = Depends(get_current_user_with_db)):
-    vehicle_obj = Vehicle(**vehicle.model_dump())
-    
-    # Generate QR code
-    qr = qrcode.QRCode(version=1, box_size=10, border=5)
+@task_queue.handler("vehicle.qr_code")
+async def render_vehicle_qr_code(payload: dict):
+    vehicle_id = payload["vehicle_id"]
     # Use environment variable for frontend URL, fallback to localhost for development
     frontend_url = os.environ.get('FRONTEND_URL', 'http://localhost:3000')
-    qr_data = f"{frontend_url}/vehicles/{vehicle_obj.id}"
-    qr.add_data(qr_data)
-    qr.make(fit=True)
-    
-    img = qr.make_image(fill_color="black", back_color="white")
-    buffered = BytesIO()
-    img.save(buffered, format="PNG")
-    qr_code_base64 = base64.b64encode(buffered.getvalue()).decode()
+    qr_code = await task_queue.offload(render_qr_data_uri, f"{frontend_url}/vehicles/{vehicle_id}")
     
-    vehicle_obj.qr_code = f"data:image/png;base64,{qr_code_base64}"
+    result = await db.vehicles.update_one({"id": vehicle_id}, {"$set": {"qr_code": qr_code}})
+    if result.modified_count:
+        await entity_cache.invalidate("vehicles", vehicle_id)
+        await change_log.record(db, "vehicles", [vehicle_id])
+
+@api_router.post("/vehicles", response_model=Vehicle)
+async def create_vehicle(vehicle: VehicleCreate, response: Response, current_user: dict = Depends(get_current_user_with_db)):
+    with trace_span("pydantic.validate", model="Vehicle"):
+        vehicle_obj = Vehicle(**vehicle.model_dump())
     
     await db.vehicles.insert_one(vehicle_obj.model_dump())
+    await change_log.record(db, "vehicles", [vehicle_obj.id])
+    # The QR code is rendered in the background and lands on the vehicle shortly after
+    task_id = await task_queue.enqueue("vehicle.qr_code", {"vehicle_id": vehicle_obj.id}, priority=PRIORITY_HIGH)
+    response.headers["X-Task-Id"] = str(task_id)
     return vehicle_obj
 
 @api_router.get("/vehicles", response_model=List[Vehicle])
-async def get_vehicles(customer_id: Optional[str] = None, current_user: dict = Depends(get_current_user_with_db)):
+async def get_vehicles(customer_id: Optional[IdParam] = None, current_user: dict = Depends(get_current_user_with_db)):
     query = {"customer_id": customer_id} if customer_id else {}
     vehicles = await db.vehicles.find(query, {"_id": 0}).to_list(1000)
     return vehicles
 
 @api_router.get("/vehicles/{vehicle_id}", response_model=Vehicle)
-async def get_vehicle(vehicle_id: str, current_user: dict = Depends(get_current_user_with_db)):
-    vehicle = await db.vehicles.find_one({"id": vehicle_id}, {"_id": 0})
+async def get_vehicle(vehicle_id: IdParam, current_user: dict = Depends(get_current_user_with_db)):
+    vehicle = await entity_cache.get(db, "vehicles", vehicle_id)
     if not vehicle:
         raise HTTPException(status_code=404, detail="Vehicle not found")
     return vehicle
 
 @api_router.put("/vehicles/{vehicle_id}", response_model=Vehicle)
-async def update_vehicle(vehicle_id: str, vehicle_update: VehicleCreate, current_user: dict = Depends(get_current_user_with_db)):
+async def update_vehicle(vehicle_id: IdParam, vehicle_update: VehicleCreate, current_user: dict = Depends(get_current_user_with_db)):
     update_data = vehicle_update.model_dump()
-    update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update_data["updated_at"] = datetime.now(timezone.utc)
     
     result = await db.vehicles.update_one(
         {"id": vehicle_id},
         {"$set": update_data}
     )
     
+    await entity_cache.invalidate("vehicles", vehicle_id)
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Vehicle not found")
     
+    await change_log.record(db, "vehicles", [vehicle_id])
+    # Make and ECU type feed the analytics breakdowns of the vehicle's jobs
+    job_ids = await db.jobs.distinct("id", {"vehicle_id": vehicle_id})
+    job_ids += await db[archive_name("jobs")].distinct("id", {"vehicle_id": vehicle_id})
+    await analytics.mark_days(db, await analytics.job_days(db, job_ids))
+    
     vehicle = await db.vehicles.find_one({"id": vehicle_id}, {"_id": 0})
     return vehicle
 
+def related(collection: str, foreign_field: str, local_field: str, as_field: str, *stages) -> dict:
+    """$lookup of the documents whose foreign_field equals local_field, passed through stages, without _id.
+
+    The $expr equality uses the foreign collection's index on MongoDB 5.0+.
+    """
+    return {"$lookup": {
+        "from": collection,
+        "let": {"key": f"${local_field}"},
+        "pipeline": [
+            {"$match": {"$expr": {"$eq": [f"${foreign_field}", "$$key"]}}},
+            *stages,
+            {"$project": {"_id": 0}},
+        ],
+        "as": as_field,
+    }}
+
+def vehicle_timeline_pipeline(vehicle_id: IdParam, skip: int, limit: int, include_qr: bool) -> list:
+    """A vehicle with its owner, one page of jobs (each with revisions, billing and reminders) and its other reminders."""
+    return [
+        {"$match": {"id": vehicle_id}},
+        {"$project": {"_id": 0} if include_qr else {"_id": 0, "qr_code": 0}},
+        related("customers", "id", "customer_id", "customer", {"$limit": 1}),
+        related(
+            "jobs", "vehicle_id", "id", "jobs",
+            {"$sort": {"date": -1, "created_at": -1}},
+            {"$skip": skip},
+            {"$limit": limit},
+            related("tune_revisions", "job_id", "id", "tune_revisions", {"$sort": {"created_at": 1}}),
+            related("billing", "job_id", "id", "billing", {"$sort": {"created_at": 1}}),
+            related("reminders", "job_id", "id", "reminders", {"$sort": {"reminder_date": 1}}),
+        ),
+        related("jobs", "vehicle_id", "id", "job_count", {"$count": "total"}),
+        related(
+            "reminders", "vehicle_id", "id", "reminders",
+            {"$match": {"job_id": None}},
+            {"$sort": {"reminder_date": 1}},
+        ),
+    ]
+
+def archived_jobs_pipeline(vehicle_id: IdParam, limit: int) -> list:
+    """A vehicle's newest archived jobs with their archived revisions, billing and reminders."""
+    return [
+        {"$match": {"vehicle_id": vehicle_id}},
+        {"$sort": {"date": -1, "created_at": -1}},
+        {"$limit": limit},
+        {"$project": {"_id": 0}},
+        related(archive_name("tune_revisions"), "job_id", "id", "tune_revisions", {"$sort": {"created_at": 1}}),
+        related(archive_name("billing"), "job_id", "id", "billing", {"$sort": {"created_at": 1}}),
+        related(archive_name("reminders"), "job_id", "id", "reminders", {"$sort": {"reminder_date": 1}}),
+    ]
+
 @api_router.get("/vehicles/search/{query}")
 async def search_vehicles(query: str, current_user: dict = Depends(get_current_user_with_db)):
     vehicles = await db.vehicles.find(
@@ -391,33 +726,81 @@ async def search_vehicles(query: str, current_user: dict = Depends(get_current_u
     ).to_list(100)
     return vehicles
 
-@api_router.delete("/vehicles/{vehicle_id}")
-async def delete_vehicle(vehicle_id: str, current_user: dict = Depends(get_current_user_with_db)):
-    # Check if vehicle has jobs
-    jobs = await db.jobs.find({"vehicle_id": vehicle_id}).to_list(10)
-    if jobs:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Cannot delete vehicle. Please delete {len(jobs)} associated job(s) first."
+@api_router.get("/vehicles/{vehicle_id}/timeline", response_model=VehicleTimeline)
+async def get_vehicle_timeline(
+    vehicle_id: IdParam,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    include_qr: bool = False,
+    current_user: dict = Depends(get_current_user_with_db)
+):
+    """Full service history of a vehicle, newest jobs first, archived jobs included."""
+    archived_count = await db[archive_name("jobs")].count_documents({"vehicle_id": vehicle_id})
+    if not archived_count:
+        # Everything is hot: one round trip
+        results = await db.vehicles.aggregate(vehicle_timeline_pipeline(vehicle_id, skip, limit, include_qr)).to_list(1)
+    else:
+        # Merge the first skip + limit jobs of each tier, then cut the page
+        results, archived = await asyncio.gather(
+            db.vehicles.aggregate(vehicle_timeline_pipeline(vehicle_id, 0, skip + limit, include_qr)).to_list(1),
+            db[archive_name("jobs")].aggregate(archived_jobs_pipeline(vehicle_id, skip + limit)).to_list(None),
         )
+    if not results:
+        raise HTTPException(status_code=404, detail="Vehicle not found")
     
-    # Delete associated tune revisions and reminders
-    await db.tune_revisions.delete_many({"vehicle_id": vehicle_id})
-    await db.reminders.delete_many({"vehicle_id": vehicle_id})
-    await db.appointments.delete_many({"vehicle_id": vehicle_id})
-    
-    result = await db.vehicles.delete_one({"id": vehicle_id})
+    vehicle = results[0]
+    customer = vehicle.pop("customer")
+    job_count = vehicle.pop("job_count")
+    jobs = vehicle.pop("jobs")
+    if archived_count:
+        jobs = sorted(jobs + archived, key=lambda job: (job.get("date"), job.get("created_at")), reverse=True)
+        jobs = jobs[skip:skip + limit]
+    return {
+        "vehicle": vehicle,
+        "customer": customer[0] if customer else None,
+        "jobs": jobs,
+        "reminders": vehicle.pop("reminders"),
+        "total_jobs": (job_count[0]["total"] if job_count else 0) + archived_count,
+        "skip": skip,
+        "limit": limit
+    }
+
+@api_router.delete("/vehicles/{vehicle_id}")
+async def delete_vehicle(vehicle_id: IdParam, current_user: dict = Depends(get_current_user_with_db)):
+    # Tune revisions, reminders and appointments go with the vehicle
+    try:
+        deleted = await integrity.delete(db, "vehicles", vehicle_id)
+    except DeleteRestricted as e:
+        raise HTTPException(status_code=400, detail=f"Cannot delete vehicle. {e}")
+    await entity_cache.invalidate("vehicles", vehicle_id)
     
-    if result.deleted_count == 0:
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Vehicle not found")
     
-    return {"message": "Vehicle deleted successfully"}
+    await change_log.record(db, "vehicles", [vehicle_id], deleted=True)
+    task_id = await task_queue.enqueue("delete.cleanup", {
+        "deleted": {collection: [d["id"] for d in docs] for collection, docs in deleted.items() if collection != "vehicles"},
+        "appointments": [{"id": a["id"], "appointment_date": a["appointment_date"]} for a in deleted["appointments"]],
+    })
+    return {"message": "Vehicle deleted successfully", "task_id": str(task_id)}
+
+@task_queue.handler("delete.cleanup")
+async def clean_up_deleted_records(payload: dict):
+    """Tombstones, slot releases and analytics for the records a cascading delete removed."""
+    for collection, ids in payload["deleted"].items():
+        await change_log.record(db, collection, ids, deleted=True)
+    await invoice_renderer.invalidate(payload["deleted"].get("billing", []))
+    for appointment in payload.get("appointments", []):
+        await slot_engine.release(db, appointment)
+        event_bus.publish("appointment.deleted", {"id": str(appointment["id"])})
+    await analytics.mark_days(db, payload.get("analytics_days", []))
 
 # ==================== JOB ROUTES ====================
 
 @api_router.post("/jobs", response_model=Job)
 async def create_job(job: JobCreate, current_user: dict = Depends(get_current_user_with_db)):
-    job_obj = Job(**job.model_dump())
+    with trace_span("pydantic.validate", model="Job"):
+        job_obj = Job(**job.model_dump())
     
     # Update vehicle's odometer
     if job_obj.odometer_at_visit:
@@ -425,32 +808,47 @@ async def create_job(job: JobCreate, current_user: dict = Depends(get_current_us
             {"id": job_obj.vehicle_id},
             {"$set": {"odometer_at_last_visit": job_obj.odometer_at_visit}}
         )
+        await entity_cache.invalidate("vehicles", job_obj.vehicle_id)
+        await change_log.record(db, "vehicles", [job_obj.vehicle_id])
     
     await db.jobs.insert_one(job_obj.model_dump())
+    await change_log.record(db, "jobs", [job_obj.id])
+    await analytics.mark_days(db, [job_obj.date])
+    event_bus.publish("job.created", job_event_data(job_obj.model_dump()))
     return job_obj
 
-@api_router.get("/jobs", response_model=List[Job])
-async def get_jobs(vehicle_id: Optional[str] = None, customer_id: Optional[str] = None, current_user: dict = Depends(get_current_user_with_db)):
+@api_router.get("/jobs", response_model=List[JobExpanded])
+async def get_jobs(
+    vehicle_id: Optional[IdParam] = None,
+    customer_id: Optional[IdParam] = None,
+    expand: Optional[str] = None,
+    loader: RelationLoader = Depends(get_relation_loader),
+    current_user: dict = Depends(get_current_user_with_db)
+):
     query = {}
     if vehicle_id:
         query["vehicle_id"] = vehicle_id
     if customer_id:
         query["customer_id"] = customer_id
     
-    jobs = await db.jobs.find(query, {"_id": 0}).sort("date", -1).to_list(1000)
-    return jobs
+    if query:
+        # One vehicle's or customer's history includes its archived jobs
+        jobs = await archive.find(db, "jobs", query, sort=("date", -1))
+    else:
+        jobs = await db.jobs.find(query, {"_id": 0}).sort("date", -1).to_list(1000)
+    return await expand_relations(jobs, expand, ("customer", "vehicle"), loader)
 
 @api_router.get("/jobs/{job_id}", response_model=Job)
-async def get_job(job_id: str, current_user: dict = Depends(get_current_user_with_db)):
-    job = await db.jobs.find_one({"id": job_id}, {"_id": 0})
+async def get_job(job_id: IdParam, current_user: dict = Depends(get_current_user_with_db)):
+    job = await entity_cache.get(db, "jobs", job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     return job
 
 @api_router.put("/jobs/{job_id}", response_model=Job)
-async def update_job(job_id: str, job_update: JobCreate, current_user: dict = Depends(get_current_user_with_db)):
+async def update_job(job_id: IdParam, job_update: JobCreate, current_user: dict = Depends(get_current_user_with_db)):
     update_data = job_update.model_dump()
-    update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update_data["updated_at"] = datetime.now(timezone.utc)
     
     # Update vehicle's odometer if provided
     if job_update.odometer_at_visit:
@@ -458,30 +856,39 @@ async def update_job(job_id: str, job_update: JobCreate, current_user: dict = De
             {"id": job_update.vehicle_id},
             {"$set": {"odometer_at_last_visit": job_update.odometer_at_visit}}
         )
+        await entity_cache.invalidate("vehicles", job_update.vehicle_id)
+        await change_log.record(db, "vehicles", [job_update.vehicle_id])
     
+    analytics_days = await analytics.job_days(db, [job_id])
     result = await db.jobs.update_one(
         {"id": job_id},
         {"$set": update_data}
     )
+    await entity_cache.invalidate("jobs", job_id)
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Job not found")
     
+    await change_log.record(db, "jobs", [job_id])
+    await analytics.mark_days(db, analytics_days + [job_update.date])
     job = await db.jobs.find_one({"id": job_id}, {"_id": 0})
     return job
 
 @api_router.delete("/jobs/{job_id}")
-async def delete_job(job_id: str, current_user: dict = Depends(get_current_user_with_db)):
-    # Delete associated tune revisions and billing
-    await db.tune_revisions.delete_many({"job_id": job_id})
-    await db.billing.delete_many({"job_id": job_id})
-    
-    result = await db.jobs.delete_one({"id": job_id})
+async def delete_job(job_id: IdParam, current_user: dict = Depends(get_current_user_with_db)):
+    # Tune revisions and billing go with the job; its files are reclaimed by the upload collector
+    deleted = await integrity.delete(db, "jobs", job_id)
+    await entity_cache.invalidate("jobs", job_id)
     
-    if result.deleted_count == 0:
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    return {"message": "Job deleted successfully"}
+    await change_log.record(db, "jobs", [job_id], deleted=True)
+    task_id = await task_queue.enqueue("delete.cleanup", {
+        "deleted": {collection: [d["id"] for d in docs] for collection, docs in deleted.items() if collection != "jobs"},
+        "analytics_days": [job.get("date") for job in deleted["jobs"]] + [b.get("created_at") for b in deleted["billing"]],
+    })
+    return {"message": "Job deleted successfully", "task_id": str(task_id)}
 
 # ==================== TUNE REVISION ROUTES ====================
 
@@ -489,21 +896,24 @@ async def delete_job(job_id: str, current_user: dict = Depends(get_current_user_
 async def create_tune_revision(revision: TuneRevisionCreate, current_user: dict = Depends(get_current_user_with_db)):
     revision_obj = TuneRevision(**revision.model_dump())
     await db.tune_revisions.insert_one(revision_obj.model_dump())
+    await change_log.record(db, "tune_revisions", [revision_obj.id])
     return revision_obj
 
 @api_router.get("/tune-revisions", response_model=List[TuneRevision])
-async def get_tune_revisions(vehicle_id: Optional[str] = None, job_id: Optional[str] = None, current_user: dict = Depends(get_current_user_with_db)):
+async def get_tune_revisions(vehicle_id: Optional[IdParam] = None, job_id: Optional[IdParam] = None, current_user: dict = Depends(get_current_user_with_db)):
     query = {}
     if vehicle_id:
         query["vehicle_id"] = vehicle_id
     if job_id:
         query["job_id"] = job_id
     
+    if query:
+        return await archive.find(db, "tune_revisions", query, sort=("created_at", 1))
     revisions = await db.tune_revisions.find(query, {"_id": 0}).sort("created_at", 1).to_list(1000)
     return revisions
 
 @api_router.put("/tune-revisions/{revision_id}", response_model=TuneRevision)
-async def update_tune_revision(revision_id: str, revision_update: TuneRevisionUpdate, current_user: dict = Depends(get_current_user_with_db)):
+async def update_tune_revision(revision_id: IdParam, revision_update: TuneRevisionUpdate, current_user: dict = Depends(get_current_user_with_db)):
     update_data = {
         "revision_label": revision_update.revision_label,
         "description": revision_update.description,
@@ -518,16 +928,18 @@ async def update_tune_revision(revision_id: str, revision_update: TuneRevisionUp
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Tune revision not found")
     
+    await change_log.record(db, "tune_revisions", [revision_id])
     revision = await db.tune_revisions.find_one({"id": revision_id}, {"_id": 0})
     return revision
 
 @api_router.delete("/tune-revisions/{revision_id}")
-async def delete_tune_revision(revision_id: str, current_user: dict = Depends(get_current_user_with_db)):
+async def delete_tune_revision(revision_id: IdParam, current_user: dict = Depends(get_current_user_with_db)):
     result = await db.tune_revisions.delete_one({"id": revision_id})
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Tune revision not found")
     
+    await change_log.record(db, "tune_revisions", [revision_id], deleted=True)
     return {"message": "Tune revision deleted successfully"}
 
 # ==================== BILLING ROUTES ====================
@@ -536,28 +948,81 @@ async def delete_tune_revision(revision_id: str, current_user: dict = Depends(ge
 async def create_billing(billing: BillingCreate, current_user: dict = Depends(get_current_user_with_db)):
     billing_obj = Billing(**billing.model_dump())
     await db.billing.insert_one(billing_obj.model_dump())
+    await change_log.record(db, "billing", [billing_obj.id])
+    await analytics.mark_days(db, [billing_obj.created_at])
+    if billing_obj.payment_status == "paid":
+        event_bus.publish("billing.paid", billing_event_data(billing_obj.model_dump()))
     return billing_obj
 
-@api_router.get("/billing", response_model=List[Billing])
-async def get_billing(job_id: Optional[str] = None, current_user: dict = Depends(get_current_user_with_db)):
-    query = {"job_id": job_id} if job_id else {}
-    billing = await db.billing.find(query, {"_id": 0}).to_list(1000)
-    return billing
+@api_router.get("/billing", response_model=List[BillingExpanded])
+async def get_billing(
+    job_id: Optional[IdParam] = None,
+    expand: Optional[str] = None,
+    loader: RelationLoader = Depends(get_relation_loader),
+    current_user: dict = Depends(get_current_user_with_db)
+):
+    if job_id:
+        billing = await archive.find(db, "billing", {"job_id": job_id})
+    else:
+        billing = await db.billing.find({}, {"_id": 0}).to_list(1000)
+    return await expand_relations(billing, expand, ("job", "customer", "vehicle"), loader)
+
+@api_router.get("/billing/invoices.zip")
+async def get_invoices_zip(month: str, current_user: dict = Depends(get_current_user_with_db)):
+    """Every invoice raised in a month (YYYY-MM) in one zip, streamed as the invoices render."""
+    try:
+        start_day = date.fromisoformat(f"{month}-01")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="month must be YYYY-MM")
+    end_day = (start_day.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    
+    billing = await archive.find(
+        db, "billing", {"created_at": date_range_query(start_day, end_day)},
+        sort=("created_at", 1), limit=INVOICE_BULK_MAX + 1
+    )
+    if len(billing) > INVOICE_BULK_MAX:
+        raise HTTPException(status_code=400, detail=f"More than {INVOICE_BULK_MAX} invoices in {month}")
+    contexts = await invoice_renderer.contexts(db, billing)
+    return StreamingResponse(
+        invoice_renderer.zip(contexts),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="invoices-{month}.zip"'}
+    )
+
+@api_router.get("/billing/{billing_id}/invoice.pdf")
+async def get_invoice_pdf(billing_id: IdParam, current_user: dict = Depends(get_current_user_with_db)):
+    billing = await archive.find(db, "billing", {"id": billing_id}, limit=1)
+    if not billing:
+        raise HTTPException(status_code=404, detail="Billing record not found")
+    
+    context = (await invoice_renderer.contexts(db, billing))[0]
+    pdf = await invoice_renderer.render(context)
+    return Response(
+        content=pdf,
+        media_type="application/pdf",
+        headers={"Content-Disposition": f'inline; filename="{invoice_filename(context)}"'}
+    )
 
 @api_router.put("/billing/{billing_id}", response_model=Billing)
-async def update_billing(billing_id: str, billing_update: BillingCreate, current_user: dict = Depends(get_current_user_with_db)):
+async def update_billing(billing_id: IdParam, billing_update: BillingCreate, current_user: dict = Depends(get_current_user_with_db)):
     update_data = billing_update.model_dump()
-    update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update_data["updated_at"] = datetime.now(timezone.utc)
     
-    result = await db.billing.update_one(
+    previous = await db.billing.find_one_and_update(
         {"id": billing_id},
-        {"$set": update_data}
+        {"$set": update_data},
+        projection={"_id": 0, "payment_status": 1, "created_at": 1}
     )
     
-    if result.matched_count == 0:
+    if previous is None:
         raise HTTPException(status_code=404, detail="Billing record not found")
     
+    await analytics.mark_days(db, [previous.get("created_at")])
+    await change_log.record(db, "billing", [billing_id])
+    await invoice_renderer.invalidate([billing_id])
     billing = await db.billing.find_one({"id": billing_id}, {"_id": 0})
+    if billing["payment_status"] == "paid" and previous.get("payment_status") != "paid":
+        event_bus.publish("billing.paid", billing_event_data(billing))
     return billing
 
 # ==================== REMINDER ROUTES ====================
@@ -566,24 +1031,54 @@ async def update_billing(billing_id: str, billing_update: BillingCreate, current
 async def create_reminder(reminder: ReminderCreate, current_user: dict = Depends(get_current_user_with_db)):
     reminder_obj = Reminder(**reminder.model_dump())
     await db.reminders.insert_one(reminder_obj.model_dump())
+    await change_log.record(db, "reminders", [reminder_obj.id])
     return reminder_obj
 
-@api_router.get("/reminders", response_model=List[Reminder])
-async def get_reminders(status: Optional[str] = None, current_user: dict = Depends(get_current_user_with_db)):
-    query = {"status": status} if status else {}
-    reminders = await db.reminders.find(query, {"_id": 0}).sort("reminder_date", 1).to_list(1000)
-    return reminders
+@api_router.get("/reminders", response_model=List[ReminderExpanded])
+async def get_reminders(
+    status: Optional[str] = None,
+    vehicle_id: Optional[IdParam] = None,
+    customer_id: Optional[IdParam] = None,
+    from_date: Optional[str] = Query(None, alias="from"),
+    to_date: Optional[str] = Query(None, alias="to"),
+    expand: Optional[str] = None,
+    loader: RelationLoader = Depends(get_relation_loader),
+    current_user: dict = Depends(get_current_user_with_db)
+):
+    try:
+        start_day, end_day = parse_date_range(from_date, to_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    query = {}
+    if status:
+        query["status"] = status
+    if vehicle_id:
+        query["vehicle_id"] = vehicle_id
+    if customer_id:
+        query["customer_id"] = customer_id
+    date_query = date_range_query(start_day, end_day)
+    if date_query:
+        query["reminder_date"] = date_query
+    
+    async def load():
+        reminders = await db.reminders.find(query, {"_id": 0}).sort("reminder_date", 1).to_list(1000)
+        return await expand_relations(reminders, expand, ("customer", "vehicle", "job"), loader)
+    
+    key = (status, vehicle_id, customer_id, start_day, end_day, expand, current_user["role"])
+    return await single_flight.do("reminders", key, load)
 
 @api_router.put("/reminders/{reminder_id}", response_model=Reminder)
-async def update_reminder_status(reminder_id: str, status: str, current_user: dict = Depends(get_current_user_with_db)):
+async def update_reminder_status(reminder_id: IdParam, status: str, current_user: dict = Depends(get_current_user_with_db)):
     result = await db.reminders.update_one(
         {"id": reminder_id},
-        {"$set": {"status": status, "updated_at": datetime.now(timezone.utc).isoformat()}}
+        {"$set": {"status": status, "updated_at": datetime.now(timezone.utc)}}
     )
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Reminder not found")
     
+    await change_log.record(db, "reminders", [reminder_id])
     reminder = await db.reminders.find_one({"id": reminder_id}, {"_id": 0})
     return reminder
 
@@ -592,90 +1087,283 @@ async def update_reminder_status(reminder_id: str, status: str, current_user: di
 @api_router.post("/appointments", response_model=Appointment)
 async def create_appointment(appointment: AppointmentCreate, current_user: dict = Depends(get_current_user_with_db)):
     appointment_obj = Appointment(**appointment.model_dump())
-    await db.appointments.insert_one(appointment_obj.model_dump())
-    return appointment_obj
+    appointment_data = appointment_obj.model_dump()
+    
+    if appointment_obj.status != "cancelled":
+        try:
+            await slot_engine.book(db, appointment_data)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid appointment time, expected HH:MM")
+        except SlotUnavailableError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+    
+    await db.appointments.insert_one(appointment_data)
+    await change_log.record(db, "appointments", [appointment_obj.id])
+    event_bus.publish("appointment.created", appointment_event_data(appointment_data))
+    return Appointment(**appointment_data)
+
+def build_appointment_query(start_day, end_day, status=None, vehicle_id=None, customer_id=None, technician_name=None):
+    """Appointment filter matching the compound indexes in utils.indexes."""
+    query = {}
+    if status:
+        query["status"] = status
+    if vehicle_id:
+        query["vehicle_id"] = vehicle_id
+    if customer_id:
+        query["customer_id"] = customer_id
+    if technician_name:
+        query["technician_name"] = technician_name
+    date_query = date_range_query(start_day, end_day)
+    if date_query:
+        query["appointment_date"] = date_query
+    return query
+
+def calendar_pipeline(query: dict, limit: int):
+    """Compact calendar rows with the customer name joined in."""
+    return [
+        {"$match": query},
+        {"$sort": {"appointment_date": 1, "appointment_time": 1}},
+        {"$limit": limit},
+        {"$lookup": {
+            "from": "customers",
+            "localField": "customer_id",
+            "foreignField": "id",
+            "as": "customer"
+        }},
+        {"$project": {
+            "_id": 0,
+            "id": 1,
+            "appointment_date": 1,
+            "appointment_time": 1,
+            "service_type": 1,
+            "status": 1,
+            "bay": 1,
+            "notes": 1,
+            "duration_minutes": 1,
+            "customer_name": {"$arrayElemAt": ["$customer.full_name", 0]}
+        }}
+    ]
+
+@api_router.get("/appointments", response_model=List[AppointmentExpanded])
+async def get_appointments(
+    status: Optional[str] = None,
+    vehicle_id: Optional[IdParam] = None,
+    customer_id: Optional[IdParam] = None,
+    from_date: Optional[str] = Query(None, alias="from"),
+    to_date: Optional[str] = Query(None, alias="to"),
+    expand: Optional[str] = None,
+    loader: RelationLoader = Depends(get_relation_loader),
+    current_user: dict = Depends(get_current_user_with_db)
+):
+    try:
+        start_day, end_day = parse_date_range(from_date, to_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    query = build_appointment_query(start_day, end_day, status, vehicle_id, customer_id)
+    
+    async def load():
+        appointments = await db.appointments.find(query, {"_id": 0}).sort(
+            [("appointment_date", 1), ("appointment_time", 1)]
+        ).to_list(1000)
+        return await expand_relations(appointments, expand, ("customer", "vehicle"), loader)
+    
+    key = (status, vehicle_id, customer_id, start_day, end_day, expand, current_user["role"])
+    return await single_flight.do("appointments", key, load)
+
+@api_router.get("/appointments/calendar", response_model=List[CalendarEntry])
+async def get_appointment_calendar(
+    from_date: str = Query(..., alias="from"),
+    to_date: str = Query(..., alias="to"),
+    status: Optional[str] = None,
+    vehicle_id: Optional[IdParam] = None,
+    customer_id: Optional[IdParam] = None,
+    current_user: dict = Depends(get_current_user_with_db)
+):
+    try:
+        start_day, end_day = parse_date_range(from_date, to_date, max_days=92)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    query = build_appointment_query(start_day, end_day, status, vehicle_id, customer_id)
+    entries = await db.appointments.aggregate(calendar_pipeline(query, 2000)).to_list(2000)
+    return entries
+
+@api_router.get("/appointments/calendar.ics")
+async def get_appointment_ics(
+    technician: Optional[str] = None,
+    from_date: Optional[str] = Query(None, alias="from"),
+    to_date: Optional[str] = Query(None, alias="to"),
+    current_user: dict = Depends(get_current_user_with_db)
+):
+    """Stream a technician's schedule (the current user's by default) as iCalendar."""
+    try:
+        start_day, end_day = parse_date_range(from_date, to_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    technician_name = technician or current_user["username"]
+    if not start_day:
+        start_day = datetime.now(timezone.utc).date() - timedelta(days=30)
+    query = build_appointment_query(start_day, end_day, technician_name=technician_name)
+    
+    async def render():
+        yield ics_header(f"{technician_name} - IgnitionLab Dynamics")
+        async for appointment in analytics_db.appointments.aggregate(calendar_pipeline(query, 5000)):
+            yield ics_event(appointment, appointment.get("customer_name"))
+        yield ics_footer()
+    
+    return StreamingResponse(
+        render(),
+        media_type="text/calendar",
+        headers={"Content-Disposition": 'inline; filename="schedule.ics"'}
+    )
 
-@api_router.get("/appointments", response_model=List[Appointment])
-async def get_appointments(current_user: dict = Depends(get_current_user_with_db)):
-    appointments = await db.appointments.find({}, {"_id": 0}).sort("appointment_date", 1).to_list(1000)
-    return appointments
+@api_router.get("/appointments/availability", response_model=List[AvailabilitySlot])
+async def get_appointment_availability(
+    from_date: str = Query(..., alias="from"),
+    to_date: str = Query(..., alias="to"),
+    service_type: Optional[str] = None,
+    duration_minutes: Optional[int] = Query(None, ge=MIN_DURATION_MINUTES),
+    current_user: dict = Depends(get_current_user_with_db)
+):
+    try:
+        start_day = date.fromisoformat(from_date)
+        end_day = date.fromisoformat(to_date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be in YYYY-MM-DD format")
+    
+    if end_day < start_day or (end_day - start_day).days > 31:
+        raise HTTPException(status_code=400, detail="Date range must be between 0 and 31 days")
+    
+    duration = service_duration(service_type, duration_minutes)
+    return await slot_engine.availability(db, start_day, end_day, duration)
 
 @api_router.put("/appointments/{appointment_id}/status")
-async def update_appointment_status(appointment_id: str, status_update: StatusUpdate, current_user: dict = Depends(get_current_user_with_db)):
+async def update_appointment_status(appointment_id: IdParam, status_update: StatusUpdate, current_user: dict = Depends(get_current_user_with_db)):
+    appointment = await db.appointments.find_one({"id": appointment_id}, {"_id": 0})
+    if not appointment:
+        raise HTTPException(status_code=404, detail="Appointment not found")
+    
+    # Cancelling frees the bay; reactivating a cancelled appointment has to rebook it
+    if status_update.status == "cancelled" and appointment["status"] != "cancelled":
+        await slot_engine.release(db, appointment)
+    elif appointment["status"] == "cancelled" and status_update.status != "cancelled":
+        try:
+            await slot_engine.book(db, appointment)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid appointment time, expected HH:MM")
+        except SlotUnavailableError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+    
     result = await db.appointments.update_one(
         {"id": appointment_id},
-        {"$set": {"status": status_update.status, "updated_at": datetime.now(timezone.utc).isoformat()}}
+        {"$set": {
+            "status": status_update.status,
+            "bay": appointment.get("bay"),
+            "updated_at": datetime.now(timezone.utc)
+        }}
     )
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Appointment not found")
     
+    await change_log.record(db, "appointments", [appointment_id])
+    appointment["status"] = status_update.status
+    event_bus.publish("appointment.status_changed", appointment_event_data(appointment))
     return {"message": "Appointment status updated successfully"}
 
 @api_router.delete("/appointments/{appointment_id}")
-async def delete_appointment(appointment_id: str, current_user: dict = Depends(get_current_user_with_db)):
-    result = await db.appointments.delete_one({"id": appointment_id})
-    
-    if result.deleted_count == 0:
+async def delete_appointment(appointment_id: IdParam, current_user: dict = Depends(get_current_user_with_db)):
+    appointment = await db.appointments.find_one({"id": appointment_id}, {"_id": 0})
+    if not appointment:
         raise HTTPException(status_code=404, detail="Appointment not found")
     
+    await slot_engine.release(db, appointment)
+    await db.appointments.delete_one({"id": appointment_id})
+    await change_log.record(db, "appointments", [appointment_id], deleted=True)
+    event_bus.publish("appointment.deleted", {"id": str(appointment_id)})
+    
     return {"message": "Appointment deleted successfully"}
 
+# ==================== SYNC ====================
+
+@api_router.get("/sync", response_model=SyncResponse)
+async def sync_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=2000),
+    current_user: dict = Depends(get_current_user_with_db)
+):
+    """Documents created, updated or deleted after a sync token, oldest change first.
+
+    Start with since=0 for a full copy, then pass back the returned token. Keep
+    going while has_more is true. 410 means the token is too old to resume from.
+    """
+    try:
+        return await change_log.changes(db, since, limit)
+    except SyncTokenExpired as e:
+        raise HTTPException(status_code=410, detail=str(e))
+
 # ==================== DASHBOARD STATS ====================
 
 @api_router.get("/dashboard/stats", response_model=DashboardStats)
 async def get_dashboard_stats(current_user: dict = Depends(get_current_user_with_db)):
+    return await single_flight.do("dashboard.stats", current_user["role"], compute_dashboard_stats)
+
+async def compute_dashboard_stats():
     now = datetime.now(timezone.utc)
     
     # Calculate start of current calendar week (Monday)
     start_of_week = (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
-    week_start_iso = start_of_week.isoformat()
     
     # Calculate start of current calendar month
     start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    month_start_iso = start_of_month.isoformat()
     
     # Jobs this week (calendar week)
-    jobs_this_week = await db.jobs.count_documents({"date": {"$gte": week_start_iso}})
+    jobs_this_week = await analytics_db.jobs.count_documents({"date": {"$gte": start_of_week}})
     
     # Pending payments
-    pending_payments = await db.billing.count_documents({"payment_status": {"$in": ["pending", "partial"]}})
+    pending_payments = await analytics_db.billing.count_documents({"payment_status": {"$in": ["pending", "partial"]}})
     
-    # Upcoming reminders
-    today = now.isoformat()
-    upcoming_reminders = await db.reminders.count_documents({
+    # Upcoming reminders (reminder dates are days, so today's still count)
+    upcoming_reminders = await analytics_db.reminders.count_documents({
         "status": "pending",
-        "reminder_date": {"$gte": today}
+        "reminder_date": {"$gte": now.replace(hour=0, minute=0, second=0, microsecond=0)}
     })
     
     # Total counts
-    total_customers = await db.customers.count_documents({})
-    total_vehicles = await db.vehicles.count_documents({})
+    total_customers = await analytics_db.customers.count_documents({})
+    total_vehicles = await analytics_db.vehicles.count_documents({})
     
     # Income calculations based on calendar periods
     # Weekly income (current calendar week - Monday to Sunday)
-    weekly_billing = await db.billing.find(
-        {"created_at": {"$gte": week_start_iso}, "payment_status": "paid"}, 
+    weekly_billing = await analytics_db.billing.find(
+        {"created_at": {"$gte": start_of_week}, "payment_status": "paid"}, 
         {"_id": 0, "final_billed_amount": 1}
     ).to_list(1000)
     weekly_income = sum(bill.get("final_billed_amount", 0) for bill in weekly_billing)
     
     # Monthly income (current calendar month)
-    monthly_billing = await db.billing.find(
-        {"created_at": {"$gte": month_start_iso}, "payment_status": "paid"}, 
+    monthly_billing = await analytics_db.billing.find(
+        {"created_at": {"$gte": start_of_month}, "payment_status": "paid"}, 
         {"_id": 0, "final_billed_amount": 1}
     ).to_list(1000)
     monthly_income = sum(bill.get("final_billed_amount", 0) for bill in monthly_billing)
     
     # All-time income
-    all_time_billing = await db.billing.find(
+    all_time_billing = await analytics_db.billing.find(
         {"payment_status": "paid"}, 
         {"_id": 0, "final_billed_amount": 1}
     ).to_list(10000)
+    # Archived billing is all paid
+    archived_income = await analytics_db[archive_name("billing")].aggregate([
+        {"$group": {"_id": None, "total": {"$sum": "$final_billed_amount"}}}
+    ]).to_list(1)
     all_time_income = sum(bill.get("final_billed_amount", 0) for bill in all_time_billing)
+    all_time_income += archived_income[0]["total"] if archived_income else 0
     
     # Recent jobs
-    recent_jobs = await db.jobs.find({}, {"_id": 0}).sort("date", -1).limit(5).to_list(5)
+    recent_jobs = await analytics_db.jobs.find({}, {"_id": 0}).sort("date", -1).limit(5).to_list(5)
     
     return {
         "jobs_this_week": jobs_this_week,
@@ -689,19 +1377,200 @@ async def get_dashboard_stats(current_user: dict = Depends(get_current_user_with
         "recent_jobs": recent_jobs
     }
 
+# ==================== ANALYTICS ====================
+
+@api_router.get("/analytics/revenue", response_model=AnalyticsReport)
+async def get_revenue_analytics(
+    from_date: Optional[str] = Query(None, alias="from"),
+    to_date: Optional[str] = Query(None, alias="to"),
+    group_by: str = "month",
+    current_user: dict = Depends(get_current_user_with_db)
+):
+    """Income, discounts, refunds and job counts over a date range (this year by default).
+
+    group_by is a period (day, month, year) or one of technician, tune_stage,
+    make, ecu_type and payment_method.
+    """
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if group_by not in TIME_GROUPS and group_by not in ANALYTICS_DIMENSIONS:
+        raise HTTPException(status_code=400, detail=f"Cannot group by '{group_by}'")
+    
+    try:
+        start_day, end_day = parse_date_range(from_date, to_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    end_day = end_day or datetime.now(timezone.utc).date()
+    start_day = start_day or end_day.replace(month=1, day=1)
+    return await analytics.report(db, start_day, end_day, group_by)
+
+# ==================== ADMIN DIAGNOSTICS ====================
+
+@api_router.get("/admin/slow-queries")
+async def get_slow_queries(current_user: dict = Depends(get_current_user_with_db)):
+    """Recent slow MongoDB operations with their plans, and missing-index findings."""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    return slow_query_profiler.report()
+
+@api_router.delete("/admin/slow-queries")
+async def clear_slow_queries(current_user: dict = Depends(get_current_user_with_db)):
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    slow_query_profiler.clear()
+    return {"message": "Slow query log cleared"}
+
+@api_router.get("/admin/db-pool")
+async def get_db_pool_stats(current_user: dict = Depends(get_current_user_with_db)):
+    """Connection pool options and per-server usage, for sizing the pool under load."""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    options = client.delegate.options
+    stats = pool_snapshot(options.pool_options.max_pool_size)
+    stats["options"] = {
+        "min_pool_size": options.pool_options.min_pool_size,
+        "max_idle_time_seconds": options.pool_options.max_idle_time_seconds,
+        "wait_queue_timeout": options.pool_options.wait_queue_timeout,
+        "compressors": options.pool_options._compression_settings.compressors,
+        "analytics_read_preference": analytics_db.read_preference.document,
+    }
+    return stats
+
+@api_router.get("/admin/archive")
+async def get_archive_stats(current_user: dict = Depends(get_current_user_with_db)):
+    """Hot and archived record counts, and what the last archive run moved."""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    return await archive.stats(db)
+
+@api_router.get("/admin/entity-cache")
+async def get_entity_cache_stats(current_user: dict = Depends(get_current_user_with_db)):
+    """Hit ratio, size and evictions of the customer/vehicle/job document cache."""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    return entity_cache.stats()
+
+# ==================== LIVE EVENTS ====================
+
+@api_router.post("/events/ticket")
+async def create_events_ticket(current_user: dict = Depends(get_current_user_with_db)):
+    """Short-lived credential for opening GET /api/events, which EventSource can only authenticate in the URL."""
+    ticket = create_access_token(
+        data={"sub": current_user["username"], "scope": EVENTS_TICKET_SCOPE},
+        expires_delta=timedelta(seconds=EVENTS_TICKET_EXPIRE_SECONDS),
+    )
+    return {"ticket": ticket, "expires_in": EVENTS_TICKET_EXPIRE_SECONDS}
+
+@api_router.get("/events")
+async def stream_events(request: Request, types: Optional[str] = None, current_user: dict = Depends(get_current_user_for_stream)):
+    """Server-Sent Events feed of changes. Resumes from the Last-Event-ID header on any worker."""
+    wanted = set(types.split(",")) if types else None
+    last_event_id = request.headers.get("Last-Event-ID") or request.query_params.get("last_event_id")
+    
+    # Subscribe before replaying so nothing published in between is lost
+    queue = event_bus.subscribe()
+    try:
+        missed = await event_bus.replay(last_event_id)
+    except BaseException:
+        event_bus.unsubscribe(queue)
+        raise
+    
+    async def stream():
+        try:
+            yield f"retry: {RETRY_MILLISECONDS}\n\n"
+            # The client has everything up to the id it resumed from
+            last_sent = int(last_event_id) if missed is not None and last_event_id else 0
+            if missed is None:
+                yield format_resync()
+            for event in missed or []:
+                last_sent = event["id"]
+                if wanted is None or event["type"] in wanted:
+                    yield format_sse(event)
+            
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": heartbeat\n\n"
+                    continue
+                if event is None:
+                    yield format_resync()
+                    break
+                if event["id"] <= last_sent:
+                    continue
+                if wanted is None or event["type"] in wanted:
+                    yield format_sse(event)
+        finally:
+            event_bus.unsubscribe(queue)
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # ==================== FILE UPLOAD ====================
 
+async def upload_owner_exists(attach: UploadAttach) -> bool:
+    if attach.job_id:
+        return bool(await archive.find(db, "jobs", {"id": attach.job_id}, limit=1))
+    return bool(await archive.find(db, "tune_revisions", {"id": attach.revision_id}, limit=1))
+
 @api_router.post("/upload")
-async def upload_file(file: UploadFile = File(...), current_user: dict = Depends(get_current_user_with_db)):
-    file_id = str(uuid.uuid4())
+async def upload_file(
+    file: UploadFile = File(...),
+    job_id: Optional[IdParam] = Form(None),
+    revision_id: Optional[IdParam] = Form(None),
+    current_user: dict = Depends(get_current_user_with_db)
+):
+    """Store a file, optionally owned by a job or tune revision from the start."""
+    owner = None
+    if job_id and revision_id:
+        raise HTTPException(status_code=422, detail="Give at most one of job_id or revision_id")
+    if job_id or revision_id:
+        owner = UploadAttach.model_construct(job_id=job_id, revision_id=revision_id)
+        if not await upload_owner_exists(owner):
+            raise HTTPException(status_code=404, detail="Job or tune revision not found")
+    
+    upload = Upload(filename=file.filename, **(owner.model_dump() if owner else {}))
+    file_id = str(upload.id)
     file_extension = Path(file.filename).suffix
     file_path = UPLOAD_DIR / f"{file_id}{file_extension}"
     
-    with open(file_path, "wb") as f:
-        content = await file.read()
-        f.write(content)
+    content = await file.read()
+    # Written before responding, so the file can be read back straight away
+    await asyncio.to_thread(write_file, file_path, content)
+    # Recorded after the write; the collector never touches a file without a record
+    await db.uploads.insert_one(upload.model_dump())
     
-    return {"file_id": file_id, "filename": file.filename, "path": str(file_path)}
+    return {
+        "file_id": file_id,
+        "filename": file.filename,
+        "path": str(file_path)
+    }
+
+@api_router.post("/uploads/{file_id}/attach", response_model=Upload)
+async def attach_upload(file_id: IdParam, attach: UploadAttach, current_user: dict = Depends(get_current_user_with_db)):
+    """Make a job or tune revision the owner of an upload, so the collector keeps it."""
+    if not await upload_owner_exists(attach):
+        raise HTTPException(status_code=404, detail="Job or tune revision not found")
+    upload = await db.uploads.find_one_and_update(
+        {"id": file_id},
+        {"$set": attach.model_dump()},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not upload:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return upload
 
 @api_router.get("/uploads/{file_id}")
 async def get_file(file_id: str, current_user: dict = Depends(get_current_user_with_db)):
@@ -711,6 +1580,16 @@ async def get_file(file_id: str, current_user: dict = Depends(get_current_user_w
     
     raise HTTPException(status_code=404, detail="File not found")
 
+# ==================== BACKGROUND TASKS ====================
+
+@api_router.get("/tasks/{task_id}", response_model=TaskStatus)
+async def get_task(task_id: IdParam, current_user: dict = Depends(get_current_user_with_db)):
+    """Progress of work a request queued, e.g. the task_id returned by a delete."""
+    task = await task_queue.status(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return task
+
 # ==================== GLOBAL SEARCH ====================
 
 @api_router.get("/search/{query}")
@@ -746,43 +1625,74 @@ async def global_search(query: str, current_user: dict = Depends(get_current_use
         "total_results": len(customers) + len(vehicles)
     }
 
+# ==================== BATCH ====================
+
+# Sub-requests go to the router directly; streams and nested batches are refused
+batch_dispatcher = BatchDispatcher(
+    app.router,
+    max_concurrency=int(os.environ.get('BATCH_MAX_CONCURRENCY', '8')),
+    excluded_paths=("/api/batch", "/api/events"),
+)
+
+@api_router.post("/batch", response_model=BatchResponse)
+async def batch(batch_request: BatchRequest, request: Request, current_user: dict = Depends(get_current_user_with_db)):
+    """Run several GETs against this API in one round trip, authenticating once.
+
+    Results come back in request order with each sub-request's own status code.
+    """
+    token = batch_user.set(current_user)
+    try:
+        results = await batch_dispatcher.run(request.scope, [item.path for item in batch_request.requests])
+    finally:
+        batch_user.reset(token)
+    
+    return {
+        "results": [{"id": item.id, **result} for item, result in zip(batch_request.requests, results)]
+    }
+
 # ==================== HEALTH CHECK ENDPOINTS ====================
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint for Kubernetes liveness probe."""
-    try:
-        # Check database connection
-        await db.command('ping')
-        return {
-            "status": "healthy",
-            "database": "connected",
-            "service": "ignitionlab-dynamics"
-        }
-    except Exception as e:
-        logger.error(f"Health check failed: {e}")
+    """Health check endpoint for Kubernetes liveness probe. Answers from the cached database state."""
+    if not db_monitor.is_healthy:
         raise HTTPException(status_code=503, detail="Service unavailable")
+    return {
+        "status": "healthy",
+        "service": "ignitionlab-dynamics",
+        **db_monitor.state()
+    }
 
 @app.get("/ready")
 async def readiness_check():
-    """Readiness check endpoint for Kubernetes readiness probe."""
-    try:
-        # Check database connection
-        await db.command('ping')
-        # Check if default admin user exists
-        admin_exists = await db.users.find_one({"username": "IgnitionLab Dynamics"})
-        return {
-            "status": "ready",
-            "database": "connected",
-            "initialized": admin_exists is not None
-        }
-    except Exception as e:
-        logger.error(f"Readiness check failed: {e}")
+    """Readiness check endpoint for Kubernetes readiness probe. Answers from the cached database state."""
+    if not db_monitor.is_healthy:
         raise HTTPException(status_code=503, detail="Service not ready")
+    return {
+        "status": "ready",
+        "initialized": db_monitor.initialized,
+        **db_monitor.state()
+    }
+
+# ==================== METRICS ====================
+
+metrics_registry.add_collector(
+    lambda: mongo_pool_max_size.set(value=client.delegate.options.pool_options.max_pool_size)
+)
+metrics_registry.add_collector(lambda: entity_cache_entries.set(value=entity_cache.stats()["entries"]))
+metrics_registry.add_collector(lambda: entity_cache_bytes.set(value=entity_cache.stats()["bytes"]))
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text exposition of request, MongoDB command and pool metrics."""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
 
 # Include the router in the main app
 app.include_router(api_router)
 
+# Inside CORS, so 503s from an open circuit still carry CORS headers
+app.add_middleware(CircuitBreakerMiddleware, monitor=db_monitor)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -791,6 +1701,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(TracingMiddleware, tracer=tracer)
+
+# Outermost, so it times everything including CORS handling
+app.add_middleware(MetricsMiddleware, routes_provider=lambda: app.routes)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -800,4 +1715,10 @@ logger = logging.getLogger(__name__)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in background_tasks:
+        task.cancel()
+    # Let tasks finish their cleanup (final span flush, lease release) before closing
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    task_queue.pool.shutdown()
+    invoice_renderer.pool.shutdown()
     client.close()
\ No newline at end of file
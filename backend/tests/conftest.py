@@ -0,0 +1,42 @@
+"""Fixtures for the backend tests.
+
+Run from backend/:
+
+    python -m pytest tests
+
+The database is an in-memory mongomock one, so no server is needed. Tests
+drive coroutines with `asyncio.run`.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import bson
+import mongomock.collection
+import pytest
+from bson.binary import UuidRepresentation
+from bson.codec_options import CodecOptions
+from mongomock_motor import AsyncMongoMockClient
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+
+STANDARD_UUIDS = CodecOptions(uuid_representation=UuidRepresentation.STANDARD, tz_aware=True)
+
+
+class _StandardUuidBSON(bson.BSON):
+    # mongomock size-checks every insert by encoding it with the default
+    # codec options, which refuse native UUIDs; the server stores them as
+    # binary subtype 4
+    @classmethod
+    def encode(cls, document, check_keys=False, codec_options=STANDARD_UUIDS):
+        return cls(bson.encode(document, check_keys, codec_options))
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(mongomock.collection, "BSON", _StandardUuidBSON)
+    client = AsyncMongoMockClient(tz_aware=True, uuidRepresentation="standard")
+    return client["ignitionlab_test"]
@@ -0,0 +1,89 @@
+import asyncio
+from datetime import date, datetime, timezone
+
+from utils.analytics import DailyBuckets
+from utils.archive import archive_name
+from utils.ids import new_id
+
+MAY_1 = datetime(2024, 5, 1, 9, tzinfo=timezone.utc)
+MAY_2 = datetime(2024, 5, 2, 9, tzinfo=timezone.utc)
+JUNE_3 = datetime(2024, 6, 3, 9, tzinfo=timezone.utc)
+
+
+async def add_job(db, when: datetime, technician: str, make: str, billed: float,
+                  payment_status: str = "paid", archived: bool = False) -> dict:
+    suffix = archive_name if archived else str
+    vehicle = {"id": new_id(), "make": make, "ecu_type": "Bosch"}
+    job = {"id": new_id(), "vehicle_id": vehicle["id"], "date": when, "technician_name": technician,
+           "tune_stage": "Stage 1"}
+    await db.vehicles.insert_one(vehicle)
+    await db[suffix("jobs")].insert_one(dict(job))
+    await db[suffix("billing")].insert_one({
+        "id": new_id(), "job_id": job["id"], "created_at": when, "final_billed_amount": billed,
+        "payment_status": payment_status, "payment_method": "card", "discounts": 0, "refunds": 0,
+    })
+    return job
+
+
+def test_report_sums_hot_and_archived_days(db):
+    async def scenario():
+        await add_job(db, MAY_1, "Alex", "Subaru", 100.0, archived=True)
+        await add_job(db, MAY_2, "Alex", "Ford", 250.0, payment_status="pending")
+        await add_job(db, JUNE_3, "Sam", "Ford", 400.0)
+        buckets = DailyBuckets()
+        await buckets.refresh(db, until=date(2024, 6, 30))
+        return (
+            await buckets.report(db, date(2024, 5, 1), date(2024, 6, 30), "make"),
+            await buckets.report(db, date(2024, 5, 1), date(2024, 5, 31), "technician"),
+        )
+
+    by_make, by_technician = asyncio.run(scenario())
+    assert by_make["built_through"] == "2024-06-30"
+    assert by_make["totals"] == {
+        "jobs": 3, "invoices": 3, "billed": 750.0, "paid": 500.0, "outstanding": 250.0,
+        "discounts": 0, "refunds": 0,
+    }
+    assert [(row["key"], row["jobs"], row["billed"]) for row in by_make["rows"]] == [
+        ("Ford", 2, 650.0), ("Subaru", 1, 100.0),
+    ]
+    assert [(row["key"], row["jobs"], row["billed"]) for row in by_technician["rows"]] == [("Alex", 2, 350.0)]
+
+
+async def billed_by_day(db) -> list:
+    return [(d["_id"], d["totals"]["billed"]) async for d in db.analytics_daily.find().sort("_id", 1)]
+
+
+def test_refresh_rebuilds_only_marked_days(db):
+    async def scenario():
+        job = await add_job(db, MAY_1, "Alex", "Subaru", 100.0)
+        buckets = DailyBuckets()
+        await buckets.refresh(db, until=date(2024, 5, 31))
+
+        await db.billing.update_one({"job_id": job["id"]}, {"$set": {"final_billed_amount": 180.0}})
+        await add_job(db, MAY_2, "Sam", "Ford", 50.0)
+        await buckets.refresh(db, until=date(2024, 5, 31))
+        unmarked = await billed_by_day(db)
+
+        await buckets.mark_days(db, await buckets.job_days(db, [job["id"]]) + [MAY_2])
+        await buckets.refresh(db, until=date(2024, 5, 31))
+        marked = await billed_by_day(db)
+        return unmarked, marked, await db.analytics_dirty.count_documents({})
+
+    unmarked, marked, dirty = asyncio.run(scenario())
+    assert unmarked == [("2024-05-01", 100.0)]
+    assert marked == [("2024-05-01", 180.0), ("2024-05-02", 50.0)]
+    assert dirty == 0
+
+
+def test_days_left_empty_are_removed(db):
+    async def scenario():
+        job = await add_job(db, MAY_1, "Alex", "Subaru", 100.0)
+        buckets = DailyBuckets()
+        await buckets.refresh(db, until=date(2024, 5, 31))
+        await db.jobs.delete_one({"id": job["id"]})
+        await db.billing.delete_many({"job_id": job["id"]})
+        await buckets.mark_days(db, [MAY_1])
+        await buckets.refresh(db, until=date(2024, 5, 31))
+        return await db.analytics_daily.count_documents({})
+
+    assert asyncio.run(scenario()) == 0
@@ -0,0 +1,70 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from utils.archive import Archive, archive_name
+from utils.ids import new_id
+
+LONG_AGO = datetime.now(timezone.utc) - timedelta(days=1000)
+
+
+async def add_job(db, vehicle_id, date: datetime, payment_status: str = "paid", reminder_status=None) -> dict:
+    job = {"id": new_id(), "vehicle_id": vehicle_id, "date": date, "created_at": date}
+    await db.jobs.insert_one(dict(job))
+    await db.billing.insert_one({"id": new_id(), "job_id": job["id"], "payment_status": payment_status, "created_at": date})
+    await db.tune_revisions.insert_one({"id": new_id(), "job_id": job["id"], "vehicle_id": vehicle_id, "created_at": date})
+    if reminder_status:
+        await db.reminders.insert_one({"id": new_id(), "job_id": job["id"], "status": reminder_status, "reminder_date": date})
+    return job
+
+
+async def ids(collection) -> set:
+    return set(await collection.distinct("id"))
+
+
+def test_only_closed_old_jobs_move_with_their_records(db):
+    async def scenario():
+        vehicle_id = new_id()
+        closed = await add_job(db, vehicle_id, LONG_AGO)
+        unpaid = await add_job(db, vehicle_id, LONG_AGO, payment_status="pending")
+        reminded = await add_job(db, vehicle_id, LONG_AGO, reminder_status="pending")
+        recent = await add_job(db, vehicle_id, datetime.now(timezone.utc))
+        days = await Archive().run(db)
+        children = {
+            child: (await db[archive_name(child)].distinct("job_id"), await db[child].distinct("job_id"))
+            for child in ("billing", "tune_revisions")
+        }
+        return {
+            "closed": closed["id"],
+            "open": {unpaid["id"], reminded["id"], recent["id"]},
+            "hot": await ids(db.jobs),
+            "archived": await ids(db[archive_name("jobs")]),
+            "children": children,
+            "days": days,
+        }
+
+    result = asyncio.run(scenario())
+    assert result["hot"] == result["open"]
+    assert result["archived"] == {result["closed"]}
+    for archived, hot in result["children"].values():
+        assert archived == [result["closed"]]
+        assert result["closed"] not in hot
+    assert result["days"]
+
+
+def test_reads_fall_through_to_the_archive_in_order(db):
+    async def scenario():
+        vehicle_id = new_id()
+        oldest = await add_job(db, vehicle_id, LONG_AGO - timedelta(days=10))
+        old = await add_job(db, vehicle_id, LONG_AGO)
+        await Archive().run(db)
+        newest = await add_job(db, vehicle_id, datetime.now(timezone.utc))
+        # Unpaid, so it stays hot even though it is older than the archived ones
+        older_hot = await add_job(db, vehicle_id, LONG_AGO - timedelta(days=20), payment_status="pending")
+        found = await Archive().find(db, "jobs", {"vehicle_id": vehicle_id}, sort=("date", -1))
+        revisions = await Archive().find(db, "tune_revisions", {"vehicle_id": vehicle_id}, sort=("created_at", 1))
+        return [j["id"] for j in found], [newest["id"], old["id"], oldest["id"], older_hot["id"]], revisions
+
+    found, expected, revisions = asyncio.run(scenario())
+    assert found == expected
+    assert len(revisions) == 4
+    assert [r["job_id"] for r in revisions] == list(reversed(expected))
@@ -0,0 +1,34 @@
+import asyncio
+
+from fastapi import FastAPI, Query
+
+from utils.batch import BatchDispatcher
+
+app = FastAPI()
+
+
+@app.get("/api/availability")
+async def availability(start: str, limit: int = Query(10, ge=1)):
+    return {"start": start, "limit": limit}
+
+
+def run(*paths: str) -> list:
+    scope = {"type": "http", "app": app, "headers": [(b"authorization", b"Bearer t")]}
+    return asyncio.run(BatchDispatcher(app.router).run(scope, list(paths)))
+
+
+def test_invalid_sub_request_is_a_422():
+    missing, too_small, ok = run(
+        "/api/availability", "/api/availability?start=a&limit=0", "/api/availability?start=a"
+    )
+    assert missing["status"] == 422
+    assert missing["body"]["detail"][0]["loc"] == ["query", "start"]
+    assert too_small["status"] == 422
+    assert too_small["body"]["detail"][0]["loc"] == ["query", "limit"]
+    assert ok == {"status": 200, "body": {"start": "a", "limit": 10}}
+
+
+def test_unknown_and_excluded_paths():
+    unknown, outside = run("/api/nowhere", "/metrics")
+    assert unknown["status"] == 404
+    assert outside["status"] == 400
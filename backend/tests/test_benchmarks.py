@@ -0,0 +1,19 @@
+import ast
+import json
+from pathlib import Path
+
+BENCHMARKS_DIR = Path(__file__).parent.parent / "benchmarks"
+
+
+def test_reference_run_covers_every_benchmark():
+    # --benchmark-compare skips benchmarks missing from the reference, so a
+    # new one has to be recorded before it can catch a regression
+    (reference,) = BENCHMARKS_DIR.glob("baselines/*/0001_reference.json")
+    recorded = {b["name"].split("[")[0] for b in json.loads(reference.read_text())["benchmarks"]}
+    defined = {
+        node.name
+        for path in BENCHMARKS_DIR.glob("test_*.py")
+        for node in ast.parse(path.read_text()).body
+        if isinstance(node, ast.FunctionDef) and node.name.startswith("test_")
+    }
+    assert defined and defined <= recorded
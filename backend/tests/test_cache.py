@@ -0,0 +1,128 @@
+import asyncio
+import os
+
+import pytest
+
+from utils.archive import archive_name
+from utils.cache import EntityCache, LocalBackend, RedisBackend, cache_backend
+from utils.ids import new_id
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "ignitionlab_test")
+
+import server  # noqa: E402
+from models.customer import CustomerCreate  # noqa: E402
+
+
+def test_cache_backend_urls():
+    assert cache_backend(None) is None
+    assert isinstance(cache_backend("local://"), LocalBackend)
+    with pytest.raises(ValueError):
+        cache_backend("memcached://cache:11211")
+    try:
+        import redis  # noqa: F401
+    except ImportError:
+        return
+    assert isinstance(cache_backend("redis://cache:6379/0"), RedisBackend)
+
+
+def test_hits_are_private_copies_and_misses_expire(db):
+    async def scenario():
+        cache = EntityCache(negative_ttl=0)
+        customer_id = new_id()
+        assert await cache.get(db, "customers", customer_id) is None
+        await db.customers.insert_one({"id": customer_id, "full_name": "Dana"})
+        first = await cache.get(db, "customers", customer_id)
+        first["full_name"] = "changed by the caller"
+        return customer_id, first, await cache.get(db, "customers", customer_id)
+
+    customer_id, first, second = asyncio.run(scenario())
+    assert second == {"id": customer_id, "full_name": "Dana"}
+
+
+def test_archived_documents_are_found(db):
+    async def scenario():
+        job_id = new_id()
+        await db[archive_name("jobs")].insert_one({"id": job_id, "technician_name": "Sam"})
+        return await EntityCache().get(db, "jobs", job_id)
+
+    assert asyncio.run(scenario())["technician_name"] == "Sam"
+
+
+def test_invalidate_drops_local_and_backend_entries_and_tells_other_workers(db):
+    published = []
+
+    async def scenario():
+        backend = LocalBackend()
+        cache = EntityCache(backend=backend)
+        cache.on_invalidate = published.append
+        other_worker = EntityCache(backend=backend)
+        customer_id = new_id()
+        await db.customers.insert_one({"id": customer_id, "full_name": "Dana"})
+        await cache.get(db, "customers", customer_id)
+        await db.customers.update_one({"id": customer_id}, {"$set": {"full_name": "Dana Lee"}})
+        stale = await other_worker.get(db, "customers", customer_id)
+        await cache.invalidate("customers", customer_id, None)
+        other_worker.drop(published[0])
+        return customer_id, stale, await cache.get(db, "customers", customer_id), await other_worker.get(db, "customers", customer_id)
+
+    customer_id, stale, fresh, other = asyncio.run(scenario())
+    assert stale["full_name"] == "Dana"
+    assert fresh["full_name"] == other["full_name"] == "Dana Lee"
+    assert published == [[f"customers:{customer_id}"]]
+
+
+class SlowBackend(LocalBackend):
+    def __init__(self):
+        super().__init__()
+        self.release = asyncio.Event()
+
+    async def get(self, key):
+        await self.release.wait()
+        return await super().get(key)
+
+
+def test_load_invalidated_while_in_flight_is_not_stored(db):
+    async def scenario():
+        backend = SlowBackend()
+        cache = EntityCache(backend=backend)
+        customer_id = new_id()
+        await db.customers.insert_one({"id": customer_id, "full_name": "Dana"})
+        load = asyncio.create_task(cache.get(db, "customers", customer_id))
+        await asyncio.sleep(0)
+        await cache.invalidate("customers", customer_id)
+        backend.release.set()
+        await load
+        return cache.stats()["entries"]
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_least_recently_used_entries_are_evicted(db):
+    async def scenario():
+        cache = EntityCache(max_entries=2)
+        ids = [new_id() for _ in range(3)]
+        await db.customers.insert_many([{"id": i} for i in ids])
+        for i in (ids[0], ids[1], ids[0], ids[2]):
+            await cache.get(db, "customers", i)
+        return ids, set(cache._entries), cache.evictions
+
+    ids, cached, evictions = asyncio.run(scenario())
+    assert cached == {f"customers:{ids[0]}", f"customers:{ids[2]}"}
+    assert evictions == 1
+
+
+def test_customer_update_is_visible_to_the_next_read(db, monkeypatch):
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "entity_cache", EntityCache())
+
+    async def scenario():
+        customer_id = new_id()
+        await db.customers.insert_one({"id": customer_id, "full_name": "Dana", "phone_number": "1"})
+        before = await server.get_customer(customer_id, current_user={})
+        await server.update_customer(customer_id, CustomerCreate(full_name="Dana Lee", phone_number="2"), current_user={})
+        return before, await server.get_customer(customer_id, current_user={})
+
+    before, after = asyncio.run(scenario())
+    assert before["full_name"] == "Dana"
+    assert (after["full_name"], after["phone_number"]) == ("Dana Lee", "2")
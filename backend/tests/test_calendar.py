@@ -0,0 +1,66 @@
+import asyncio
+from datetime import date, datetime, timezone
+
+import pytest
+
+from utils.calendar import date_range_query, ics_event, ics_footer, ics_header, parse_date_range
+from utils.ids import new_id
+
+
+def test_date_range_bounds():
+    assert parse_date_range("2030-03-01", "2030-03-31") == (date(2030, 3, 1), date(2030, 3, 31))
+    assert parse_date_range(None, "2030-03-31") == (None, date(2030, 3, 31))
+    with pytest.raises(ValueError):
+        parse_date_range("2030-03-31", "2030-03-01")
+    with pytest.raises(ValueError):
+        parse_date_range("2030-03-01", "2030-05-01", max_days=31)
+    with pytest.raises(ValueError):
+        parse_date_range("2030-03-01", None, max_days=31)
+    with pytest.raises(ValueError):
+        parse_date_range("March", None)
+
+
+def test_range_covers_the_whole_end_day(db):
+    async def scenario():
+        stored = {
+            "before": datetime(2030, 2, 28, 23, 59, tzinfo=timezone.utc),
+            "first": datetime(2030, 3, 1, tzinfo=timezone.utc),
+            "last evening": datetime(2030, 3, 2, 21, 30, tzinfo=timezone.utc),
+            "after": datetime(2030, 3, 3, tzinfo=timezone.utc),
+        }
+        for name, when in stored.items():
+            await db.reminders.insert_one({"id": new_id(), "message": name, "reminder_date": when})
+        query = {"reminder_date": date_range_query(date(2030, 3, 1), date(2030, 3, 2))}
+        return [r["message"] for r in await db.reminders.find(query).sort("reminder_date", 1).to_list(None)]
+
+    assert asyncio.run(scenario()) == ["first", "last evening"]
+    assert date_range_query(None, None) is None
+
+
+def test_ics_event():
+    appointment = {
+        "id": new_id(),
+        "appointment_date": datetime(2030, 3, 4, tzinfo=timezone.utc),
+        "appointment_time": "09:30",
+        "service_type": "Stage 2 Upgrade",
+        "bay": "Bay 1",
+        "notes": "Bring logs; check boost, AFR",
+        "status": "confirmed",
+    }
+    event = ics_event(appointment, "Arjun Sharma")
+    lines = event.split("\r\n")
+    assert lines[0] == "BEGIN:VEVENT" and lines[-2] == "END:VEVENT" and lines[-1] == ""
+    assert f"UID:{appointment['id']}@ignitionlab-dynamics" in lines
+    assert "DTSTART:20300304T093000" in lines
+    # Stage 2 takes 180 minutes
+    assert "DTEND:20300304T123000" in lines
+    assert "SUMMARY:Stage 2 Upgrade - Arjun Sharma" in lines
+    assert "LOCATION:Bay 1" in lines
+    assert "DESCRIPTION:Bring logs\\; check boost\\, AFR" in lines
+    assert "STATUS:CONFIRMED" in lines
+    assert "STATUS:CANCELLED" in ics_event({**appointment, "status": "cancelled"})
+
+    calendar = ics_header("Workshop, Bengaluru") + event + ics_footer()
+    assert calendar.startswith("BEGIN:VCALENDAR\r\nVERSION:2.0\r\n")
+    assert "X-WR-CALNAME:Workshop\\, Bengaluru\r\n" in calendar
+    assert calendar.endswith("END:VCALENDAR\r\n")
@@ -0,0 +1,83 @@
+import asyncio
+
+from pymongo.errors import AutoReconnect
+
+from utils.cluster import InvalidationChannel, LeaderLease, every, worker_id
+
+
+def test_every_keeps_running_after_database_errors():
+    calls = []
+
+    async def job():
+        calls.append(len(calls))
+        if len(calls) == 1:
+            raise AutoReconnect("primary stepped down")
+
+    async def scenario():
+        task = asyncio.create_task(every(0, job, "job", immediately=True))
+        while len(calls) < 3:
+            await asyncio.sleep(0)
+        task.cancel()
+
+    asyncio.run(scenario())
+    assert calls[:3] == [0, 1, 2]
+
+
+def test_leader_restarts_crashed_jobs_and_stops_them_on_loss(db):
+    started = []
+
+    async def crashing():
+        started.append("crashing")
+        raise RuntimeError("boom")
+
+    async def steady():
+        started.append("steady")
+        await asyncio.Event().wait()
+
+    async def scenario():
+        lease = LeaderLease(db)
+        lease.add_job("crashing", crashing)
+        lease.add_job("steady", steady)
+        lease._start_jobs()
+        await asyncio.sleep(0)
+        steady_task = lease._tasks["steady"]
+        lease._start_jobs()
+        await asyncio.sleep(0)
+        assert lease._tasks["steady"] is steady_task
+        lease._stop_jobs()
+        await asyncio.sleep(0)
+        assert steady_task.cancelled() and lease._tasks == {}
+
+    asyncio.run(scenario())
+    assert started == ["crashing", "steady", "crashing"]
+
+
+def test_published_messages_are_written_in_one_batch(db):
+    async def scenario():
+        channel = InvalidationChannel(db)
+        channel.publish("users", "a")
+        channel.publish("jobs")
+        sender = asyncio.create_task(channel._send())
+        await asyncio.sleep(0)
+        sender.cancel()
+        return await db.invalidations.find({}, {"_id": 0, "created_at": 0}).to_list(None)
+
+    assert asyncio.run(scenario()) == [
+        {"topic": "users", "payload": "a", "origin": worker_id()},
+        {"topic": "jobs", "payload": None, "origin": worker_id()},
+    ]
+
+
+def test_reset_reaches_every_handler_despite_failures(db):
+    received = []
+
+    def broken(payload):
+        raise KeyError(payload)
+
+    channel = InvalidationChannel(db)
+    channel.subscribe("users", broken)
+    channel.subscribe("users", received.append)
+    channel.subscribe("jobs", received.append)
+    channel._deliver("users", "a")
+    channel._reset()
+    assert received == ["a", None, None]
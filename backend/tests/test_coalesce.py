@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from utils.coalesce import SingleFlight
+
+
+class Counter:
+    def __init__(self, result=None, error: Exception = None):
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.result = result
+        self.error = error
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def test_concurrent_requests_share_one_computation():
+    async def scenario():
+        flight = SingleFlight()
+        stats, other = Counter({"jobs": 3}), Counter({"jobs": 0})
+        requests = [asyncio.create_task(flight.do("dashboard", "admin", stats)) for _ in range(3)]
+        requests.append(asyncio.create_task(flight.do("dashboard", "technician", other)))
+        await asyncio.sleep(0)
+        stats.release.set()
+        other.release.set()
+        results = await asyncio.gather(*requests)
+        again = await flight.do("dashboard", "admin", stats)
+        return stats.calls, other.calls, results, again
+
+    stats_calls, other_calls, results, again = asyncio.run(scenario())
+    assert (stats_calls, other_calls) == (2, 1)
+    assert results == [{"jobs": 3}] * 3 + [{"jobs": 0}]
+    assert again == {"jobs": 3}
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    async def scenario():
+        flight = SingleFlight(ttl=60)
+        failing = Counter(error=RuntimeError("query failed"))
+        requests = [asyncio.create_task(flight.do("reminders", "k", failing)) for _ in range(2)]
+        await asyncio.sleep(0)
+        failing.release.set()
+        results = await asyncio.gather(*requests, return_exceptions=True)
+        working = Counter("ok")
+        working.release.set()
+        return failing.calls, results, await flight.do("reminders", "k", working)
+
+    calls, results, retried = asyncio.run(scenario())
+    assert calls == 1
+    assert [str(r) for r in results] == ["query failed"] * 2
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert retried == "ok"
+
+
+def test_a_cancelled_request_does_not_fail_the_others():
+    async def scenario():
+        flight = SingleFlight()
+        slow = Counter("done")
+        first = asyncio.create_task(flight.do("appointments", "k", slow))
+        second = asyncio.create_task(flight.do("appointments", "k", slow))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        slow.release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == "done"
+
+
+def test_results_are_served_for_the_ttl():
+    async def scenario():
+        flight = SingleFlight(ttl=60)
+        counter = Counter("v1")
+        counter.release.set()
+        first = await flight.do("reminders", "k", counter)
+        counter.result = "v2"
+        return counter.calls, first, await flight.do("reminders", "k", counter)
+
+    assert asyncio.run(scenario()) == (1, "v1", "v1")
@@ -0,0 +1,32 @@
+from pymongo import MongoClient
+
+from utils.database import COMPRESSOR_MODULES, analytics_read_preference, available_compressors, mongo_client_options
+
+
+def test_defaults_and_overrides():
+    defaults = mongo_client_options({})
+    assert defaults["maxPoolSize"] == 100
+    assert defaults["compressors"] == available_compressors()
+    assert defaults["uuidRepresentation"] == "standard" and defaults["tz_aware"]
+
+    tuned = mongo_client_options({"MONGO_MAX_POOL_SIZE": "20", "MONGO_COMPRESSORS": "zlib"})
+    assert tuned["maxPoolSize"] == 20
+    assert tuned["compressors"] == "zlib"
+
+
+def test_compressors_keep_preference_order():
+    compressors = available_compressors().split(",")
+    assert "zlib" in compressors
+    assert compressors == [name for name in COMPRESSOR_MODULES if name in compressors]
+
+
+def test_options_are_accepted_by_the_driver():
+    # connect=False: only validates the options, no server needed
+    client = MongoClient("mongodb://localhost:1", connect=False, **mongo_client_options({}))
+    assert client.options.pool_options.max_pool_size == 100
+    client.close()
+
+
+def test_analytics_staleness_has_the_server_minimum():
+    assert analytics_read_preference({}).max_staleness == 120
+    assert analytics_read_preference({"MONGO_ANALYTICS_MAX_STALENESS_S": "10"}).max_staleness == 90
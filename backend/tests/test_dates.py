@@ -0,0 +1,73 @@
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from migrate_dates import DATE_FIELDS, MIGRATION_ID
+from models.job import Job
+from utils.dates import day_key, format_day, to_datetime
+from utils.ids import new_id
+from utils.migrations import convert_string_fields
+
+MAY_1 = datetime(2024, 5, 1, tzinfo=timezone.utc)
+
+
+def test_to_datetime_reads_legacy_values_as_utc():
+    assert to_datetime("2024-05-01") == MAY_1
+    assert to_datetime(date(2024, 5, 1)) == MAY_1
+    assert to_datetime("2024-05-01T09:30:00") == MAY_1 + timedelta(hours=9, minutes=30)
+    assert to_datetime("2024-05-01T09:30:00+05:30") == MAY_1 + timedelta(hours=4)
+    with pytest.raises(ValueError):
+        to_datetime("01/05/2024")
+    with pytest.raises(ValueError):
+        to_datetime(20240501)
+
+
+def test_day_key_and_format_day():
+    assert day_key("2024-05-01T23:30:00-02:00") == "2024-05-02"
+    assert format_day(MAY_1) == "2024-05-01"
+    assert format_day(MAY_1 + timedelta(hours=9)) == "2024-05-01T09:00:00+00:00"
+
+
+def test_models_store_datetimes_and_answer_with_the_old_strings():
+    job = Job(vehicle_id=new_id(), customer_id=new_id(), date="2024-05-01", technician_name="Alex",
+              created_at="2024-05-01T09:00:00")
+    assert job.date == MAY_1
+    dumped = job.model_dump(mode="json")
+    assert dumped["date"] == "2024-05-01"
+    assert dumped["created_at"] == "2024-05-01T09:00:00+00:00"
+
+
+def test_string_dates_are_converted_and_bad_ones_left_alone(db):
+    async def scenario():
+        await db.jobs.insert_many([
+            {"id": new_id(), "date": "2024-05-01", "created_at": "2024-05-01T09:00:00"},
+            {"id": new_id(), "date": MAY_1, "created_at": MAY_1},
+            {"id": new_id(), "date": "someday", "created_at": "2024-05-02T10:00:00+00:00"},
+        ])
+        counts = await convert_string_fields(db, MIGRATION_ID, "jobs", DATE_FIELDS["jobs"], to_datetime, batch_size=2)
+        documents = await db.jobs.find({}, {"_id": 0, "date": 1, "created_at": 1}).sort("_id", 1).to_list(None)
+        return counts, documents
+
+    counts, (legacy, native, bad) = asyncio.run(scenario())
+    assert counts == {"converted": 2, "skipped": 0, "invalid": 1, "conflicts": 0}
+    assert legacy == {"date": MAY_1, "created_at": MAY_1 + timedelta(hours=9)}
+    assert native == {"date": MAY_1, "created_at": MAY_1}
+    assert bad == {"date": "someday", "created_at": datetime(2024, 5, 2, 10, tzinfo=timezone.utc)}
+
+
+def test_conversion_resumes_from_its_checkpoint(db):
+    async def scenario():
+        await db.billing.insert_many([{"id": new_id(), "created_at": f"2024-05-0{day}"} for day in (1, 2, 3)])
+        first = await db.billing.find_one({}, sort=[("_id", 1)])
+        # An interrupted run that got through the first document
+        await db.migrations.insert_one({"_id": MIGRATION_ID, "progress": {"billing": {"last_id": first["_id"]}}})
+        resumed = await convert_string_fields(db, MIGRATION_ID, "billing", ["created_at"], to_datetime)
+        again = await convert_string_fields(db, MIGRATION_ID, "billing", ["created_at"], to_datetime)
+        untouched = await db.billing.find_one({"_id": first["_id"]})
+        return resumed, again, untouched["created_at"]
+
+    resumed, again, untouched = asyncio.run(scenario())
+    assert resumed["converted"] == 2
+    assert again["converted"] == 0
+    assert untouched == "2024-05-01"
@@ -0,0 +1,95 @@
+import asyncio
+
+from utils.events import EventBus
+
+
+async def settle():
+    # Let the buses append and catch up
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+
+async def cluster(db, count: int = 2):
+    """Buses standing in for separate worker processes, relaying to each other like the server does."""
+    buses = [EventBus(db) for _ in range(count)]
+    for bus in buses:
+        bus.relay = lambda: [other.notify() for other in buses]
+        await bus.ensure()
+    tasks = [asyncio.create_task(bus.run()) for bus in buses]
+    return buses, tasks
+
+
+async def drain(queue: asyncio.Queue) -> list:
+    events = []
+    while not queue.empty():
+        events.append(queue.get_nowait())
+    return events
+
+
+def test_workers_see_the_same_ids_in_the_same_order(db):
+    async def scenario():
+        (first, second), tasks = await cluster(db)
+        queues = [first.subscribe(), second.subscribe()]
+        first.publish("job.created", {"n": 1})
+        second.publish("billing.paid", {"n": 2})
+        first.publish("job.created", {"n": 3})
+        await settle()
+        for task in tasks:
+            task.cancel()
+        return [[(e["id"], e["data"]["n"]) for e in await drain(queue)] for queue in queues]
+
+    seen_first, seen_second = asyncio.run(scenario())
+    assert seen_first == seen_second
+    assert [seq for seq, _ in seen_first] == [1, 2, 3]
+
+
+def test_replay_after_reconnecting_to_another_worker(db):
+    async def scenario():
+        (first, second), tasks = await cluster(db)
+        for n in range(1, 5):
+            first.publish("job.created", {"n": n})
+        await settle()
+        replayed = await second.replay("2")
+        unknown = await second.replay("99")
+        for task in tasks:
+            task.cancel()
+        return replayed, unknown
+
+    replayed, unknown = asyncio.run(scenario())
+    assert [e["id"] for e in replayed] == [3, 4]
+    assert unknown is None
+
+
+def test_change_is_logged_once(db):
+    async def scenario():
+        buses, tasks = await cluster(db)
+        # Every worker watching the change stream appends the same change
+        for bus in buses:
+            await bus._append("job.created", {"n": 1}, key="token:0")
+        for task in tasks:
+            task.cancel()
+        return await db.events.count_documents({})
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_numbering_survives_an_expired_log(db):
+    async def scenario():
+        (running,), tasks = await cluster(db, 1)
+        queue = running.subscribe()
+        for n in range(1, 4):
+            running.publish("job.created", {"n": n})
+        await settle()
+        # The TTL index has removed everything, then another worker starts
+        await db.events.delete_many({})
+        restarted = EventBus(db)
+        restarted.relay = running.notify
+        await restarted.ensure()
+        tasks.append(asyncio.create_task(restarted.run()))
+        restarted.publish("billing.paid", {"n": 4})
+        await settle()
+        for task in tasks:
+            task.cancel()
+        return [(e["id"], e["data"]["n"]) for e in await drain(queue)]
+
+    assert asyncio.run(scenario()) == [(1, 1), (2, 2), (3, 3), (4, 4)]
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+from utils.archive import archive_name
+from utils.expand import RelationLoader, parse_expand
+from utils.ids import new_id
+
+
+def test_parse_expand():
+    assert parse_expand(None, ["customer"]) == set()
+    assert parse_expand(" customer, vehicle ,", ["customer", "vehicle", "job"]) == {"customer", "vehicle"}
+    with pytest.raises(ValueError, match="Cannot expand job, owner; choose from customer, vehicle"):
+        parse_expand("customer,owner,job", ["customer", "vehicle"])
+
+
+def test_billing_rows_reach_customer_and_vehicle_through_their_job(db):
+    async def scenario():
+        customer = {"id": new_id(), "full_name": "Dana", "phone_number": "1", "email": "d@example.com"}
+        vehicle = {"id": new_id(), "make": "Subaru", "model": "WRX", "registration_number": "AB12"}
+        hot = {"id": new_id(), "customer_id": customer["id"], "vehicle_id": vehicle["id"], "technician_name": "Alex"}
+        archived = {"id": new_id(), "customer_id": customer["id"], "vehicle_id": vehicle["id"], "technician_name": "Sam"}
+        await db.customers.insert_one(dict(customer))
+        await db.vehicles.insert_one(dict(vehicle))
+        await db.jobs.insert_one(dict(hot))
+        await db[archive_name("jobs")].insert_one(dict(archived))
+        rows = [{"id": new_id(), "job_id": job_id} for job_id in (hot["id"], archived["id"], new_id())]
+        await RelationLoader(db).expand(rows, {"job", "customer", "vehicle"})
+        return customer, rows
+
+    customer, (first, second, orphan) = asyncio.run(scenario())
+    assert first["job"]["technician_name"] == "Alex"
+    assert second["job"]["technician_name"] == "Sam"
+    assert first["customer"] == second["customer"] == {k: customer[k] for k in ("id", "full_name", "phone_number")}
+    assert first["vehicle"]["registration_number"] == "AB12"
+    assert orphan["job"] is None and orphan["customer"] is None and orphan["vehicle"] is None
+
+
+def test_results_and_misses_are_memoised_per_loader(db):
+    async def scenario():
+        customer_id, unknown_id = new_id(), new_id()
+        await db.customers.insert_one({"id": customer_id, "full_name": "Dana"})
+        loader = RelationLoader(db)
+        first = await loader.load_many("customer", [customer_id, unknown_id, None])
+        await db.customers.delete_many({})
+        await db.customers.insert_one({"id": unknown_id, "full_name": "Late"})
+        again = await loader.load_many("customer", [customer_id, unknown_id])
+        fresh = await RelationLoader(db).load_many("customer", [customer_id, unknown_id])
+        return customer_id, unknown_id, first, again, fresh
+
+    customer_id, unknown_id, first, again, fresh = asyncio.run(scenario())
+    assert first == again == {customer_id: {"id": customer_id, "full_name": "Dana"}, unknown_id: None}
+    assert fresh == {customer_id: None, unknown_id: {"id": unknown_id, "full_name": "Late"}}
@@ -0,0 +1,64 @@
+import asyncio
+import os
+import time
+from datetime import timedelta
+
+from utils.archive import archive_name
+from utils.files import UploadCollector, write_file
+from utils.ids import new_id
+
+WEEK_AGO = time.time() - 8 * 86400
+
+
+async def add_upload(db, directory, recorded: bool = True, **owner):
+    """An upload written over a week ago, with its `uploads` record unless `recorded` is off."""
+    file_id = new_id()
+    path = directory / f"{file_id}.bin"
+    write_file(path, b"map")
+    os.utime(path, (WEEK_AGO, WEEK_AGO))
+    if recorded:
+        await db.uploads.insert_one({"id": file_id, "filename": "stage1.bin", **owner})
+    return path
+
+
+def collector(directory) -> UploadCollector:
+    return UploadCollector(directory, grace=timedelta(days=7), pause=0)
+
+
+def test_owned_and_referenced_uploads_survive(db, tmp_path):
+    async def scenario():
+        job_id, archived_job_id, revision_id = new_id(), new_id(), new_id()
+        await db.jobs.insert_one({"id": job_id})
+        await db[archive_name("jobs")].insert_one({"id": archived_job_id})
+        await db.tune_revisions.insert_one({"id": revision_id})
+        kept = [
+            await add_upload(db, tmp_path, job_id=job_id),
+            await add_upload(db, tmp_path, job_id=archived_job_id),
+            await add_upload(db, tmp_path, revision_id=revision_id),
+        ]
+        referenced = await add_upload(db, tmp_path)
+        await db.jobs.insert_one({"id": new_id(), "files_uploaded": [f"/api/uploads/{referenced.stem}"]})
+        return await collector(tmp_path).run(db), kept + [referenced]
+
+    removed, kept = asyncio.run(scenario())
+    assert removed == 0
+    assert all(path.exists() for path in kept)
+
+
+def test_unowned_uploads_go_after_the_grace_period(db, tmp_path):
+    async def scenario():
+        orphan = await add_upload(db, tmp_path)
+        # Its job has since been deleted
+        abandoned = await add_upload(db, tmp_path, job_id=new_id())
+        fresh = await add_upload(db, tmp_path)
+        os.utime(fresh, None)
+        # Written before uploads were recorded, so its owner is unknown
+        legacy = await add_upload(db, tmp_path, recorded=False)
+        removed = await collector(tmp_path).run(db)
+        return removed, [orphan, abandoned], [fresh, legacy], await db.uploads.count_documents({})
+
+    removed, gone, kept, records = asyncio.run(scenario())
+    assert removed == 2
+    assert not any(path.exists() for path in gone)
+    assert all(path.exists() for path in kept)
+    assert records == 1
@@ -0,0 +1,84 @@
+import asyncio
+
+from pymongo.errors import ConnectionFailure
+
+from utils.health import CircuitBreakerMiddleware, DatabaseMonitor
+
+
+class FailingDB:
+    async def command(self, name):
+        raise ConnectionFailure("connection refused")
+
+
+def call(app, path: str = "/api/jobs") -> list:
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(app({"type": "http", "path": path}, receive, send))
+    return messages
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def disconnected_app(scope, receive, send):
+    raise ConnectionFailure("no primary")
+
+
+def test_check_reports_health_and_initialization(db):
+    monitor = DatabaseMonitor()
+    asyncio.run(monitor.check(db))
+    assert monitor.is_healthy and not monitor.initialized
+    assert monitor.state()["database"] == "connected"
+
+    asyncio.run(db.users.insert_one({"username": "admin"}))
+    asyncio.run(monitor.check(db))
+    assert monitor.initialized
+
+
+def test_circuit_opens_after_threshold_and_closes_on_success(db):
+    monitor = DatabaseMonitor(failure_threshold=2)
+    asyncio.run(monitor.check(FailingDB()))
+    assert not monitor.circuit_open and not monitor.is_healthy
+    asyncio.run(monitor.check(FailingDB()))
+    assert monitor.circuit_open
+    assert monitor.state() | {"latency_ms": None, "last_checked_at": None} == {
+        "database": "unavailable", "circuit": "open", "latency_ms": None,
+        "last_checked_at": None, "consecutive_failures": 2,
+    }
+
+    asyncio.run(monitor.check(db))
+    assert not monitor.circuit_open and monitor.consecutive_failures == 0
+
+
+def test_stale_check_counts_as_unhealthy(db):
+    monitor = DatabaseMonitor(interval=5.0)
+    asyncio.run(monitor.check(db))
+    monitor._last_check -= 60
+    assert not monitor.is_healthy
+
+
+def test_open_circuit_answers_503_except_on_probes():
+    monitor = DatabaseMonitor(retry_interval=2.0)
+    monitor.circuit_open = True
+    app = CircuitBreakerMiddleware(ok_app, monitor)
+
+    start, body = call(app)
+    assert start["status"] == 503
+    assert (b"retry-after", b"2") in start["headers"]
+    assert body["body"] == b'{"detail": "Database unavailable"}'
+    assert call(app, "/health")[0]["status"] == 200
+
+
+def test_connection_failure_becomes_503_and_counts_against_circuit():
+    monitor = DatabaseMonitor(failure_threshold=1)
+    app = CircuitBreakerMiddleware(disconnected_app, monitor)
+    assert call(app)[0]["status"] == 503
+    assert monitor.circuit_open and monitor.error == "no primary"
@@ -0,0 +1,27 @@
+import asyncio
+
+from utils.ids import BINARY_IDS_MIGRATION, binary_ids_ready, new_id
+
+
+def test_new_database_is_ready_and_marked(db):
+    async def scenario():
+        await db.customers.insert_one({"id": new_id()})
+        ready = await binary_ids_ready(db)
+        return ready, await db.migrations.find_one({"_id": BINARY_IDS_MIGRATION})
+
+    ready, marker = asyncio.run(scenario())
+    assert ready
+    assert marker["completed_in_seconds"] == 0
+
+
+def test_string_ids_block_until_migrated(db):
+    async def scenario():
+        await db.vehicles.insert_one({"id": new_id(), "customer_id": str(new_id())})
+        before = await binary_ids_ready(db)
+        # What migrate_ids.py records when it finishes
+        await db.migrations.update_one(
+            {"_id": BINARY_IDS_MIGRATION}, {"$set": {"completed_in_seconds": 12.5}}, upsert=True
+        )
+        return before, await binary_ids_ready(db)
+
+    assert asyncio.run(scenario()) == (False, True)
@@ -0,0 +1,58 @@
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+
+# The harness lives at the repository root, next to backend/
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from backend_load_test import DEFAULT_MIX, LoadTester, compare, parse_mix, percentile  # noqa: E402
+
+
+def test_nearest_rank_percentiles():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile([3.0], 99) == 3.0
+    assert percentile([], 50) == 0.0
+
+
+def test_mix_overrides():
+    mix = parse_mix("dashboard=1,upload=0")
+    assert mix["dashboard"] == 1 and "upload" not in mix
+    assert mix["list_jobs"] == DEFAULT_MIX["list_jobs"]
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_mix("nonsense=3")
+
+
+def test_errors_and_latencies_per_workload():
+    def respond(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(500 if request.url.path == "/api/customers" else 200, json={})
+
+    async def scenario():
+        tester = LoadTester("http://test", "admin", "admin", users=2, duration=0, seed=1, timeout=1,
+                            mix={"dashboard": 1, "list_customers": 1})
+        async with httpx.AsyncClient(base_url="http://test", transport=httpx.MockTransport(respond)) as client:
+            deadline = time.monotonic() + 0.05
+            await asyncio.gather(*(tester.virtual_user(client, i, deadline) for i in range(2)))
+        return tester.summarise(elapsed=0.05)
+
+    result = asyncio.run(scenario())
+    endpoints = result["endpoints"]
+    assert endpoints["dashboard"]["errors"] == 0
+    assert endpoints["list_customers"]["error_rate"] == 1
+    assert result["total"]["requests"] == endpoints["dashboard"]["requests"] + endpoints["list_customers"]["requests"]
+    assert endpoints["dashboard"]["p50_ms"] <= endpoints["dashboard"]["p99_ms"] <= endpoints["dashboard"]["max_ms"]
+
+
+def test_compare_flags_regressions():
+    def run(p95: float, error_rate: float = 0.0) -> dict:
+        return {"timestamp": "t", "endpoints": {"dashboard": {"p95_ms": p95, "p99_ms": 10.0, "error_rate": error_rate}}}
+
+    assert compare(run(10.5), run(10.0), threshold=10)
+    assert not compare(run(12.0), run(10.0), threshold=10)
+    assert not compare(run(10.0, error_rate=0.05), run(10.0), threshold=10)
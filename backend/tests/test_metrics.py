@@ -0,0 +1,62 @@
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from utils.metrics import (
+    Histogram, MetricsMiddleware, MetricsRoute, Registry, command_collection,
+    http_request_duration_seconds, http_requests_in_flight, http_requests_total,
+)
+
+
+def metrics_app() -> FastAPI:
+    app = FastAPI()
+    router = APIRouter(prefix="/api", route_class=MetricsRoute)
+    seen_in_flight = []
+
+    @router.get("/gauges/{gauge_id}")
+    async def get_gauge(gauge_id: int):
+        seen_in_flight.append(http_requests_in_flight.values()[("/api/gauges/{gauge_id}", "GET")])
+        return {"id": gauge_id}
+
+    app.include_router(router)
+    app.add_middleware(MetricsMiddleware, routes_provider=lambda: app.routes)
+    app.state.seen_in_flight = seen_in_flight
+    return app
+
+
+def test_requests_are_labelled_by_route_template():
+    app = metrics_app()
+    with TestClient(app) as client:
+        for gauge_id in ("1", "2", "x"):
+            client.get(f"/api/gauges/{gauge_id}")
+        client.get("/api/nowhere/7")
+
+    counts = http_requests_total.values()
+    assert counts[("/api/gauges/{gauge_id}", "GET", "200")] == 2
+    assert counts[("/api/gauges/{gauge_id}", "GET", "422")] == 1
+    assert counts[("unmatched", "GET", "404")] >= 1
+    assert not any("/api/gauges/1" in key[0] for key in counts)
+    assert http_request_duration_seconds.summary()[("/api/gauges/{gauge_id}", "GET")]["count"] == 3
+    # Counted while the handler ran, released afterwards
+    assert app.state.seen_in_flight == [1, 1]
+    assert http_requests_in_flight.values()[("/api/gauges/{gauge_id}", "GET")] == 0
+
+
+def test_histogram_exposition():
+    registry = Registry()
+    latency = registry.register(Histogram("test_seconds", "Test latency", ("route",), buckets=(0.1, 1.0)))
+    for value in (0.05, 0.5, 5.0):
+        latency.observe("/a", value=value)
+
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP test_seconds Test latency", "# TYPE test_seconds histogram"]
+    assert 'test_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{route="/a",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{route="/a"} 3' in lines
+
+
+def test_command_collection():
+    assert command_collection("find", {"find": "jobs"}) == "jobs"
+    assert command_collection("getMore", {"getMore": 1, "collection": "billing"}) == "billing"
+    assert command_collection("aggregate", {"aggregate": 1}) == "-"
+    assert command_collection("ping", {"ping": 1}) == "-"
@@ -0,0 +1,64 @@
+import asyncio
+import itertools
+from types import SimpleNamespace
+
+from utils.profiler import SlowQueryProfiler, filter_fields, redact
+
+request_ids = itertools.count()
+
+
+class ExplainingClient:
+    """Stands in for the Motor client: every explain reports a collection scan."""
+
+    def __init__(self):
+        self.explained = []
+
+    def __getitem__(self, database_name):
+        return self
+
+    async def command(self, command):
+        self.explained.append(command)
+        return {"queryPlanner": {"winningPlan": {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}},
+                                 "rejectedPlans": [{"stage": "IXSCAN"}]}}
+
+
+def run_command(profiler, command_name: str, command: dict, duration_ms: float):
+    event = SimpleNamespace(connection_id=("db", 27017), request_id=next(request_ids), command_name=command_name,
+                            command=command, database_name="ignitionlab", duration_micros=int(duration_ms * 1000))
+    profiler.started(event)
+    profiler.succeeded(event)
+
+
+def test_redaction_keeps_the_shape():
+    query = {"status": "pending", "$or": [{"job_id": 1}, {"reminder_date": {"$lt": "2030"}}], "tags": ["a", "b"]}
+    assert redact(query) == {"status": "?", "$or": [{"job_id": "?"}, {"reminder_date": {"$lt": "?"}}], "tags": ["?"]}
+    assert filter_fields(query) == ["status", "job_id", "reminder_date", "tags"]
+
+
+def test_slow_collection_scans_become_findings():
+    async def scenario():
+        client = ExplainingClient()
+        profiler = SlowQueryProfiler(threshold_ms=50)
+        profiler.attach(client, asyncio.get_running_loop())
+        find = {"find": "jobs", "filter": {"technician_name": "Farhan"}, "lsid": {"id": 1}, "$db": "ignitionlab"}
+        run_command(profiler, "find", find, duration_ms=5)
+        run_command(profiler, "find", find, duration_ms=120)
+        for _ in range(3):
+            await asyncio.sleep(0)
+        # Same shape again: counted, not explained again within the cooldown
+        run_command(profiler, "find", {**find, "filter": {"technician_name": "Deepak"}}, duration_ms=300)
+        for _ in range(3):
+            await asyncio.sleep(0)
+        return client.explained, profiler.report()
+
+    explained, report = asyncio.run(scenario())
+    assert len(explained) == 1
+    assert "lsid" not in explained[0]["explain"] and "$db" not in explained[0]["explain"]
+    assert [e["duration_ms"] for e in report["entries"]] == [300, 120]
+    assert report["entries"][1]["collscan"] is True
+    assert report["entries"][1]["filter_shape"] == {"technician_name": "?"}
+    (finding,) = report["findings"]
+    assert finding["finding"] == "missing_index"
+    assert finding["fields"] == ["technician_name"]
+    assert finding["occurrences"] == 2
+    assert finding["max_duration_ms"] == 300
@@ -0,0 +1,95 @@
+import asyncio
+from datetime import date, datetime, timezone
+
+import pytest
+from pydantic import ValidationError
+
+from models.appointment import AppointmentCreate
+from utils.ids import new_id
+from utils.scheduling import SlotEngine, SlotUnavailableError
+
+DAY = date(2030, 3, 4)
+
+
+def appointment(time: str, bay=None, service_type: str = "Diagnostics") -> dict:
+    return {
+        "id": new_id(),
+        "appointment_date": datetime(DAY.year, DAY.month, DAY.day, tzinfo=timezone.utc),
+        "appointment_time": time,
+        "service_type": service_type,
+        "bay": bay,
+    }
+
+
+async def workers(db, count: int = 2):
+    """Engines standing in for separate worker processes, each with the day already cached."""
+    engines = [SlotEngine(["Bay 1", "Bay 2"]) for _ in range(count)]
+    await engines[0].ensure_indexes(db)
+    for engine in engines:
+        await engine.availability(db, DAY, DAY, 60)
+    return engines
+
+
+def test_conflict_moves_to_next_bay(db):
+    async def scenario():
+        first, second = await workers(db)
+        booked = await first.book(db, appointment("09:00"))
+        # `second` still has the day cached as empty, so it tries Bay 1 first
+        retried = await second.book(db, appointment("09:00"))
+        return booked, retried
+
+    booked, retried = asyncio.run(scenario())
+    assert booked["bay"] == "Bay 1"
+    assert retried["bay"] == "Bay 2"
+
+
+def test_conflict_removes_partial_slots(db):
+    async def scenario():
+        first, second = await workers(db)
+        await first.book(db, appointment("09:30", bay="Bay 1"))
+        # 09:00-10:00 reserves the 09:00 block before colliding on 09:30
+        late = appointment("09:00", bay="Bay 1")
+        with pytest.raises(SlotUnavailableError):
+            await second.book(db, late)
+        return late, await db.appointment_slots.count_documents({"appointment_id": late["id"]})
+
+    late, leftover = asyncio.run(scenario())
+    assert leftover == 0
+
+
+def test_concurrent_bookings_share_bays(db):
+    async def scenario():
+        engines = await workers(db, 3)
+        return await asyncio.gather(
+            *(engine.book(db, appointment("10:00")) for engine in engines), return_exceptions=True
+        )
+
+    results = asyncio.run(scenario())
+    booked = sorted(r["bay"] for r in results if isinstance(r, dict))
+    assert booked == ["Bay 1", "Bay 2"]
+    assert sum(isinstance(r, SlotUnavailableError) for r in results) == 1
+
+
+def test_overlapping_legacy_appointments_still_block(db):
+    async def scenario():
+        # Booked before bays and conflict checks: three at once on two bays
+        for time, minutes in (("09:00", 180), ("09:00", 180), ("10:00", 30)):
+            await db.appointments.insert_one(
+                {**appointment(time), "bay": None, "duration_minutes": minutes, "status": "scheduled"}
+            )
+        (engine,) = await workers(db, 1)
+        with pytest.raises(SlotUnavailableError):
+            await engine.book(db, appointment("11:00", bay="Bay 1"))
+        with pytest.raises(SlotUnavailableError):
+            await engine.book(db, appointment("11:00"))
+        return await engine.availability(db, DAY, DAY, 30)
+
+    free = asyncio.run(scenario())
+    assert min(slot["start_time"] for slot in free) == "12:00"
+
+
+@pytest.mark.parametrize("minutes", [0, -30])
+def test_duration_must_cover_a_booking(minutes):
+    with pytest.raises(ValidationError):
+        AppointmentCreate(**{**appointment("09:00"), "customer_id": new_id(), "vehicle_id": new_id(),
+                             "duration_minutes": minutes})
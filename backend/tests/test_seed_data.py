@@ -0,0 +1,47 @@
+import asyncio
+import random
+from collections import defaultdict
+
+from seed_data import Seeder
+from utils.scheduling import parse_time
+
+
+def test_seeded_data_is_consistent(db, tmp_path):
+    async def scenario():
+        seeder = Seeder(db, random.Random(7), years=0.1, batch_size=50, workers=4, uploads=True)
+        seeder.upload_dir = tmp_path
+        for index in range(150):
+            await seeder.customer(index)
+        await seeder.finish()
+        documents = {}
+        for name in seeder.counts:
+            documents[name] = await db[name].find({}, {"_id": 0}).to_list(None)
+        return seeder, documents
+
+    seeder, documents = asyncio.run(scenario())
+    assert all(len(documents[name]) == count for name, count in seeder.counts.items())
+    ids = {name: {d["id"] for d in docs if "id" in d} for name, docs in documents.items()}
+    assert all(v["customer_id"] in ids["customers"] for v in documents["vehicles"])
+    assert all(j["vehicle_id"] in ids["vehicles"] for j in documents["jobs"])
+    assert all(b["job_id"] in ids["jobs"] for b in documents["billing"])
+    assert all(r["job_id"] in ids["jobs"] for r in documents["tune_revisions"])
+
+    # Every active appointment has a bay, its slots, and no overlap on that bay
+    booked = defaultdict(list)
+    slots = {(s["appointment_id"], s["resource"], s["slot"]) for s in documents["appointment_slots"]}
+    assert len(slots) == len(documents["appointment_slots"])
+    for appointment in documents["appointments"]:
+        if appointment["status"] == "cancelled":
+            continue
+        start = parse_time(appointment["appointment_time"])
+        end = start + appointment["duration_minutes"]
+        key = (appointment["appointment_date"], appointment["bay"])
+        assert appointment["bay"] and not any(s < end and e > start for s, e in booked[key])
+        booked[key].append((start, end))
+        assert (appointment["id"], f"bay:{appointment['bay']}", start // 30) in slots
+
+    # Dummy files are owned by the job that lists them
+    uploads = {str(u["id"]): u["job_id"] for u in documents["uploads"]}
+    listed = {f: j["id"] for j in documents["jobs"] for f in j.get("files_uploaded") or []}
+    assert uploads and listed == uploads
+    assert {p.stem for p in tmp_path.iterdir()} == set(uploads)
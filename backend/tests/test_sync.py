@@ -0,0 +1,94 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from utils.ids import new_id
+from utils.sync import ChangeLog, SyncTokenExpired
+
+
+async def add_customer(db, change_log: ChangeLog, name: str):
+    customer = {"id": new_id(), "full_name": name}
+    await db.customers.insert_one(dict(customer))
+    await change_log.record(db, "customers", [customer["id"]])
+    return customer["id"]
+
+
+def test_changes_come_in_sequence_order_across_pages(db):
+    async def scenario():
+        change_log = ChangeLog(settle_seconds=0)
+        first = await add_customer(db, change_log, "First")
+        second = await add_customer(db, change_log, "Second")
+        third = await add_customer(db, change_log, "Third")
+        # Updating the first moves it behind the others
+        await change_log.record(db, "customers", [first])
+
+        pages, token = [], 0
+        while True:
+            page = await change_log.changes(db, token, limit=2)
+            pages.append([c["id"] for c in page["changes"]["customers"]])
+            token = page["token"]
+            if not page["has_more"]:
+                return pages, token, [second, third, first]
+
+    pages, token, expected = asyncio.run(scenario())
+    assert [i for page in pages for i in page] == [str(i) for i in expected]
+    assert token == 4
+
+
+def test_unsettled_entry_holds_back_later_ones(db):
+    async def scenario():
+        change_log = ChangeLog(settle_seconds=60)
+        early, late = new_id(), new_id()
+        for document_id in (early, late):
+            await db.customers.insert_one({"id": document_id})
+        # Sequence 2 landed and settled before sequence 1 was written
+        await db.changes.insert_one({
+            "collection": "customers", "id": late, "seq": 2, "deleted": False,
+            "at": datetime.now(timezone.utc) - timedelta(minutes=5),
+        })
+        await db.changes.insert_one({
+            "collection": "customers", "id": early, "seq": 1, "deleted": False, "at": datetime.now(timezone.utc),
+        })
+        return await change_log.changes(db, 0, limit=10)
+
+    page = asyncio.run(scenario())
+    assert page["token"] == 0
+    assert page["changes"]["customers"] == []
+
+
+def test_tombstones_and_pruned_tokens(db):
+    async def scenario():
+        change_log = ChangeLog(settle_seconds=0, tombstone_retention=timedelta(days=30))
+        await add_customer(db, change_log, "Kept")
+        gone = await add_customer(db, change_log, "Gone")
+        await db.customers.delete_one({"id": gone})
+        await change_log.record(db, "customers", [gone], deleted=True)
+        page = await change_log.changes(db, 1, limit=10)
+
+        await change_log.prune(db)
+        # Nothing is past retention yet, so old tokens still work
+        await change_log.changes(db, 1, limit=10)
+        await db.changes.update_one({"id": gone}, {"$set": {"at": datetime.now(timezone.utc) - timedelta(days=31)}})
+        await change_log.prune(db)
+        with pytest.raises(SyncTokenExpired):
+            await change_log.changes(db, 1, limit=10)
+        return gone, page
+
+    gone, page = asyncio.run(scenario())
+    assert page["deleted"]["customers"] == [gone]
+    assert page["changes"]["customers"] == []
+    assert page["token"] == 3
+
+
+def test_backfill_runs_once(db):
+    async def scenario():
+        change_log = ChangeLog(settle_seconds=0)
+        # Written before the change log existed
+        await db.customers.insert_one({"id": new_id(), "full_name": "Old"})
+        await change_log.backfill(db)
+        await db.customers.insert_one({"id": new_id(), "full_name": "Unlogged"})
+        await change_log.backfill(db)
+        return await db.changes.count_documents({})
+
+    assert asyncio.run(scenario()) == 1
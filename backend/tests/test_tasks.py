@@ -0,0 +1,26 @@
+import asyncio
+
+import pytest
+
+from utils.tasks import WorkerPool
+
+
+def test_pool_exists_only_between_start_and_shutdown():
+    async def scenario():
+        pool = WorkerPool("process", 1)
+        with pytest.raises(RuntimeError):
+            await pool.run(abs, -1)
+        pool.start()
+        try:
+            return await pool.run(abs, -2)
+        finally:
+            pool.shutdown(wait=True)
+
+    pool = WorkerPool("process", 1)
+    assert pool._executor is None
+    assert asyncio.run(scenario()) == 2
+
+
+def test_unknown_kind_is_rejected_up_front():
+    with pytest.raises(ValueError):
+        WorkerPool("fork", 1)
@@ -0,0 +1,43 @@
+import os
+
+from utils.archive import archive_name
+from utils.ids import new_id
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "ignitionlab_test")
+
+from server import archived_jobs_pipeline, vehicle_timeline_pipeline  # noqa: E402
+
+
+def lookups(stages: list) -> dict:
+    return {s["$lookup"]["as"]: s["$lookup"] for s in stages if "$lookup" in s}
+
+
+def test_job_records_are_joined_only_for_the_page():
+    vehicle_id = new_id()
+    pipeline = vehicle_timeline_pipeline(vehicle_id, skip=20, limit=10, include_qr=False)
+    assert pipeline[0] == {"$match": {"id": vehicle_id}}
+    assert pipeline[1] == {"$project": {"_id": 0, "qr_code": 0}}
+
+    joined = lookups(pipeline)
+    assert set(joined) == {"customer", "jobs", "job_count", "reminders"}
+    jobs = joined["jobs"]["pipeline"]
+    assert jobs[1:4] == [{"$sort": {"date": -1, "created_at": -1}}, {"$skip": 20}, {"$limit": 10}]
+    assert {name: lookup["from"] for name, lookup in lookups(jobs).items()} == {
+        "tune_revisions": "tune_revisions", "billing": "billing", "reminders": "reminders",
+    }
+    assert {"$count": "total"} in joined["job_count"]["pipeline"]
+    assert {"$match": {"job_id": None}} in joined["reminders"]["pipeline"]
+
+
+def test_qr_code_is_only_kept_on_request():
+    pipeline = vehicle_timeline_pipeline(new_id(), skip=0, limit=10, include_qr=True)
+    assert pipeline[1] == {"$project": {"_id": 0}}
+
+
+def test_archived_jobs_join_archived_records():
+    pipeline = archived_jobs_pipeline(new_id(), limit=30)
+    assert {"$limit": 30} in pipeline
+    assert {name: lookup["from"] for name, lookup in lookups(pipeline).items()} == {
+        name: archive_name(name) for name in ("tune_revisions", "billing", "reminders")
+    }
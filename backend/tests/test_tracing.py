@@ -0,0 +1,55 @@
+import asyncio
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from utils.tracing import SpanExporter, Tracer, TracingMiddleware, configure, to_otlp, trace_span
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+def traced_app(tracer: Tracer) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/jobs/{job_id}")
+    async def get_job(job_id: str):
+        with trace_span("render", job_id=job_id):
+            return {"id": job_id}
+
+    app.add_middleware(TracingMiddleware, tracer=tracer)
+    return app
+
+
+def test_sampled_requests_are_exported_with_their_children(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    tracer = Tracer(sample_rate=0, exporter=SpanExporter(path=path))
+    configure(tracer)
+    with TestClient(traced_app(tracer)) as client:
+        client.get("/api/jobs/1")
+        client.get("/api/jobs/2", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})
+        # Not sampled by the caller, and the sample rate is 0
+        client.get("/api/jobs/3", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-00"})
+    asyncio.run(tracer.exporter.flush())
+
+    child, root = [json.loads(line) for line in path.read_text().splitlines()]
+    assert root["name"] == "GET /api/jobs/{job_id}"
+    assert root["trace_id"] == TRACE_ID and root["parent_id"] == PARENT_ID
+    assert root["attributes"]["http.target"] == "/api/jobs/2"
+    assert root["attributes"]["http.status_code"] == 200
+    assert child["name"] == "render"
+    assert child["trace_id"] == TRACE_ID and child["parent_id"] == root["span_id"]
+    assert child["attributes"] == {"job_id": "2"}
+
+
+def test_otlp_encoding():
+    tracer = Tracer(sample_rate=1, exporter=SpanExporter())
+    span = tracer.start_request_span("GET /api/health", None)
+    span.error = "boom"
+    tracer.exporter.finish(span)
+
+    (encoded,) = to_otlp([span])["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert encoded["traceId"] == span.trace_id and len(encoded["traceId"]) == 32
+    assert encoded["kind"] == 2
+    assert encoded["status"] == {"code": 2, "message": "boom"}
@@ -0,0 +1,244 @@
+import asyncio
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+from pymongo import DeleteOne, ReplaceOne
+
+from utils.archive import archive_name
+from utils.calendar import date_range_query
+from utils.dates import day_key
+
+# Breakdown dimensions and where their value comes from once billing is joined
+# to its job and the job's vehicle
+DIMENSIONS = {
+    "technician": "$job.technician_name",
+    "tune_stage": "$job.tune_stage",
+    "make": "$vehicle.make",
+    "ecu_type": "$vehicle.ecu_type",
+    "payment_method": "$payment_method",
+}
+# Dimensions that also count jobs, on the job's own date
+WORKLOAD_DIMENSIONS = ("technician", "tune_stage", "make", "ecu_type")
+AMOUNTS = ("invoices", "billed", "paid", "outstanding", "discounts", "refunds")
+TIME_GROUPS = {"day": 10, "month": 7, "year": 4}
+# Billing and the jobs it joins to, hot and archived
+SOURCES = (("billing", "jobs"), (archive_name("billing"), archive_name("jobs")))
+BUILD_CHUNK_DAYS = 92
+DIRTY_BATCH_DAYS = 100
+
+
+def _day_ranges(days: Iterable[str]) -> List[dict]:
+    return [date_range_query(date.fromisoformat(day), date.fromisoformat(day)) for day in days]
+
+
+def billing_pipeline(day_ranges: List[dict], jobs: str = "jobs") -> List[dict]:
+    """Per-day revenue totals and breakdowns for billing created on the given days."""
+    sums = {"invoices": {"$sum": 1}, **{name: {"$sum": f"${name}"} for name in AMOUNTS[1:]}}
+    return [
+        {"$match": {"$or": [{"created_at": r} for r in day_ranges]}},
+        {"$lookup": {"from": jobs, "localField": "job_id", "foreignField": "id", "as": "job"}},
+        {"$unwind": {"path": "$job", "preserveNullAndEmptyArrays": True}},
+        {"$lookup": {"from": "vehicles", "localField": "job.vehicle_id", "foreignField": "id", "as": "vehicle"}},
+        {"$unwind": {"path": "$vehicle", "preserveNullAndEmptyArrays": True}},
+        {"$project": {
+            "_id": 0,
+            "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+            **{name: {"$ifNull": [path, "Unknown"]} for name, path in DIMENSIONS.items()},
+            "billed": {"$ifNull": ["$final_billed_amount", 0]},
+            "paid": {"$cond": [{"$eq": ["$payment_status", "paid"]}, "$final_billed_amount", 0]},
+            "outstanding": {"$cond": [
+                {"$in": ["$payment_status", ["pending", "partial"]]}, "$final_billed_amount", 0
+            ]},
+            "discounts": {"$ifNull": ["$discounts", 0]},
+            "refunds": {"$ifNull": ["$refunds", 0]},
+        }},
+        {"$facet": {
+            "totals": [{"$group": {"_id": {"day": "$day"}, **sums}}],
+            **{name: [{"$group": {"_id": {"day": "$day", "key": f"${name}"}, **sums}}] for name in DIMENSIONS},
+        }},
+    ]
+
+
+def jobs_pipeline(day_ranges: List[dict]) -> List[dict]:
+    """Per-day job counts and breakdowns for jobs dated on the given days."""
+    return [
+        {"$match": {"$or": [{"date": r} for r in day_ranges]}},
+        {"$lookup": {"from": "vehicles", "localField": "vehicle_id", "foreignField": "id", "as": "vehicle"}},
+        {"$unwind": {"path": "$vehicle", "preserveNullAndEmptyArrays": True}},
+        {"$project": {
+            "_id": 0,
+            "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$date"}},
+            "technician": {"$ifNull": ["$technician_name", "Unknown"]},
+            "tune_stage": {"$ifNull": ["$tune_stage", "Unknown"]},
+            "make": {"$ifNull": ["$vehicle.make", "Unknown"]},
+            "ecu_type": {"$ifNull": ["$vehicle.ecu_type", "Unknown"]},
+        }},
+        {"$facet": {
+            "totals": [{"$group": {"_id": {"day": "$day"}, "jobs": {"$sum": 1}}}],
+            **{name: [{"$group": {"_id": {"day": "$day", "key": f"${name}"}, "jobs": {"$sum": 1}}}]
+               for name in WORKLOAD_DIMENSIONS},
+        }},
+    ]
+
+
+def _empty_row() -> dict:
+    return {"jobs": 0, **{name: 0 for name in AMOUNTS}}
+
+
+class DailyBuckets:
+    """Revenue and workload analytics materialised as one document per day.
+
+    Each `analytics_daily` document holds the day's totals plus a row per
+    technician, tune stage, make, ECU type and payment method, so a report
+    over any date range sums at most one small document per day, archived
+    billing and jobs included. Days up to the `built_through` watermark are
+    built once. Handlers that change billing, jobs or vehicles mark the
+    affected days in `analytics_dirty`, and `refresh` rebuilds just those
+    days. Marks are made after the write, and a mark is only removed if its
+    version is unchanged since the rebuild read it, so a write that lands
+    during a rebuild is picked up by the next.
+    """
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+
+    async def reset(self, db):
+        """Forget all buckets, e.g. after data was loaded without going through the handlers."""
+        for name in ("analytics_daily", "analytics_dirty", "analytics_state"):
+            await db[name].drop()
+
+    async def mark_days(self, db, days: Iterable[Optional[str]]):
+        for day in {day_key(d) for d in days if d}:
+            await db.analytics_dirty.update_one({"_id": day}, {"$inc": {"version": 1}}, upsert=True)
+
+    async def job_days(self, db, job_ids: List[uuid.UUID]) -> List[str]:
+        """Days touched by these jobs and their billing records, to mark once a change is written."""
+        if not job_ids:
+            return []
+        days = []
+        for billing, jobs in SOURCES:
+            days += [j.get("date") for j in await db[jobs].find({"id": {"$in": job_ids}}, {"_id": 0, "date": 1}).to_list(None)]
+            days += [b.get("created_at") for b in await db[billing].find(
+                {"job_id": {"$in": job_ids}}, {"_id": 0, "created_at": 1}
+            ).to_list(None)]
+        return days
+
+    async def _first_day(self, db) -> Optional[date]:
+        days = []
+        for billing, jobs in SOURCES:
+            first_billing = await db[billing].find_one({}, {"_id": 0, "created_at": 1}, sort=[("created_at", 1)])
+            first_job = await db[jobs].find_one({}, {"_id": 0, "date": 1}, sort=[("date", 1)])
+            days += [day_key(d) for d in (
+                first_billing and first_billing.get("created_at"), first_job and first_job.get("date")
+            ) if d]
+        return date.fromisoformat(min(days)) if days else None
+
+    async def _build(self, db, days: List[str], ranges: Optional[List[dict]] = None):
+        """Recompute the bucket documents for these days, removing any that are now empty."""
+        ranges = ranges or _day_ranges(days)
+        buckets: Dict[str, dict] = {}
+
+        def bucket(day: str) -> dict:
+            if day not in buckets:
+                buckets[day] = {"_id": day, "totals": _empty_row(), **{f"by_{name}": {} for name in DIMENSIONS}}
+            return buckets[day]
+
+        def add(row: dict, group: dict):
+            for k, v in group.items():
+                if k != "_id":
+                    row[k] += v
+
+        for billing, jobs in SOURCES:
+            revenue = (await db[billing].aggregate(billing_pipeline(ranges, jobs), allowDiskUse=True).to_list(1))[0]
+            workload = (await db[jobs].aggregate(jobs_pipeline(ranges), allowDiskUse=True).to_list(1))[0]
+            for facets in (revenue, workload):
+                for group in facets.pop("totals"):
+                    add(bucket(group["_id"]["day"])["totals"], group)
+                for name, groups in facets.items():
+                    for group in groups:
+                        rows = bucket(group["_id"]["day"])[f"by_{name}"]
+                        add(rows.setdefault(group["_id"]["key"], {"key": group["_id"]["key"], **_empty_row()}), group)
+
+        built_at = datetime.now(timezone.utc).isoformat()
+        operations = []
+        for day in days:
+            if day in buckets:
+                document = buckets[day]
+                for name in DIMENSIONS:
+                    document[f"by_{name}"] = list(document[f"by_{name}"].values())
+                document["built_at"] = built_at
+                operations.append(ReplaceOne({"_id": day}, document, upsert=True))
+            else:
+                operations.append(DeleteOne({"_id": day}))
+        if operations:
+            await db.analytics_daily.bulk_write(operations, ordered=False)
+
+    async def refresh(self, db, until: Optional[date] = None):
+        """Build days past the watermark and rebuild dirty days, up to `until` (today by default)."""
+        until = until or datetime.now(timezone.utc).date()
+        async with self._lock:
+            state = await db.analytics_state.find_one({"_id": "daily"}) or {}
+            dirty = await db.analytics_dirty.find({"_id": {"$lte": until.isoformat()}}).to_list(None)
+
+            built_through = state.get("built_through")
+            start = date.fromisoformat(built_through) + timedelta(days=1) if built_through else await self._first_day(db)
+            new_days = set()
+            while start is not None and start <= until:
+                chunk_end = min(start + timedelta(days=BUILD_CHUNK_DAYS - 1), until)
+                chunk = [(start + timedelta(days=i)).isoformat() for i in range((chunk_end - start).days + 1)]
+                await self._build(db, chunk, [date_range_query(start, chunk_end)])
+                new_days.update(chunk)
+                start = chunk_end + timedelta(days=1)
+
+            stale = sorted(d["_id"] for d in dirty if d["_id"] not in new_days)
+            for i in range(0, len(stale), DIRTY_BATCH_DAYS):
+                await self._build(db, stale[i:i + DIRTY_BATCH_DAYS])
+
+            for mark in dirty:
+                await db.analytics_dirty.delete_one({"_id": mark["_id"], "version": mark["version"]})
+            await db.analytics_state.update_one(
+                {"_id": "daily"}, {"$max": {"built_through": until.isoformat()}}, upsert=True
+            )
+
+    async def report(self, db, start: date, end: date, group_by: str) -> dict:
+        """Totals and rows for a date range, grouped by a time period or a dimension.
+
+        Read from the buckets as they are; the leader's `refresh` job keeps
+        them current, and `built_through` says how far they reach.
+        """
+        state = await db.analytics_state.find_one({"_id": "daily"}, {"built_through": 1}) or {}
+        match = {"$match": {"_id": {"$gte": start.isoformat(), "$lte": end.isoformat()}}}
+        fields = ("jobs",) + AMOUNTS
+        sums = {name: {"$sum": f"$totals.{name}"} for name in fields}
+
+        totals = await db.analytics_daily.aggregate([match, {"$group": {"_id": None, **sums}}]).to_list(1)
+        if group_by in TIME_GROUPS:
+            pipeline = [
+                match,
+                {"$group": {"_id": {"$substrCP": ["$_id", 0, TIME_GROUPS[group_by]]}, **sums}},
+                {"$sort": {"_id": 1}},
+            ]
+        else:
+            pipeline = [
+                match,
+                {"$unwind": f"$by_{group_by}"},
+                {"$group": {
+                    "_id": f"$by_{group_by}.key",
+                    **{name: {"$sum": f"$by_{group_by}.{name}"} for name in fields},
+                }},
+                {"$sort": {"billed": -1, "jobs": -1}},
+            ]
+        rows = await db.analytics_daily.aggregate(pipeline).to_list(None)
+
+        def present(group: dict) -> dict:
+            return {name: round(group.get(name, 0), 2) for name in fields}
+
+        return {
+            "from_date": start.isoformat(),
+            "to_date": end.isoformat(),
+            "group_by": group_by,
+            "built_through": state.get("built_through"),
+            "totals": present(totals[0]) if totals else present({}),
+            "rows": [{"key": row["_id"], **present(row)} for row in rows],
+        }
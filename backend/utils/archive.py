@@ -0,0 +1,159 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import DeleteOne, ReplaceOne
+from pymongo.errors import CollectionInvalid, OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# A closed job moves together with everything that hangs off it
+ARCHIVED_COLLECTIONS = ("jobs", "billing", "tune_revisions", "reminders")
+JOB_CHILDREN = ("billing", "tune_revisions", "reminders")
+# Archives are written once and rarely read, so they trade CPU for disk
+ARCHIVE_STORAGE = {"wiredTiger": {"configString": "block_compressor=zstd"}}
+MOVE_ATTEMPTS = 3
+
+
+def archive_name(collection: str) -> str:
+    return f"{collection}_archive"
+
+
+def _sort_key(field: str):
+    # Documents missing the field sort before every real value
+    return lambda document: (document.get(field) is not None, document.get(field) or 0)
+
+
+class Archive:
+    """Moves closed history out of the hot collections into `<name>_archive`.
+
+    A job is archived once it is dated more than `after` ago, has at least
+    one bill, every bill is paid and none of its reminders is still pending.
+    Its billing, tune revisions and reminders go with it. Documents are
+    copied first and then deleted only if unchanged since the copy, so an
+    edit that races the move keeps the document hot. Archived records are
+    read-only: reads fall through to the archive, writes answer 404.
+    """
+
+    def __init__(self, after: Optional[timedelta] = timedelta(days=730), batch_size: int = 500):
+        self.after = after
+        self.batch_size = batch_size
+
+    async def ensure(self, db):
+        """Create the archive collections with stronger block compression where the server allows it."""
+        existing = set(await db.list_collection_names())
+        for collection in ARCHIVED_COLLECTIONS:
+            name = archive_name(collection)
+            if name in existing:
+                continue
+            try:
+                await db.create_collection(name, storageEngine=ARCHIVE_STORAGE)
+            except CollectionInvalid:
+                pass
+            except OperationFailure as e:
+                logger.warning(f"Creating {name} with zstd compression failed, using the default: {e}")
+                try:
+                    await db.create_collection(name)
+                except CollectionInvalid:
+                    pass
+
+    async def _eligible(self, db, job_ids: List) -> set:
+        billed, unpaid, open_reminders = await asyncio.gather(
+            db.billing.distinct("job_id", {"job_id": {"$in": job_ids}}),
+            db.billing.distinct("job_id", {"job_id": {"$in": job_ids}, "payment_status": {"$ne": "paid"}}),
+            db.reminders.distinct("job_id", {"job_id": {"$in": job_ids}, "status": "pending"}),
+        )
+        return set(billed) - set(unpaid) - set(open_reminders)
+
+    async def _move(self, db, collection: str, documents: List[dict]) -> Tuple[List[dict], List[dict]]:
+        """Copy documents to the archive and delete the unchanged ones. Returns (moved, changed)."""
+        if not documents:
+            return [], []
+        archive = db[archive_name(collection)]
+        await archive.bulk_write(
+            [ReplaceOne({"id": document["id"]}, document, upsert=True) for document in documents], ordered=False
+        )
+        # Matching every field deletes a document only if nobody wrote it since the copy
+        await db[collection].bulk_write([DeleteOne(document) for document in documents], ordered=False)
+        left = set(await db[collection].distinct("id", {"id": {"$in": [d["id"] for d in documents]}}))
+        if left:
+            await archive.delete_many({"id": {"$in": list(left)}})
+        return [d for d in documents if d["id"] not in left], [d for d in documents if d["id"] in left]
+
+    async def _archive_jobs(self, db, jobs: List[dict], counts: Dict[str, int]) -> List:
+        moved, _ = await self._move(db, "jobs", jobs)
+        counts["jobs"] += len(moved)
+        days = [job.get("date") for job in moved]
+        job_ids = [job["id"] for job in moved]
+        if not job_ids:
+            return days
+        for collection in JOB_CHILDREN:
+            # Re-read what is still hot, so children edited mid-move are moved as they are now
+            for _ in range(MOVE_ATTEMPTS):
+                children = await db[collection].find({"job_id": {"$in": job_ids}}).to_list(None)
+                done, changed = await self._move(db, collection, children)
+                counts[collection] += len(done)
+                if collection == "billing":
+                    days.extend(bill.get("created_at") for bill in done)
+                if not changed:
+                    break
+        return days
+
+    async def run(self, db) -> List:
+        """Archive every eligible job. Returns the days whose jobs or billing moved, for analytics."""
+        if not self.after:
+            return []
+        cutoff = datetime.now(timezone.utc) - self.after
+        counts = {collection: 0 for collection in ARCHIVED_COLLECTIONS}
+        days: List = []
+        last_id = None
+        while True:
+            query = {"date": {"$lt": cutoff}}
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+            jobs = await db.jobs.find(query).sort("_id", 1).limit(self.batch_size).to_list(self.batch_size)
+            if not jobs:
+                break
+            last_id = jobs[-1]["_id"]
+            eligible = await self._eligible(db, [job["id"] for job in jobs])
+            days.extend(await self._archive_jobs(db, [job for job in jobs if job["id"] in eligible], counts))
+
+        await db.archive_state.update_one(
+            {"_id": "archive"},
+            {"$set": {"last_run_at": datetime.now(timezone.utc), "cutoff": cutoff, "moved": counts}},
+            upsert=True,
+        )
+        if counts["jobs"]:
+            logger.info(f"Archived {', '.join(f'{n} {name}' for name, n in counts.items())}")
+        return days
+
+    async def find(self, db, collection: str, query: dict, sort: Optional[Tuple[str, int]] = None,
+                   limit: int = 1000) -> List[dict]:
+        """Hot and archived documents matching `query`, merged in `sort` order (field, 1 or -1)."""
+        async def load(source) -> List[dict]:
+            cursor = source.find(query, {"_id": 0})
+            if sort:
+                cursor = cursor.sort(*sort)
+            return await cursor.to_list(limit)
+
+        hot, archived = await asyncio.gather(load(db[collection]), load(db[archive_name(collection)]))
+        documents = hot + archived
+        if sort and archived:
+            documents.sort(key=_sort_key(sort[0]), reverse=sort[1] < 0)
+        return documents[:limit]
+
+    async def stats(self, db) -> dict:
+        counts = await asyncio.gather(*(
+            db[name].estimated_document_count()
+            for collection in ARCHIVED_COLLECTIONS for name in (collection, archive_name(collection))
+        ))
+        state = await db.archive_state.find_one({"_id": "archive"}, {"_id": 0}) or {}
+        return {
+            "after_days": self.after.days if self.after else None,
+            "collections": {
+                collection: {"hot": counts[2 * i], "archived": counts[2 * i + 1]}
+                for i, collection in enumerate(ARCHIVED_COLLECTIONS)
+            },
+            **state,
+        }
@@ -6,21 +6,28 @@ from datetime import datetime, timezone, timedelta
 from typing import Optional
 import os
 
+from utils.tracing import trace_span
+
 # Security
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-change-this-in-production')
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
+# Tickets only open the live event stream; they travel in a query string, so they expire quickly
+EVENTS_TICKET_SCOPE = "events"
+EVENTS_TICKET_EXPIRE_SECONDS = 60
 
 security = HTTPBearer()
 
 def verify_password(plain_password, hashed_password):
     """Verify a plain password against its hash."""
-    return pwd_context.verify(plain_password, hashed_password)
+    with trace_span("bcrypt.verify"):
+        return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
     """Generate password hash."""
-    return pwd_context.hash(password)
+    with trace_span("bcrypt.hash"):
+        return pwd_context.hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create a new JWT access token."""
@@ -33,8 +40,12 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db=None):
-    """Dependency to get the current authenticated user."""
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db=None,
+                           scope: Optional[str] = None):
+    """Dependency to get the current authenticated user.
+
+    A token with a `scope` claim is only accepted where that scope is asked for.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -44,7 +55,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
-        if username is None:
+        if username is None or payload.get("scope") != scope:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
@@ -0,0 +1,219 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional
+
+import bson
+from bson.binary import UuidRepresentation
+from bson.codec_options import CodecOptions
+
+from utils.archive import ARCHIVED_COLLECTIONS, archive_name
+from utils.metrics import entity_cache_lookups_total
+
+logger = logging.getLogger(__name__)
+
+# Stored in place of a document that does not exist; a real BSON document is
+# at least five bytes
+MISSING = b""
+# Encode and decode dates and UUIDs the way the client does
+CODEC_OPTIONS = CodecOptions(tz_aware=True, uuid_representation=UuidRepresentation.STANDARD)
+
+
+class LocalBackend:
+    """In-memory stand-in for an external cache, for development and single-host setups."""
+
+    def __init__(self):
+        self._values: Dict[str, tuple] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        value = self._values.get(key)
+        if value is None or value[1] <= time.monotonic():
+            self._values.pop(key, None)
+            return None
+        return value[0]
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        self._values[key] = (value, time.monotonic() + ttl)
+
+    async def delete(self, keys: List[str]):
+        for key in keys:
+            self._values.pop(key, None)
+
+
+class RedisBackend:
+    """Shared cache in Redis, so workers and pods warm each other's misses."""
+
+    def __init__(self, url: str, prefix: str = "entity:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("ENTITY_CACHE_URL points at Redis but the redis package is not installed")
+        self._redis = redis.from_url(url)
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._redis.get(self.prefix + key)
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        await self._redis.set(self.prefix + key, value, px=max(1, int(ttl * 1000)))
+
+    async def delete(self, keys: List[str]):
+        if keys:
+            await self._redis.delete(*(self.prefix + key for key in keys))
+
+
+def cache_backend(url: Optional[str]):
+    """Backend for an ENTITY_CACHE_URL: none, `local://`, or a `redis://` URL."""
+    if not url:
+        return None
+    if url.startswith("local://"):
+        return LocalBackend()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported entity cache URL: {url}")
+
+
+class EntityCache:
+    """Read-through cache of single documents keyed by collection and id.
+
+    Documents live BSON-encoded in an in-process LRU bounded by entry count
+    and bytes, so every hit decodes a private copy and memory use is exact.
+    Misses fall through to the optional shared `backend`, then to MongoDB
+    (the archive, for archived collections); concurrent misses for one key
+    share a single load. Documents that do not
+    exist are cached for `negative_ttl` seconds.
+
+    Handlers call `invalidate` after writing. It drops the local entry and
+    the backend's, and `on_invalidate` tells other workers to drop theirs. A
+    load that was in flight when its key was invalidated is not stored.
+    """
+
+    def __init__(self, max_entries: int = 5000, max_bytes: int = 64 * 1024 * 1024,
+                 ttl: float = 60.0, negative_ttl: float = 5.0, backend=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.backend = backend
+        self.on_invalidate: Optional[Callable[[List[str]], None]] = None
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._loading: Dict[str, asyncio.Future] = {}
+        self.evictions = 0
+
+    @staticmethod
+    def key(collection: str, document_id: uuid.UUID) -> str:
+        return f"{collection}:{document_id}"
+
+    def _store(self, key: str, data: bytes):
+        self._discard(key)
+        ttl = self.ttl if data else self.negative_ttl
+        self._entries[key] = (data, time.monotonic() + ttl)
+        self._bytes += len(data)
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, (evicted, _) = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.evictions += 1
+
+    def _discard(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[0])
+
+    async def _load(self, db, collection: str, document_id: uuid.UUID, key: str) -> bytes:
+        if self.backend is not None:
+            try:
+                data = await self.backend.get(key)
+            except Exception as e:
+                logger.warning(f"Entity cache backend read failed: {e!r}")
+                data = None
+            if data is not None:
+                entity_cache_lookups_total.inc(collection, "backend_hit")
+                return data
+
+        entity_cache_lookups_total.inc(collection, "miss")
+        document = await db[collection].find_one({"id": document_id}, {"_id": 0})
+        if document is None and collection in ARCHIVED_COLLECTIONS:
+            document = await db[archive_name(collection)].find_one({"id": document_id}, {"_id": 0})
+        data = bson.encode(document, codec_options=CODEC_OPTIONS) if document is not None else MISSING
+        if self.backend is not None:
+            try:
+                await self.backend.set(key, data, self.ttl if data else self.negative_ttl)
+            except Exception as e:
+                logger.warning(f"Entity cache backend write failed: {e!r}")
+        return data
+
+    async def get(self, db, collection: str, document_id: uuid.UUID) -> Optional[dict]:
+        """The document with this id, or None if there is none."""
+        key = self.key(collection, document_id)
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            self._entries.move_to_end(key)
+            entity_cache_lookups_total.inc(collection, "hit" if entry[0] else "negative_hit")
+            data = entry[0]
+        elif key in self._loading:
+            entity_cache_lookups_total.inc(collection, "coalesced")
+            data = await asyncio.shield(self._loading[key])
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._loading[key] = future
+            try:
+                data = await self._load(db, collection, document_id, key)
+            except BaseException as e:
+                if self._loading.get(key) is future:
+                    del self._loading[key]
+                if isinstance(e, asyncio.CancelledError):
+                    future.cancel()
+                else:
+                    future.set_exception(e)
+                    # Waiters re-raise it; don't also report it as never retrieved
+                    future.exception()
+                raise
+            if self._loading.get(key) is future:
+                del self._loading[key]
+                self._store(key, data)
+            future.set_result(data)
+        return bson.decode(data, codec_options=CODEC_OPTIONS) if data else None
+
+    def drop(self, keys: Optional[Iterable[str]]):
+        """Forget keys locally (all of them for None), e.g. when another worker invalidated them."""
+        if keys is None:
+            self._entries.clear()
+            self._bytes = 0
+            self._loading.clear()
+            return
+        for key in keys:
+            self._discard(key)
+            self._loading.pop(key, None)
+
+    async def invalidate(self, collection: str, *document_ids: uuid.UUID):
+        keys = [self.key(collection, document_id) for document_id in document_ids if document_id]
+        if not keys:
+            return
+        self.drop(keys)
+        if self.backend is not None:
+            try:
+                await self.backend.delete(keys)
+            except Exception as e:
+                logger.warning(f"Entity cache backend delete failed: {e!r}")
+        if self.on_invalidate is not None:
+            self.on_invalidate(keys)
+
+    def stats(self) -> dict:
+        counts: Dict[str, float] = {}
+        for (_, result), value in entity_cache_lookups_total.values().items():
+            counts[result] = counts.get(result, 0) + value
+        lookups = sum(counts.values())
+        served = counts.get("hit", 0) + counts.get("negative_hit", 0) + counts.get("coalesced", 0)
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "lookups": {result: int(value) for result, value in sorted(counts.items())},
+            "hit_ratio": round(served / lookups, 4) if lookups else None,
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+        }
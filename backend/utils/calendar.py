@@ -0,0 +1,85 @@
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from utils.dates import day_key, to_datetime
+from utils.scheduling import service_duration, parse_time
+
+
+def parse_date_range(from_date: Optional[str], to_date: Optional[str], max_days: Optional[int] = None) -> Tuple[Optional[date], Optional[date]]:
+    """Parse optional YYYY-MM-DD bounds. Raises ValueError on bad input."""
+    start = date.fromisoformat(from_date) if from_date else None
+    end = date.fromisoformat(to_date) if to_date else None
+    if start and end and end < start:
+        raise ValueError("'to' must not be before 'from'")
+    if max_days is not None and (not start or not end or (end - start).days > max_days):
+        raise ValueError(f"A 'from' and 'to' range of at most {max_days} days is required")
+    return start, end
+
+
+def date_range_query(start: Optional[date], end: Optional[date]) -> Optional[dict]:
+    """Range filter for a stored date field, inclusive of the whole end day (UTC).
+
+    Date-only values are stored as midnight UTC, so one filter covers them
+    and full timestamps alike.
+    """
+    query = {}
+    if start:
+        query["$gte"] = to_datetime(start)
+    if end:
+        query["$lt"] = to_datetime(end + timedelta(days=1))
+    return query or None
+
+
+def ics_escape(value: Optional[str]) -> str:
+    """Escape text for an iCalendar property value."""
+    if not value:
+        return ""
+    return (
+        value.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def ics_header(calendar_name: str) -> str:
+    return (
+        "BEGIN:VCALENDAR\r\n"
+        "VERSION:2.0\r\n"
+        "PRODID:-//IgnitionLab Dynamics//Workshop Schedule//EN\r\n"
+        "CALSCALE:GREGORIAN\r\n"
+        f"X-WR-CALNAME:{ics_escape(calendar_name)}\r\n"
+    )
+
+
+def ics_footer() -> str:
+    return "END:VCALENDAR\r\n"
+
+
+def ics_event(appointment: dict, customer_name: Optional[str] = None) -> str:
+    """Render one appointment as a VEVENT in workshop-local (floating) time."""
+    day = date.fromisoformat(day_key(appointment["appointment_date"]))
+    start_minutes = parse_time(appointment["appointment_time"])
+    start = datetime(day.year, day.month, day.day) + timedelta(minutes=start_minutes)
+    end = start + timedelta(
+        minutes=service_duration(appointment.get("service_type"), appointment.get("duration_minutes"))
+    )
+    summary = appointment["service_type"]
+    if customer_name:
+        summary = f"{summary} - {customer_name}"
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{appointment['id']}@ignitionlab-dynamics",
+        f"DTSTAMP:{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}",
+        f"DTSTART:{start.strftime('%Y%m%dT%H%M%S')}",
+        f"DTEND:{end.strftime('%Y%m%dT%H%M%S')}",
+        f"SUMMARY:{ics_escape(summary)}",
+        f"STATUS:{'CANCELLED' if appointment.get('status') == 'cancelled' else 'CONFIRMED'}",
+    ]
+    if appointment.get("bay"):
+        lines.append(f"LOCATION:{ics_escape(appointment['bay'])}")
+    if appointment.get("notes"):
+        lines.append(f"DESCRIPTION:{ics_escape(appointment['notes'])}")
+    lines.append("END:VEVENT")
+    return "\r\n".join(lines) + "\r\n"
@@ -0,0 +1,203 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from pymongo import CursorType, ReturnDocument
+from pymongo.errors import CollectionInvalid, DuplicateKeyError, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+_worker_id: Optional[str] = None
+_worker_pid: Optional[int] = None
+
+
+def worker_id() -> str:
+    """Identifies this worker process; recomputed after a fork so preloaded workers differ."""
+    global _worker_id, _worker_pid
+    if _worker_pid != os.getpid():
+        _worker_pid = os.getpid()
+        _worker_id = f"{socket.gethostname()}:{_worker_pid}:{uuid.uuid4().hex[:8]}"
+    return _worker_id
+
+
+async def every(seconds: float, func: Callable[[], Awaitable], name: str, immediately: bool = False):
+    """Run `func` every `seconds` until cancelled, logging failures instead of stopping."""
+    while True:
+        if not immediately:
+            await asyncio.sleep(seconds)
+        immediately = False
+        try:
+            await func()
+        except PyMongoError as e:
+            logger.warning(f"{name} failed: {e}")
+
+
+class LeaderLease:
+    """Elects one process among all workers and pods to run singleton jobs.
+
+    The lease is a document in the `leases` collection holding the owner and
+    an expiry computed from the server's clock. Every process tries to take
+    or renew it every `ttl / 3` seconds; the filter only matches an expired
+    lease or one this process already holds, so everyone else hits a
+    duplicate key on the upsert. Jobs registered with `add_job` run only
+    while this process holds the lease and are cancelled when it is lost.
+    """
+
+    def __init__(self, db, name: str = "background-jobs", ttl: float = 30.0):
+        self.db = db
+        self.name = name
+        self.ttl = ttl
+        self.is_leader = False
+        self._jobs: Dict[str, Callable[[], Awaitable]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def add_job(self, name: str, factory: Callable[[], Awaitable]):
+        self._jobs[name] = factory
+
+    async def _acquire(self) -> bool:
+        holder = worker_id()
+        try:
+            lease = await self.db.leases.find_one_and_update(
+                {"_id": self.name, "$or": [
+                    {"holder": holder},
+                    {"$expr": {"$lt": ["$expires_at", "$$NOW"]}},
+                ]},
+                [{"$set": {
+                    "holder": holder,
+                    "expires_at": {"$add": ["$$NOW", int(self.ttl * 1000)]},
+                }}],
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            return False
+        return lease is not None and lease.get("holder") == holder
+
+    def _start_jobs(self):
+        for name, factory in self._jobs.items():
+            task = self._tasks.get(name)
+            if task is None or task.done():
+                if task is not None and not task.cancelled() and task.exception():
+                    logger.error(f"Singleton job {name} crashed, restarting: {task.exception()!r}")
+                self._tasks[name] = asyncio.create_task(factory())
+
+    def _stop_jobs(self):
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+
+    async def run(self):
+        """Contend for the lease until cancelled, then hand it back."""
+        try:
+            while True:
+                try:
+                    leader = await self._acquire()
+                except PyMongoError as e:
+                    logger.warning(f"Lease {self.name} renewal failed: {e}")
+                    leader = False
+                if leader != self.is_leader:
+                    logger.info(f"{'Acquired' if leader else 'Lost'} lease {self.name} as {worker_id()}")
+                self.is_leader = leader
+                if leader:
+                    self._start_jobs()
+                else:
+                    self._stop_jobs()
+                await asyncio.sleep(self.ttl / 3)
+        finally:
+            self._stop_jobs()
+            if self.is_leader:
+                self.is_leader = False
+                try:
+                    await self.db.leases.delete_one({"_id": self.name, "holder": worker_id()})
+                except PyMongoError:
+                    pass
+
+
+class InvalidationChannel:
+    """Broadcasts cache invalidations between worker processes.
+
+    Messages go through a capped collection that every process tails.
+    `publish` only queues the message, so it can be called from synchronous
+    code, and a sender task writes queued messages in batches. Handlers
+    registered with `subscribe` receive the payloads other processes
+    published; a process has already applied its own. If tailing breaks,
+    messages may have been missed, so after reconnecting every handler is
+    called with None, meaning "drop everything".
+    """
+
+    def __init__(self, db, collection: str = "invalidations", size_bytes: int = 1024 * 1024):
+        self.db = db
+        self.collection = collection
+        self.size_bytes = size_bytes
+        self._handlers: Dict[str, List[Callable[[object], None]]] = {}
+        self._outbox: asyncio.Queue = asyncio.Queue()
+
+    def subscribe(self, topic: str, handler: Callable[[object], None]):
+        self._handlers.setdefault(topic, []).append(handler)
+
+    def publish(self, topic: str, payload=None):
+        self._outbox.put_nowait({"topic": topic, "payload": payload, "origin": worker_id()})
+
+    async def ensure(self):
+        try:
+            await self.db.create_collection(self.collection, capped=True, size=self.size_bytes)
+        except CollectionInvalid:
+            # Already created by another worker
+            pass
+
+    def _deliver(self, topic: str, payload):
+        for handler in self._handlers.get(topic, []):
+            try:
+                handler(payload)
+            except Exception as e:
+                logger.error(f"Invalidation handler for {topic} failed: {e!r}")
+
+    def _reset(self):
+        for topic in self._handlers:
+            self._deliver(topic, None)
+
+    async def _send(self):
+        while True:
+            batch = [await self._outbox.get()]
+            while not self._outbox.empty():
+                batch.append(self._outbox.get_nowait())
+            for message in batch:
+                message["created_at"] = datetime.now(timezone.utc)
+            try:
+                await self.db[self.collection].insert_many(batch, ordered=False)
+            except PyMongoError as e:
+                logger.warning(f"Dropped {len(batch)} invalidations: {e}")
+
+    async def _receive(self):
+        collection = self.db[self.collection]
+        last_id = None
+        broken = False
+        while True:
+            try:
+                if last_id is None:
+                    latest = await collection.find_one({}, sort=[("$natural", -1)])
+                    last_id = latest["_id"] if latest else None
+                if broken:
+                    self._reset()
+                    broken = False
+                query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+                cursor = collection.find(query, cursor_type=CursorType.TAILABLE_AWAIT)
+                while cursor.alive:
+                    async for message in cursor:
+                        last_id = message["_id"]
+                        if message.get("origin") != worker_id():
+                            self._deliver(message["topic"], message.get("payload"))
+                # A tailable cursor on an empty collection dies straight away
+                await asyncio.sleep(1)
+            except PyMongoError as e:
+                logger.warning(f"Invalidation channel interrupted: {e}")
+                broken = True
+                await asyncio.sleep(5)
+
+    async def run(self):
+        """Send and receive until cancelled."""
+        await asyncio.gather(self._send(), self._receive())
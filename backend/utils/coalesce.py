@@ -0,0 +1,54 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Hashable, Tuple
+
+from utils.metrics import coalesced_requests_total
+
+
+class SingleFlight:
+    """Shares one computation between identical concurrent requests.
+
+    The first request for a key starts the computation in its own task and
+    later requests for the same key await that task instead of repeating
+    the queries, so a request that goes away does not fail the others. With
+    `ttl` set, a finished result keeps being served for that many seconds.
+    `coalesced_requests_total` counts executed, joined and cached requests
+    per route; the last two are database work saved.
+    """
+
+    def __init__(self, ttl: float = 0.0):
+        self.ttl = ttl
+        self._calls: Dict[Tuple[str, Hashable], asyncio.Task] = {}
+        self._results: Dict[Tuple[str, Hashable], tuple] = {}
+
+    async def do(self, route: str, key: Hashable, func: Callable[[], Awaitable]):
+        """Result of `func()` for this route and key, computed once per flight.
+
+        The key must cover everything the result depends on: the parameters
+        and the caller's authorization scope.
+        """
+        flight = (route, key)
+        cached = self._results.get(flight)
+        if cached is not None and cached[0] > time.monotonic():
+            coalesced_requests_total.inc(route, "cached")
+            return cached[1]
+
+        task = self._calls.get(flight)
+        if task is None:
+            coalesced_requests_total.inc(route, "executed")
+            task = asyncio.ensure_future(func())
+            self._calls[flight] = task
+            task.add_done_callback(lambda done: self._finish(flight, done))
+        else:
+            coalesced_requests_total.inc(route, "joined")
+        return await asyncio.shield(task)
+
+    def _finish(self, flight: Tuple[str, Hashable], task: asyncio.Task):
+        if self._calls.get(flight) is task:
+            del self._calls[flight]
+        if task.cancelled() or task.exception() is not None or self.ttl <= 0:
+            return
+        now = time.monotonic()
+        for expired in [k for k, (expires_at, _) in self._results.items() if expires_at <= now]:
+            del self._results[expired]
+        self._results[flight] = (now + self.ttl, task.result())
@@ -0,0 +1,50 @@
+import importlib.util
+import os
+from typing import Mapping
+
+from pymongo.read_preferences import SecondaryPreferred
+
+# Preferred wire compressors in order, with the module each one needs (zlib is built in)
+COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": None}
+
+
+def available_compressors() -> str:
+    """Compressors from COMPRESSOR_MODULES whose module is installed, in preference order."""
+    return ",".join(
+        name for name, module in COMPRESSOR_MODULES.items()
+        if module is None or importlib.util.find_spec(module) is not None
+    )
+
+
+def mongo_client_options(environ: Mapping[str, str] = os.environ) -> dict:
+    """Connection pool, timeout and wire compression settings for AsyncIOMotorClient.
+
+    Every option can be overridden with a MONGO_* environment variable;
+    options given in MONGO_URL itself take precedence over these defaults.
+    Dates come back as aware UTC datetimes, and UUIDs are stored as BSON
+    binary subtype 4.
+    """
+    return {
+        "tz_aware": True,
+        "uuidRepresentation": "standard",
+        "maxPoolSize": int(environ.get('MONGO_MAX_POOL_SIZE', '100')),
+        "minPoolSize": int(environ.get('MONGO_MIN_POOL_SIZE', '5')),
+        "maxIdleTimeMS": int(environ.get('MONGO_MAX_IDLE_TIME_MS', '300000')),
+        "waitQueueTimeoutMS": int(environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', '5000')),
+        "serverSelectionTimeoutMS": int(environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000')),
+        "connectTimeoutMS": int(environ.get('MONGO_CONNECT_TIMEOUT_MS', '5000')),
+        "compressors": environ.get('MONGO_COMPRESSORS') or available_compressors(),
+        "zlibCompressionLevel": int(environ.get('MONGO_ZLIB_COMPRESSION_LEVEL', '6')),
+    }
+
+
+def analytics_read_preference(environ: Mapping[str, str] = os.environ) -> SecondaryPreferred:
+    """Read preference for dashboard, report and export queries.
+
+    Routes them to secondaries so heavy reads stay off the primary, but never
+    to a secondary lagging more than MONGO_ANALYTICS_MAX_STALENESS_S (at
+    least 90s, the server-side minimum). Without secondaries they fall back
+    to the primary.
+    """
+    max_staleness = max(90, int(environ.get('MONGO_ANALYTICS_MAX_STALENESS_S', '120')))
+    return SecondaryPreferred(max_staleness=max_staleness)
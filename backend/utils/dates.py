@@ -0,0 +1,55 @@
+from datetime import date, datetime, time, timezone
+from typing import Annotated, Union
+
+from pydantic import BeforeValidator, PlainSerializer
+
+
+def to_datetime(value: Union[str, date, datetime]) -> datetime:
+    """UTC datetime for an ISO string, date or datetime.
+
+    Date-only values become midnight UTC and naive timestamps are taken to be
+    UTC, which is how values stored before the switch to BSON dates were
+    written. Raises ValueError for anything else.
+    """
+    if isinstance(value, str):
+        value = date.fromisoformat(value) if len(value) == 10 else datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+    if isinstance(value, date):
+        return datetime.combine(value, time(), tzinfo=timezone.utc)
+    raise ValueError(f"Expected an ISO date or timestamp, got {value!r}")
+
+
+def day_key(value: Union[str, date, datetime]) -> str:
+    """The UTC calendar day of a stored date value, as YYYY-MM-DD."""
+    return to_datetime(value).date().isoformat()
+
+
+def format_timestamp(value: datetime) -> str:
+    return to_datetime(value).isoformat()
+
+
+def format_day(value: datetime) -> str:
+    """YYYY-MM-DD for a date-only value (midnight UTC), a full timestamp otherwise."""
+    value = to_datetime(value)
+    return value.date().isoformat() if value.time() == time() else value.isoformat()
+
+
+# Stored as BSON dates; accept the legacy ISO strings and serialise back to
+# them in responses, so the API contract does not change.
+Timestamp = Annotated[
+    datetime, BeforeValidator(to_datetime), PlainSerializer(format_timestamp, return_type=str, when_used="json")
+]
+DateValue = Annotated[
+    datetime, BeforeValidator(to_datetime), PlainSerializer(format_day, return_type=str, when_used="json")
+]
+
+# How each stored date field is rendered in responses built from raw documents
+DATE_FIELDS = {
+    "created_at": format_timestamp,
+    "updated_at": format_timestamp,
+    "date": format_day,
+    "reminder_date": format_day,
+    "appointment_date": format_day,
+}
+
@@ -0,0 +1,19 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from utils.dates import DATE_FIELDS
+
+
+def to_api(document: Optional[dict]) -> Optional[dict]:
+    """Copy of a raw document with its dates and ids rendered like the models render them."""
+    if document is None:
+        return None
+    rendered = {}
+    for key, value in document.items():
+        if isinstance(value, datetime) and key in DATE_FIELDS:
+            value = DATE_FIELDS[key](value)
+        elif isinstance(value, uuid.UUID):
+            value = str(value)
+        rendered[key] = value
+    return rendered
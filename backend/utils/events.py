@@ -0,0 +1,248 @@
+import asyncio
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Callable, Iterable, List, Optional, Set
+
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from utils.documents import to_api
+
+logger = logging.getLogger(__name__)
+
+REPLAY_LIMIT = 1000
+SUBSCRIBER_QUEUE_SIZE = 256
+HEARTBEAT_SECONDS = 15
+RETRY_MILLISECONDS = 3000
+
+
+class EventBus:
+    """Pub/sub for live change notifications, in the same order on every worker.
+
+    Every event is appended to the `events` collection under the next
+    sequence number as its `_id`. An append takes the number after the newest
+    event and retries on a duplicate key, so event N+1 is only ever written
+    once event N exists: the log has no gaps and every worker reads it in the
+    same order. Events expire from the log, so the highest number handed out
+    is also kept in the `events` counter; numbering carries on from it when
+    the log has emptied out. The sequence number is the SSE event id, so a client that
+    reconnects with `Last-Event-ID` to any worker is replayed what it missed
+    from the log. Each worker feeds its own SSE clients by catching up with
+    the log after its own appends, whenever `notify` is called (another
+    worker appended; see `relay`) and every HEARTBEAT_SECONDS regardless.
+
+    Mutating handlers call `publish`. When a change stream source is
+    attached, handler publishes are ignored and the database becomes the
+    single source of events. Every worker watches the stream and appends
+    what it sees under the change's resume token, which a unique index lets
+    through once.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._last_seq = 0
+        self._outbox: asyncio.Queue = asyncio.Queue()
+        self._behind = asyncio.Event()
+        self._catching_up = asyncio.Lock()
+        self._subscribers: Set[asyncio.Queue] = set()
+        self.change_stream_active = False
+        self.relay: Optional[Callable[[], None]] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    async def _newest(self) -> int:
+        newest, counter = await asyncio.gather(
+            self.db.events.find_one({}, {"_id": 1}, sort=[("_id", -1)]),
+            self.db.counters.find_one({"_id": "events"}, {"seq": 1}),
+        )
+        return max(newest["_id"] if newest else 0, counter["seq"] if counter else 0)
+
+    async def ensure(self):
+        """Start from the end of the log, so old events are not dispatched again."""
+        self._last_seq = await self._newest()
+
+    def publish(self, event_type: str, data: dict):
+        """Publish a change from a request handler."""
+        if not self.change_stream_active:
+            self._outbox.put_nowait((event_type, data))
+
+    def notify(self, _=None):
+        """Another worker appended to the log (or its messages may have been missed)."""
+        self._behind.set()
+
+    async def _append(self, event_type: str, data: dict, key: Optional[str] = None) -> bool:
+        """Write an event under the next sequence number. False if `key` was logged already."""
+        seq = self._last_seq + 1
+        while True:
+            if key is not None and await self.db.events.find_one({"key": key}, {"_id": 1}):
+                return False
+            event = {
+                "_id": seq,
+                "type": event_type,
+                "data": data,
+                "created_at": datetime.now(timezone.utc),
+            }
+            if key is not None:
+                event["key"] = key
+            try:
+                await self.db.events.insert_one(event)
+            except DuplicateKeyError:
+                # Another worker took the number (or logged the same change)
+                seq = max(seq, await self._newest()) + 1
+                continue
+            # Outlives the event itself, which the TTL index removes
+            await self.db.counters.update_one({"_id": "events"}, {"$max": {"seq": seq}}, upsert=True)
+            return True
+
+    async def _catch_up(self):
+        """Dispatch events after the last one this worker dispatched, in sequence order."""
+        async with self._catching_up:
+            while True:
+                events = await self.db.events.find(
+                    {"_id": {"$gt": self._last_seq}}, {"key": 0}
+                ).sort("_id", 1).limit(REPLAY_LIMIT).to_list(REPLAY_LIMIT)
+                for event in events:
+                    event["id"] = event.pop("_id")
+                    self._last_seq = event["id"]
+                    self._dispatch(event)
+                if len(events) < REPLAY_LIMIT:
+                    return
+
+    def _dispatch(self, event: dict):
+        for queue in list(self._subscribers):
+            if queue.qsize() >= SUBSCRIBER_QUEUE_SIZE:
+                # A client that cannot keep up is told to resync instead of blocking publishers
+                self._subscribers.discard(queue)
+                queue.put_nowait(None)
+            else:
+                queue.put_nowait(event)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE + 1)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    async def replay(self, last_event_id: Optional[str]) -> Optional[List[dict]]:
+        """Events after `last_event_id` up to the ones already dispatched here, or None if they are gone."""
+        if not last_event_id:
+            return []
+        try:
+            last_id = int(last_event_id)
+        except ValueError:
+            return None
+        if last_id >= self._last_seq:
+            # Nothing after it has been dispatched here yet; it arrives through the queue. An
+            # id past the end of the log comes from a log this database no longer has.
+            return [] if last_id <= await self._newest() else None
+        events = await self.db.events.find(
+            {"_id": {"$gte": last_id, "$lte": self._last_seq}}, {"key": 0}
+        ).sort("_id", 1).limit(REPLAY_LIMIT + 1).to_list(REPLAY_LIMIT + 1)
+        if not events or events[0]["_id"] != last_id or len(events) > REPLAY_LIMIT:
+            # Expired from the log, or too far behind to be worth replaying
+            return None
+        for event in events:
+            event["id"] = event.pop("_id")
+        return events[1:]
+
+    async def _send(self):
+        while True:
+            batch = [await self._outbox.get()]
+            while not self._outbox.empty():
+                batch.append(self._outbox.get_nowait())
+            for event_type, data in batch:
+                try:
+                    await self._append(event_type, data)
+                except PyMongoError as e:
+                    logger.warning(f"Dropped {event_type} event: {e}")
+            self._behind.set()
+            if self.relay is not None:
+                self.relay()
+
+    async def _follow(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._behind.wait(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._behind.clear()
+            try:
+                await self._catch_up()
+            except PyMongoError as e:
+                logger.warning(f"Reading the event log failed: {e}")
+
+    async def run(self):
+        """Append published events and feed subscribers until cancelled."""
+        await asyncio.gather(self._send(), self._follow())
+
+    async def watch_change_streams(self, db):
+        """Feed the bus from MongoDB change streams until cancelled.
+
+        Change streams need a replica set; on a standalone server this logs
+        once and leaves the bus in local mode.
+        """
+        pipeline = [{"$match": {
+            "ns.coll": {"$in": ["jobs", "billing", "appointments"]},
+            "operationType": {"$in": ["insert", "update", "delete"]},
+        }}]
+        try:
+            async with db.watch(pipeline, full_document="updateLookup") as stream:
+                self.change_stream_active = True
+                logger.info("Event bus fed from MongoDB change streams")
+                async for change in stream:
+                    for i, (event_type, data) in enumerate(change_to_events(change)):
+                        await self._append(event_type, data, key=f"{change['_id']['_data']}:{i}")
+                    self._behind.set()
+        except PyMongoError as e:
+            logger.warning(f"Change streams unavailable, using in-process events: {e}")
+        finally:
+            self.change_stream_active = False
+
+
+def job_event_data(job: dict) -> dict:
+    return to_api({key: job.get(key) for key in ("id", "vehicle_id", "customer_id", "date", "technician_name", "tune_stage")})
+
+
+def billing_event_data(billing: dict) -> dict:
+    return to_api({key: billing.get(key) for key in ("id", "job_id", "final_billed_amount", "payment_method", "payment_status")})
+
+
+def appointment_event_data(appointment: dict) -> dict:
+    return to_api({key: appointment.get(key) for key in (
+        "id", "customer_id", "vehicle_id", "appointment_date", "appointment_time", "service_type", "bay", "status"
+    )})
+
+
+def change_to_events(change: dict) -> Iterable[tuple]:
+    """Translate a change stream document into bus events."""
+    collection = change["ns"]["coll"]
+    operation = change["operationType"]
+    document = change.get("fullDocument") or {}
+    updated = change.get("updateDescription", {}).get("updatedFields", {})
+
+    if collection == "jobs" and operation == "insert":
+        yield "job.created", job_event_data(document)
+    elif collection == "billing":
+        if document.get("payment_status") == "paid" and (operation == "insert" or "payment_status" in updated):
+            yield "billing.paid", billing_event_data(document)
+    elif collection == "appointments":
+        if operation == "insert":
+            yield "appointment.created", appointment_event_data(document)
+        elif operation == "update" and "status" in updated:
+            yield "appointment.status_changed", appointment_event_data(document)
+        elif operation == "delete":
+            # Deletes carry only the Mongo _id, so clients resync on this event
+            yield "appointment.deleted", {}
+
+
+def format_sse(event: dict) -> str:
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
+def format_resync() -> str:
+    """Tell the client its missed events are gone and it should refetch."""
+    return "event: resync\ndata: {}\n\n"
@@ -0,0 +1,87 @@
+import asyncio
+import uuid
+from typing import Dict, Iterable, List, Optional, Set
+
+from utils.archive import ARCHIVED_COLLECTIONS, archive_name
+
+# Relation name -> (collection, slim projection). Jobs keep their foreign keys
+# so customer and vehicle can be resolved through them.
+RELATIONS = {
+    "customer": ("customers", {"_id": 0, "id": 1, "full_name": 1, "phone_number": 1}),
+    "vehicle": ("vehicles", {"_id": 0, "id": 1, "make": 1, "model": 1, "registration_number": 1}),
+    "job": ("jobs", {"_id": 0, "id": 1, "date": 1, "technician_name": 1, "tune_stage": 1,
+                     "customer_id": 1, "vehicle_id": 1}),
+}
+
+
+def parse_expand(expand: Optional[str], allowed: Iterable[str]) -> Set[str]:
+    """Relations named in an ?expand= value. Raises ValueError for one the endpoint does not offer."""
+    if not expand:
+        return set()
+    relations = {name.strip() for name in expand.split(",") if name.strip()}
+    unknown = relations - set(allowed)
+    if unknown:
+        raise ValueError(f"Cannot expand {', '.join(sorted(unknown))}; choose from {', '.join(sorted(allowed))}")
+    return relations
+
+
+class RelationLoader:
+    """Resolves related documents for a page of rows, DataLoader-style.
+
+    Each relation is fetched with one `$in` query over the ids the whole page
+    references, and results (including misses) are memoised for the rest of
+    the request. Create one per request.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._memo: Dict[str, Dict[uuid.UUID, Optional[dict]]] = {name: {} for name in RELATIONS}
+
+    async def load_many(self, relation: str, ids: Iterable[Optional[uuid.UUID]]) -> Dict[uuid.UUID, Optional[dict]]:
+        memo = self._memo[relation]
+        wanted = {i for i in ids if i}
+        missing = [i for i in wanted if i not in memo]
+        if missing:
+            collection, projection = RELATIONS[relation]
+            async for document in self.db[collection].find({"id": {"$in": missing}}, projection):
+                memo[document["id"]] = document
+            archived = [i for i in missing if i not in memo]
+            if archived and collection in ARCHIVED_COLLECTIONS:
+                async for document in self.db[archive_name(collection)].find({"id": {"$in": archived}}, projection):
+                    memo[document["id"]] = document
+            for i in missing:
+                memo.setdefault(i, None)
+        return {i: memo[i] for i in wanted}
+
+    async def expand(self, rows: List[dict], relations: Set[str]) -> List[dict]:
+        """Embed the requested relations into each row in place.
+
+        Rows without their own customer_id or vehicle_id (billing) reach
+        them through their job, which then costs one extra query.
+        """
+        if not relations or not rows:
+            return rows
+
+        jobs: Dict[uuid.UUID, Optional[dict]] = {}
+        via_job = any(
+            f"{name}_id" not in row for row in rows for name in ("customer", "vehicle") if name in relations
+        )
+        if "job" in relations or via_job:
+            jobs = await self.load_many("job", (row.get("job_id") for row in rows))
+
+        def foreign_key(row: dict, name: str) -> Optional[uuid.UUID]:
+            if f"{name}_id" in row:
+                return row[f"{name}_id"]
+            job = jobs.get(row.get("job_id"))
+            return job.get(f"{name}_id") if job else None
+
+        names = [name for name in ("customer", "vehicle") if name in relations]
+        loaded = await asyncio.gather(*(
+            self.load_many(name, [foreign_key(row, name) for row in rows]) for name in names
+        ))
+        for row in rows:
+            if "job" in relations:
+                row["job"] = jobs.get(row.get("job_id"))
+            for name, documents in zip(names, loaded):
+                row[name] = documents.get(foreign_key(row, name))
+        return rows
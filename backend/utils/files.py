@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import os
+import re
+import time
+import uuid
+from datetime import timedelta
+from pathlib import Path
+from typing import List, Set, Union
+
+from utils.archive import archive_name
+from utils.ids import to_uuid
+
+logger = logging.getLogger(__name__)
+
+# Uploads are named <file id><extension>; references may hold the id, the
+# file name, its path or its URL
+FILE_ID = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+PARTIAL_SUFFIX = ".part"
+# Fields that refer to uploads, per collection
+UPLOAD_REFERENCES = {
+    "jobs": ("files_uploaded", "afr_graph_screenshots"),
+    "tune_revisions": ("base_file_reference",),
+}
+# Owner fields of an `uploads` record and the collection each points into
+UPLOAD_OWNERS = {
+    "job_id": "jobs",
+    "revision_id": "tune_revisions",
+}
+
+
+def write_file(path: Union[str, Path], content: bytes):
+    """Write `content` to `path` through a temporary file, so readers never see a partial file."""
+    path = Path(path)
+    # Unique, so concurrent writers of the same file cannot mix their bytes
+    partial = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}{PARTIAL_SUFFIX}")
+    with open(partial, "wb") as f:
+        f.write(content)
+    os.replace(partial, path)
+
+
+def _remove_stale(directory: Path, names: List[str], cutoff: float) -> List[str]:
+    removed = []
+    for name in names:
+        path = directory / name
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed.append(name)
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+class UploadCollector:
+    """Deletes uploaded files nothing owns any more.
+
+    Only files with an `uploads` record are candidates; anything written
+    before uploads were recorded is left alone. A file is kept while its
+    record names a job or tune revision that still exists, hot or archived,
+    while a job or tune revision refers to it in one of UPLOAD_REFERENCES,
+    and for `grace` after it was written, so an upload has time to be
+    attached. Files are checked and removed `batch_size` at a time with a
+    pause in between, and the filesystem work runs in a thread.
+    """
+
+    def __init__(self, directory: Path, grace: timedelta = timedelta(days=7), batch_size: int = 500,
+                 pause: float = 0.1):
+        self.directory = directory
+        self.grace = grace
+        self.batch_size = batch_size
+        self.pause = pause
+
+    async def referenced(self, db) -> Set[str]:
+        """File ids referred to anywhere."""
+        file_ids = set()
+        for collection, fields in UPLOAD_REFERENCES.items():
+            for name in (collection, archive_name(collection)):
+                query = {"$or": [{field: {"$nin": [None, []]}} for field in fields]}
+                cursor = db[name].find(query, {"_id": 0, **{field: 1 for field in fields}}).batch_size(1000)
+                async for document in cursor:
+                    for field in fields:
+                        values = document.get(field) or []
+                        for value in values if isinstance(values, list) else [values]:
+                            file_ids.update(FILE_ID.findall(str(value)))
+        return file_ids
+
+    async def unowned(self, db) -> Set[str]:
+        """File ids with an `uploads` record whose owner, if any, is gone."""
+        records = await db.uploads.find({}, {"_id": 0, "id": 1, **{field: 1 for field in UPLOAD_OWNERS}}).to_list(None)
+        owned = {}
+        for field, collection in UPLOAD_OWNERS.items():
+            owner_ids = {r[field] for r in records if r.get(field)}
+            existing = set()
+            for name in (collection, archive_name(collection)):
+                existing.update(await db[name].distinct("id", {"id": {"$in": list(owner_ids)}}))
+            owned[field] = existing
+        return {
+            str(r["id"]) for r in records
+            if not any(r.get(field) in owned[field] for field in UPLOAD_OWNERS)
+        }
+
+    async def run(self, db) -> int:
+        """Remove unowned files older than `grace`. Returns how many were removed."""
+        cutoff = time.time() - self.grace.total_seconds()
+        names = await asyncio.to_thread(lambda: [e.name for e in os.scandir(self.directory) if e.is_file()])
+        candidates = await self.unowned(db) - await self.referenced(db)
+        orphans = []
+        for name in names:
+            match = FILE_ID.search(name)
+            # Leave alone anything that is not an upload; a partial file is a write that never finished
+            if match and (name.endswith(PARTIAL_SUFFIX) or match.group() in candidates):
+                orphans.append(name)
+
+        removed = []
+        for i in range(0, len(orphans), self.batch_size):
+            removed += await asyncio.to_thread(_remove_stale, self.directory, orphans[i:i + self.batch_size], cutoff)
+            if self.pause:
+                await asyncio.sleep(self.pause)
+        file_ids = [to_uuid(FILE_ID.search(name).group()) for name in removed if not name.endswith(PARTIAL_SUFFIX)]
+        if file_ids:
+            await db.uploads.delete_many({"id": {"$in": file_ids}})
+        if removed:
+            logger.info(f"Removed {len(removed)} unowned uploads")
+        return len(removed)
@@ -0,0 +1,140 @@
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from pymongo.errors import ConnectionFailure
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseMonitor:
+    """Cached MongoDB health, doubling as a circuit breaker for requests.
+
+    A background loop pings the database every `interval` seconds, so probes
+    answer from the last result instead of issuing their own commands. After
+    `failure_threshold` consecutive failures, counting both pings and requests
+    that hit connection errors, the circuit opens and requests fail fast until
+    a ping succeeds again; while open the loop pings every `retry_interval`.
+    """
+
+    def __init__(self, interval: float = 5.0, retry_interval: float = 1.0,
+                 timeout: float = 2.0, failure_threshold: int = 2):
+        self.interval = interval
+        self.retry_interval = retry_interval
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.healthy: Optional[bool] = None
+        self.initialized = False
+        self.circuit_open = False
+        self.consecutive_failures = 0
+        self.latency_ms: Optional[float] = None
+        self.error: Optional[str] = None
+        self.last_checked_at: Optional[str] = None
+        self._last_check: Optional[float] = None
+
+    async def check(self, db):
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(db.command('ping'), self.timeout)
+            if not self.initialized:
+                self.initialized = await asyncio.wait_for(
+                    db.users.find_one({"username": "admin"}, {"_id": 1}), self.timeout
+                ) is not None
+        except Exception as e:
+            self.record_failure(str(e) or type(e).__name__)
+        else:
+            self.latency_ms = round((time.perf_counter() - start) * 1000, 2)
+            self.record_success()
+        self._last_check = time.monotonic()
+        self.last_checked_at = datetime.now(timezone.utc).isoformat()
+
+    async def run(self, db):
+        """Check until cancelled."""
+        while True:
+            await asyncio.sleep(self.retry_interval if self.circuit_open else self.interval)
+            await self.check(db)
+
+    def record_success(self):
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.error = None
+        if self.circuit_open:
+            self.circuit_open = False
+            logger.info("Database reachable again, circuit closed")
+
+    def record_failure(self, error: str):
+        self.healthy = False
+        self.consecutive_failures += 1
+        self.error = error
+        if not self.circuit_open and self.consecutive_failures >= self.failure_threshold:
+            self.circuit_open = True
+            logger.warning(f"Database unavailable, circuit opened: {error}")
+
+    @property
+    def is_healthy(self) -> bool:
+        """Healthy as of a check recent enough to trust; a stalled monitor counts as unhealthy."""
+        if not self.healthy or self._last_check is None:
+            return False
+        return time.monotonic() - self._last_check <= max(3 * self.interval, self.timeout + self.interval)
+
+    def state(self) -> dict:
+        return {
+            "database": "connected" if self.is_healthy else "unavailable",
+            "circuit": "open" if self.circuit_open else "closed",
+            "latency_ms": self.latency_ms,
+            "last_checked_at": self.last_checked_at,
+            "consecutive_failures": self.consecutive_failures,
+        }
+
+
+class CircuitBreakerMiddleware:
+    """ASGI middleware returning 503 while the database circuit is open.
+
+    Requests that fail with a MongoDB connection error are counted against the
+    circuit and answered with 503 instead of a generic 500.
+    """
+
+    def __init__(self, app, monitor: DatabaseMonitor, exempt_paths=("/health", "/ready", "/metrics")):
+        self.app = app
+        self.monitor = monitor
+        self.exempt_paths = set(exempt_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        if self.monitor.circuit_open:
+            await self._unavailable(send)
+            return
+
+        started = [False]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                started[0] = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except ConnectionFailure as e:
+            self.monitor.record_failure(str(e))
+            if started[0]:
+                raise
+            await self._unavailable(send)
+
+    async def _unavailable(self, send):
+        body = json.dumps({"detail": "Database unavailable"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, round(self.monitor.retry_interval))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
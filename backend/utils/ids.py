@@ -0,0 +1,79 @@
+import uuid
+from typing import Annotated, Union
+
+from bson.binary import Binary, UuidRepresentation
+from pydantic import BeforeValidator, PlainSerializer
+
+
+def to_uuid(value: Union[str, uuid.UUID, Binary]) -> uuid.UUID:
+    """UUID for its string form, a UUID or a BSON binary UUID. Raises ValueError for anything else."""
+    if isinstance(value, uuid.UUID):
+        return value
+    if isinstance(value, Binary) and value.subtype == 4:
+        return value.as_uuid(UuidRepresentation.STANDARD)
+    if isinstance(value, str):
+        return uuid.UUID(value)
+    raise ValueError(f"Expected a UUID, got {value!r}")
+
+
+def as_id(value: str) -> Union[uuid.UUID, str]:
+    """Query value for an id from a URL or query string.
+
+    Something that is not a UUID is passed through unchanged: it matches no
+    document, so handlers answer 404 for it as they always have.
+    """
+    try:
+        return to_uuid(value)
+    except ValueError:
+        return value
+
+
+def new_id() -> uuid.UUID:
+    return uuid.uuid4()
+
+
+# Stored as BSON binary UUIDs (subtype 4, 16 bytes); accept the legacy
+# strings and serialise back to them in responses, so the API contract does
+# not change.
+EntityId = Annotated[uuid.UUID, BeforeValidator(to_uuid), PlainSerializer(str, return_type=str, when_used="json")]
+
+# Path and query parameters holding ids: converted like `as_id`, so a
+# malformed id still gets a 404 rather than a validation error
+IdParam = Annotated[Union[uuid.UUID, str], BeforeValidator(as_id)]
+
+# Id and foreign key fields per collection
+ID_FIELDS = {
+    "users": ("id",),
+    "customers": ("id",),
+    "vehicles": ("id", "customer_id"),
+    "jobs": ("id", "vehicle_id", "customer_id"),
+    "tune_revisions": ("id", "job_id", "vehicle_id"),
+    "billing": ("id", "job_id"),
+    "reminders": ("id", "vehicle_id", "customer_id", "job_id"),
+    "appointments": ("id", "customer_id", "vehicle_id"),
+    "appointment_slots": ("appointment_id",),
+    "changes": ("id",),
+}
+
+# The migrations document migrate_ids.py checkpoints in
+BINARY_IDS_MIGRATION = "binary_ids"
+
+
+async def binary_ids_ready(db) -> bool:
+    """Whether every id is stored in binary, so lookups by id find every record.
+
+    True once migrate_ids.py has finished. A database without string ids
+    (e.g. a new one) is marked finished on the spot, so later startups only
+    read the marker.
+    """
+    marker = await db.migrations.find_one({"_id": BINARY_IDS_MIGRATION}, {"completed_in_seconds": 1})
+    if marker and "completed_in_seconds" in marker:
+        return True
+    for collection, fields in ID_FIELDS.items():
+        legacy = {"$or": [{field: {"$type": "string"}} for field in fields]}
+        if await db[collection].find_one(legacy, {"_id": 1}):
+            return False
+    await db.migrations.update_one(
+        {"_id": BINARY_IDS_MIGRATION}, {"$set": {"completed_in_seconds": 0}}, upsert=True
+    )
+    return True
@@ -0,0 +1,101 @@
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+# Finished background tasks stay queryable for a week
+TASK_RETENTION_SECONDS = 7 * 86400
+# How far back an SSE client can resume from
+EVENT_RETENTION_SECONDS = 3600
+
+# Secondary indexes per collection. Compound indexes lead with the equality
+# filter and end with the field the endpoint sorts or ranges on.
+INDEXES = {
+    "users": [
+        IndexModel([("username", ASCENDING)], unique=True),
+    ],
+    "customers": [
+        IndexModel([("id", ASCENDING)], unique=True),
+    ],
+    "vehicles": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("customer_id", ASCENDING)]),
+    ],
+    "jobs": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("vehicle_id", ASCENDING), ("date", DESCENDING)]),
+        IndexModel([("customer_id", ASCENDING), ("date", DESCENDING)]),
+        IndexModel([("date", DESCENDING)]),
+    ],
+    "billing": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("job_id", ASCENDING), ("created_at", ASCENDING)]),
+        IndexModel([("created_at", ASCENDING)]),
+    ],
+    "tune_revisions": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("job_id", ASCENDING), ("created_at", ASCENDING)]),
+        IndexModel([("vehicle_id", ASCENDING), ("created_at", ASCENDING)]),
+    ],
+    "appointments": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("appointment_date", ASCENDING), ("appointment_time", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("appointment_date", ASCENDING)]),
+        IndexModel([("vehicle_id", ASCENDING), ("appointment_date", ASCENDING)]),
+        IndexModel([("customer_id", ASCENDING), ("appointment_date", ASCENDING)]),
+        IndexModel([("technician_name", ASCENDING), ("appointment_date", ASCENDING)]),
+    ],
+    "reminders": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("reminder_date", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("reminder_date", ASCENDING)]),
+        IndexModel([("vehicle_id", ASCENDING), ("reminder_date", ASCENDING)]),
+        IndexModel([("customer_id", ASCENDING), ("reminder_date", ASCENDING)]),
+        IndexModel([("job_id", ASCENDING), ("reminder_date", ASCENDING)]),
+    ],
+    # Archives serve single-record and per-vehicle/per-job history reads
+    "jobs_archive": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("vehicle_id", ASCENDING), ("date", DESCENDING)]),
+        IndexModel([("customer_id", ASCENDING), ("date", DESCENDING)]),
+        IndexModel([("date", DESCENDING)]),
+    ],
+    "billing_archive": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("job_id", ASCENDING), ("created_at", ASCENDING)]),
+        IndexModel([("created_at", ASCENDING)]),
+    ],
+    "tune_revisions_archive": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("job_id", ASCENDING), ("created_at", ASCENDING)]),
+        IndexModel([("vehicle_id", ASCENDING), ("created_at", ASCENDING)]),
+    ],
+    "reminders_archive": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("job_id", ASCENDING), ("reminder_date", ASCENDING)]),
+    ],
+    # The collector looks owners up by id
+    "uploads": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("job_id", ASCENDING)]),
+        IndexModel([("revision_id", ASCENDING)]),
+    ],
+    # Workers claim the highest-priority due task; finished ones expire
+    "tasks": [
+        IndexModel([("status", ASCENDING), ("priority", DESCENDING), ("run_at", ASCENDING)]),
+        IndexModel([("finished_at", ASCENDING)], expireAfterSeconds=TASK_RETENTION_SECONDS),
+    ],
+    # Live events by sequence number; a change stream event is logged once per resume token
+    "events": [
+        IndexModel([("key", ASCENDING)], unique=True, sparse=True),
+        IndexModel([("created_at", ASCENDING)], expireAfterSeconds=EVENT_RETENTION_SECONDS),
+    ],
+    "changes": [
+        IndexModel([("collection", ASCENDING), ("id", ASCENDING)], unique=True),
+        IndexModel([("seq", ASCENDING)]),
+        IndexModel([("deleted", ASCENDING), ("at", ASCENDING)]),
+    ],
+}
+
+
+async def ensure_indexes(db):
+    """Create all secondary indexes. Safe to call on every startup."""
+    for collection, indexes in INDEXES.items():
+        await db[collection].create_indexes(indexes)
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from pymongo.errors import PyMongoError
+
+from utils.archive import archive_name
+
+logger = logging.getLogger(__name__)
+
+# Records that block deleting their parent: (collection, foreign key, reason)
+RESTRICT = {
+    "customers": (
+        ("vehicles", "customer_id", "Please delete the associated vehicles first."),
+    ),
+    "vehicles": (
+        ("jobs", "vehicle_id", "Please delete the associated jobs first."),
+        (archive_name("jobs"), "vehicle_id", "It has archived service history."),
+    ),
+}
+# Records deleted together with their parent: (collection, foreign key)
+CASCADE = {
+    "customers": (),
+    "vehicles": (("tune_revisions", "vehicle_id"), ("reminders", "vehicle_id"), ("appointments", "vehicle_id")),
+    "jobs": (("tune_revisions", "job_id"), ("billing", "job_id")),
+}
+
+
+class DeleteRestricted(Exception):
+    """Other records still refer to the one being deleted."""
+
+
+class Integrity:
+    """Deletes a record together with the records that hang off it.
+
+    Blocking references (RESTRICT) are found with indexed
+    `count_documents(limit=1)` checks. On a replica set or sharded cluster
+    the parent and every CASCADE child are deleted in one transaction, so
+    nobody sees a half-deleted history. A standalone server has no
+    transactions: there the checks run concurrently, then the children are
+    deleted concurrently and the parent last, so an interrupted delete
+    leaves the parent in place to be deleted again.
+    """
+
+    def __init__(self):
+        self._transactions: Optional[bool] = None
+
+    async def supports_transactions(self, db) -> bool:
+        if self._transactions is None:
+            try:
+                hello = await db.command("hello")
+            except PyMongoError as e:
+                # Ask again next time rather than settle on a guess
+                logger.warning(f"Could not tell whether transactions are available: {e}")
+                return False
+            self._transactions = "setName" in hello or hello.get("msg") == "isdbgrid"
+        return self._transactions
+
+    async def _check(self, db, collection: str, document_id, session=None):
+        restrictions = RESTRICT.get(collection, ())
+        if session is None:
+            counts = await asyncio.gather(*(
+                db[child].count_documents({field: document_id}, limit=1) for child, field, _ in restrictions
+            ))
+        else:
+            # Operations in a session run one at a time
+            counts = [
+                await db[child].count_documents({field: document_id}, limit=1, session=session)
+                for child, field, _ in restrictions
+            ]
+        for count, (_, _, reason) in zip(counts, restrictions):
+            if count:
+                raise DeleteRestricted(reason)
+
+    async def _delete_children(self, db, child: str, field: str, document_id, session=None) -> List[dict]:
+        documents = await db[child].find({field: document_id}, {"_id": 0}, session=session).to_list(None)
+        if documents:
+            # By id, so nothing written since the read goes without a tombstone
+            await db[child].delete_many({"id": {"$in": [d["id"] for d in documents]}}, session=session)
+        return documents
+
+    async def delete(self, db, collection: str, document_id) -> Optional[Dict[str, List[dict]]]:
+        """Delete a record and its CASCADE children.
+
+        Returns the deleted documents by collection, or None if the record
+        does not exist. Raises DeleteRestricted if RESTRICT records still
+        refer to it.
+        """
+        if await self.supports_transactions(db):
+            return await self._delete_in_transaction(db, collection, document_id)
+
+        await self._check(db, collection, document_id)
+        parent = await db[collection].find_one({"id": document_id}, {"_id": 0})
+        if parent is None:
+            return None
+        cascade = CASCADE.get(collection, ())
+        children = await asyncio.gather(*(
+            self._delete_children(db, child, field, document_id) for child, field in cascade
+        ))
+        result = await db[collection].delete_one({"id": document_id})
+        if result.deleted_count == 0:
+            return None
+        return {collection: [parent], **{child: docs for (child, _), docs in zip(cascade, children)}}
+
+    async def _delete_in_transaction(self, db, collection: str, document_id) -> Optional[Dict[str, List[dict]]]:
+        async def cascade(session) -> Optional[Dict[str, List[dict]]]:
+            await self._check(db, collection, document_id, session)
+            parent = await db[collection].find_one_and_delete(
+                {"id": document_id}, projection={"_id": 0}, session=session
+            )
+            if parent is None:
+                return None
+            deleted = {collection: [parent]}
+            for child, field in CASCADE.get(collection, ()):
+                deleted[child] = await self._delete_children(db, child, field, document_id, session)
+            return deleted
+
+        # with_transaction retries on transient errors and unknown commit results
+        async with await db.client.start_session() as session:
+            return await session.with_transaction(cascade)
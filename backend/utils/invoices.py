@@ -0,0 +1,339 @@
+import asyncio
+import hashlib
+import json
+import re
+import textwrap
+import zipfile
+import zlib
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from utils.archive import archive_name
+from utils.dates import day_key
+from utils.files import write_file
+from utils.tasks import WorkerPool
+
+# Bump when the layout changes, so cached invoices are rendered again
+INVOICE_LAYOUT_VERSION = 1
+# What an invoice shows of each related record
+INVOICE_PROJECTIONS = {
+    "jobs": {"_id": 0, "id": 1, "date": 1, "technician_name": 1, "tune_stage": 1, "work_performed": 1,
+             "customer_id": 1, "vehicle_id": 1},
+    "customers": {"_id": 0, "id": 1, "full_name": 1, "phone_number": 1, "email": 1, "address": 1, "gst_number": 1},
+    "vehicles": {"_id": 0, "id": 1, "year": 1, "make": 1, "model": 1, "variant": 1, "registration_number": 1,
+                 "vin": 1},
+}
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 in points
+MARGIN = 50
+# The standard Type 1 fonts every PDF reader has, so nothing is embedded
+FONTS = {"F1": "Helvetica", "F2": "Helvetica-Bold", "F3": "Courier"}
+
+
+def _escape(text) -> bytes:
+    # WinAnsi covers cp1252; anything else (e.g. the rupee sign) prints as ?
+    text = re.sub(r"\s", " ", str(text))
+    return text.encode("cp1252", "replace").replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def _money(amount: Optional[float]) -> str:
+    return f"INR {amount or 0:,.2f}"
+
+
+class _Page:
+    """Drawing operations for one page, top to bottom."""
+
+    def __init__(self):
+        self.ops: List[bytes] = []
+        self.y = PAGE_HEIGHT - MARGIN
+
+    def text(self, x: float, text, font: str = "F1", size: int = 10, y: Optional[float] = None):
+        y = self.y if y is None else y
+        self.ops.append(b"BT /%s %d Tf %.2f %.2f Td (%s) Tj ET" % (font.encode(), size, x, y, _escape(text)))
+
+    def right(self, x: float, text, size: int = 10, y: Optional[float] = None):
+        # Courier is monospaced (600/1000 em per glyph), so right alignment needs no metrics
+        self.text(x - len(str(text)) * size * 0.6, text, "F3", size, y)
+
+    def rule(self):
+        self.ops.append(b"0.6 w %d %.2f m %d %.2f l S" % (MARGIN, self.y, PAGE_WIDTH - MARGIN, self.y))
+
+    def down(self, points: float):
+        self.y -= points
+
+
+def _pdf(content: bytes, title: str) -> bytes:
+    """A one-page PDF around a content stream."""
+    fonts = " ".join(f"/{name} {4 + i} 0 R" for i, name in enumerate(FONTS)).encode()
+    stream = zlib.compress(content)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << /Font << %s >> >> /Contents %d 0 R >>"
+        % (PAGE_WIDTH, PAGE_HEIGHT, fonts, 4 + len(FONTS)),
+        *(b"<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>" % font.encode()
+          for font in FONTS.values()),
+        b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream" % (len(stream), stream),
+        b"<< /Title (%s) /Producer (IgnitionLab Dynamics) >>" % _escape(title),
+    ]
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, len(objects), xref
+    )
+    return bytes(out)
+
+
+def render_invoice_pdf(context: dict) -> bytes:
+    """Render an invoice from an `InvoiceRenderer.contexts` entry. CPU-bound and picklable, for a process pool."""
+    page = _Page()
+    issuer, customer, vehicle, job = context["issuer"], context["customer"], context["vehicle"], context["job"]
+    left, middle, right = MARGIN, PAGE_WIDTH / 2 + 10, PAGE_WIDTH - MARGIN
+
+    page.text(left, issuer["name"], "F2", 18)
+    page.text(middle + 60, "TAX INVOICE", "F2", 14)
+    page.down(20)
+    top = page.y
+    for line in issuer["address"] + ([f"GSTIN: {issuer['gstin']}"] if issuer["gstin"] else []):
+        page.text(left, line, size=9)
+        page.down(12)
+    for i, (label, value) in enumerate((
+        ("Invoice no.", context["invoice_number"]),
+        ("Date", context["issued_on"]),
+        ("Status", context["payment_status"].upper()),
+    )):
+        page.text(middle + 60, f"{label}:", "F2", 9, y=top - 12 * i)
+        page.text(middle + 130, value, size=9, y=top - 12 * i)
+    page.y = min(page.y, top - 36) - 10
+    page.rule()
+    page.down(22)
+
+    top = page.y
+    page.text(left, "Bill to", "F2", 11)
+    page.text(middle, "Vehicle", "F2", 11)
+    page.down(15)
+    for line in [
+        customer.get("full_name"),
+        " / ".join(v for v in (customer.get("phone_number"), customer.get("email")) if v),
+        *textwrap.wrap(customer.get("address") or "", 45)[:3],
+        f"GSTIN: {customer['gst_number']}" if customer.get("gst_number") else None,
+    ]:
+        if line:
+            page.text(left, line)
+            page.down(13)
+    vehicle_y = top - 15
+    for line in [
+        " ".join(str(v) for v in (vehicle.get("year"), vehicle.get("make"), vehicle.get("model"),
+                                  vehicle.get("variant")) if v),
+        f"Registration: {vehicle['registration_number']}" if vehicle.get("registration_number") else None,
+        f"VIN: {vehicle['vin']}" if vehicle.get("vin") else None,
+    ]:
+        if line:
+            page.text(middle, line, y=vehicle_y)
+            vehicle_y -= 13
+    page.y = min(page.y, vehicle_y) - 10
+    page.rule()
+    page.down(22)
+
+    page.text(left, "Service", "F2", 11)
+    page.down(15)
+    details = [("Date", job.get("date")), ("Technician", job.get("technician_name")), ("Stage", job.get("tune_stage"))]
+    page.text(left, "    ".join(f"{label}: {value}" for label, value in details if value))
+    page.down(13)
+    work = textwrap.wrap(job.get("work_performed") or "", 95)
+    for line in work[:12]:
+        page.text(left, line, size=9)
+        page.down(12)
+    if len(work) > 12:
+        page.text(left, "...", size=9)
+        page.down(12)
+    page.down(8)
+    page.rule()
+    page.down(22)
+
+    rows = [("Quoted amount", _money(context["quoted_amount"]))]
+    if context["discounts"]:
+        rows.append(("Discounts", "-" + _money(context["discounts"])))
+    if context["refunds"]:
+        rows.append(("Refunds", "-" + _money(context["refunds"])))
+    for label, amount in rows:
+        page.text(middle, label)
+        page.right(right, amount)
+        page.down(15)
+    page.text(middle, "Total billed", "F2", 11)
+    page.right(right, _money(context["final_billed_amount"]), 11)
+    page.down(20)
+    page.text(middle, f"Payment: {context['payment_method']} ({context['payment_status']})", size=9)
+    page.down(24)
+
+    if context["notes"]:
+        page.text(left, "Notes", "F2", 10)
+        page.down(13)
+        for line in textwrap.wrap(context["notes"], 95)[:8]:
+            page.text(left, line, size=9)
+            page.down(12)
+
+    return _pdf(b"\n".join(page.ops), f"Invoice {context['invoice_number']}")
+
+
+def invoice_hash(context: dict) -> str:
+    encoded = json.dumps([INVOICE_LAYOUT_VERSION, context], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode()).hexdigest()[:32]
+
+
+def invoice_filename(context: dict) -> str:
+    number = re.sub(r"[^\w.-]+", "_", context["invoice_number"])
+    return f"invoice-{number}.pdf"
+
+
+class _ZipStream:
+    """Write-only file object for zipfile that hands back what has been written so far."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+class InvoiceRenderer:
+    """Invoice PDFs rendered in a process pool and cached on disk by content.
+
+    `context` gathers everything an invoice shows from the billing record,
+    its job, customer and vehicle, and the cache file is named after the
+    billing id and a hash of that context plus INVOICE_LAYOUT_VERSION. Any
+    change to the inputs therefore renders a new file, which replaces the
+    billing record's older ones; `invalidate` removes them outright when
+    the billing record changes. Rendering runs on `pool`, at most
+    `concurrency` invoices at a time for bulk exports.
+    """
+
+    def __init__(self, directory: Path, pool: WorkerPool, issuer: dict, concurrency: int = 4):
+        self.directory = directory
+        self.pool = pool
+        self.issuer = issuer
+        self.concurrency = concurrency
+        directory.mkdir(parents=True, exist_ok=True)
+
+    async def _load(self, db, collection: str, ids: Iterable, archived: bool = False) -> Dict:
+        ids = list({i for i in ids if i})
+        documents = {}
+        for name in (collection, archive_name(collection)) if archived else (collection,):
+            missing = [i for i in ids if i not in documents]
+            if missing:
+                async for document in db[name].find({"id": {"$in": missing}}, INVOICE_PROJECTIONS[collection]):
+                    documents[document["id"]] = document
+        return documents
+
+    async def contexts(self, db, billing: List[dict]) -> List[dict]:
+        """Invoice inputs for billing records, with their related records loaded in one query per collection."""
+        jobs = await self._load(db, "jobs", (b.get("job_id") for b in billing), archived=True)
+        customers, vehicles = await asyncio.gather(
+            self._load(db, "customers", (j.get("customer_id") for j in jobs.values())),
+            self._load(db, "vehicles", (j.get("vehicle_id") for j in jobs.values())),
+        )
+        contexts = []
+        for bill in billing:
+            job = jobs.get(bill.get("job_id")) or {}
+            customer = customers.get(job.get("customer_id")) or {}
+            vehicle = vehicles.get(job.get("vehicle_id")) or {}
+            contexts.append({
+                "issuer": self.issuer,
+                "billing_id": str(bill["id"]),
+                "invoice_number": bill.get("gst_invoice_number") or f"IL-{str(bill['id'])[:8].upper()}",
+                "issued_on": day_key(bill["created_at"]),
+                "quoted_amount": bill.get("quoted_amount"),
+                "final_billed_amount": bill.get("final_billed_amount"),
+                "discounts": bill.get("discounts"),
+                "refunds": bill.get("refunds"),
+                "payment_method": bill.get("payment_method") or "",
+                "payment_status": bill.get("payment_status") or "",
+                "notes": bill.get("notes"),
+                "customer": {k: v for k, v in customer.items() if k not in ("id",)},
+                "vehicle": {k: v for k, v in vehicle.items() if k not in ("id", "customer_id")},
+                "job": {
+                    "date": day_key(job["date"]) if job.get("date") else None,
+                    **{k: job.get(k) for k in ("technician_name", "tune_stage", "work_performed")},
+                },
+            })
+        return contexts
+
+    def _path(self, context: dict) -> Path:
+        return self.directory / f"{context['billing_id']}-{invoice_hash(context)}.pdf"
+
+    def _read(self, path: Path) -> Optional[bytes]:
+        try:
+            return path.read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def _store(self, path: Path, pdf: bytes):
+        write_file(path, pdf)
+        billing_id = path.name[:36]
+        for stale in self.directory.glob(f"{billing_id}-*.pdf"):
+            if stale != path:
+                stale.unlink(missing_ok=True)
+
+    async def render(self, context: dict) -> bytes:
+        """The invoice PDF, from the cache or rendered and cached."""
+        path = self._path(context)
+        pdf = await asyncio.to_thread(self._read, path)
+        if pdf is None:
+            pdf = await self.pool.run(render_invoice_pdf, context)
+            await asyncio.to_thread(self._store, path, pdf)
+        return pdf
+
+    async def render_many(self, contexts: List[dict]) -> AsyncIterator[Tuple[dict, bytes]]:
+        """(context, pdf) pairs in the order they finish."""
+        slots = asyncio.Semaphore(self.concurrency)
+
+        async def render(context: dict) -> Tuple[dict, bytes]:
+            async with slots:
+                return context, await self.render(context)
+
+        tasks = [asyncio.ensure_future(render(context)) for context in contexts]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            # The client went away: stop rendering what nobody will download
+            for task in tasks:
+                task.cancel()
+
+    async def zip(self, contexts: List[dict]) -> AsyncIterator[bytes]:
+        """Stream a zip of the invoices, sending each one as soon as it is rendered."""
+        stream = _ZipStream()
+        names = set()
+        # PDF content streams are already deflated
+        with zipfile.ZipFile(stream, "w", zipfile.ZIP_STORED) as archive:
+            async for context, pdf in self.render_many(contexts):
+                name = invoice_filename(context)
+                if name in names:
+                    name = f"{name[:-4]}-{context['billing_id'][:8]}.pdf"
+                names.add(name)
+                archive.writestr(name, pdf)
+                yield stream.take()
+        yield stream.take()
+
+    def _remove(self, billing_ids: List[str]):
+        for billing_id in billing_ids:
+            for path in self.directory.glob(f"{billing_id}-*.pdf"):
+                path.unlink(missing_ok=True)
+
+    async def invalidate(self, billing_ids: Iterable):
+        """Drop cached invoices of these billing records."""
+        await asyncio.to_thread(self._remove, [str(i) for i in billing_ids])
@@ -0,0 +1,380 @@
+import bisect
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from fastapi.routing import APIRoute
+from pymongo import monitoring
+
+REQUEST_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MONGO_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# Commands whose first field names the collection they run against
+COLLECTION_COMMANDS = {
+    "find", "insert", "update", "delete", "aggregate", "count", "distinct",
+    "findAndModify", "createIndexes", "listIndexes", "drop",
+}
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    """Monotonic counter with labels, safe to update from pymongo's monitoring threads."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def values(self) -> Dict[tuple, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labels, key)} {value}" for key, value in self.values().items()]
+
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+
+    kind = "gauge"
+
+    def dec(self, *label_values, amount: float = 1):
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, *label_values, value: float):
+        with self._lock:
+            self._values[label_values] = value
+
+
+class Histogram:
+    """Fixed-bucket histogram; observations cost one bisect and one lock."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (), buckets=REQUEST_LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (+Inf last), sum]
+        self._values: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, *label_values, value: float):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][i] += 1
+            entry[1] += value
+
+    def summary(self) -> Dict[tuple, dict]:
+        """Count and mean per label set."""
+        with self._lock:
+            return {
+                key: {"count": sum(counts), "mean": total / sum(counts) if sum(counts) else 0.0}
+                for key, (counts, total) in self._values.items()
+            }
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labels + ('le',), key + (le,))} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """Register a callable run before each scrape, e.g. to refresh gauges."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            collector()
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests_total = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route, method and status", ("route", "method", "status")
+))
+http_request_duration_seconds = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("route", "method")
+))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served", ("route", "method")
+))
+mongo_commands_total = registry.register(Counter(
+    "mongo_commands_total", "MongoDB commands by collection, operation and outcome", ("collection", "operation", "outcome")
+))
+mongo_command_duration_seconds = registry.register(Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency", ("collection", "operation"), buckets=MONGO_LATENCY_BUCKETS
+))
+mongo_pool_connections = registry.register(Gauge(
+    "mongo_pool_connections", "Open connections in the MongoDB pool", ("address",)
+))
+mongo_pool_checked_out = registry.register(Gauge(
+    "mongo_pool_checked_out", "MongoDB connections currently checked out", ("address",)
+))
+mongo_pool_max_size = registry.register(Gauge(
+    "mongo_pool_max_size", "Configured maximum MongoDB pool size"
+))
+mongo_pool_checkout_failures_total = registry.register(Counter(
+    "mongo_pool_checkout_failures_total", "Failed MongoDB connection checkouts by reason", ("address", "reason")
+))
+mongo_pool_checkout_wait_seconds = registry.register(Histogram(
+    "mongo_pool_checkout_wait_seconds", "Time spent waiting for a pooled MongoDB connection", ("address",),
+    buckets=MONGO_LATENCY_BUCKETS
+))
+
+entity_cache_lookups_total = registry.register(Counter(
+    "entity_cache_lookups_total", "Entity cache lookups by collection and result", ("collection", "result")
+))
+entity_cache_entries = registry.register(Gauge(
+    "entity_cache_entries", "Documents held in the in-process entity cache"
+))
+entity_cache_bytes = registry.register(Gauge(
+    "entity_cache_bytes", "Encoded size of the documents in the in-process entity cache"
+))
+
+coalesced_requests_total = registry.register(Counter(
+    "coalesced_requests_total",
+    "Requests to coalesced endpoints by outcome: executed, joined an identical one in flight, or cached",
+    ("route", "outcome")
+))
+
+background_tasks_total = registry.register(Counter(
+    "background_tasks_total", "Queued background tasks run, by task name and outcome", ("name", "outcome")
+))
+background_task_duration_seconds = registry.register(Histogram(
+    "background_task_duration_seconds", "Time spent running a queued background task", ("name",)
+))
+
+
+def command_collection(command_name: str, command: dict) -> str:
+    """Collection a command targets, or '-' for database-level commands."""
+    if command_name == "getMore":
+        return command.get("collection", "-")
+    if command_name in COLLECTION_COMMANDS:
+        target = command.get(command_name)
+        if isinstance(target, str):
+            return target
+    return "-"
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """Records latency and counts for every MongoDB command the client sends."""
+
+    def __init__(self):
+        self._pending: Dict[tuple, str] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        collection = command_collection(event.command_name, event.command)
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = collection
+
+    def _finish(self, event, outcome: str):
+        with self._lock:
+            collection = self._pending.pop((event.connection_id, event.request_id), "-")
+        mongo_commands_total.inc(collection, event.command_name, outcome)
+        mongo_command_duration_seconds.observe(
+            collection, event.command_name, value=event.duration_micros / 1_000_000
+        )
+
+    def succeeded(self, event):
+        self._finish(event, "success")
+
+    def failed(self, event):
+        self._finish(event, "failure")
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """Tracks pool size, checkouts and checkout wait per server address.
+
+    A checkout starts and finishes on the same thread, so the start time is
+    kept in a thread-local.
+    """
+
+    def __init__(self):
+        self._checkout = threading.local()
+
+    def _address(self, event) -> str:
+        host, port = event.address
+        return f"{host}:{port}"
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        address = self._address(event)
+        mongo_pool_connections.set(address, value=0)
+        mongo_pool_checked_out.set(address, value=0)
+
+    def connection_created(self, event):
+        mongo_pool_connections.inc(self._address(event))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        mongo_pool_connections.dec(self._address(event))
+
+    def connection_check_out_started(self, event):
+        self._checkout.started = time.perf_counter()
+
+    def _observe_wait(self, address: str):
+        started = getattr(self._checkout, "started", None)
+        if started is not None:
+            mongo_pool_checkout_wait_seconds.observe(address, value=time.perf_counter() - started)
+            self._checkout.started = None
+
+    def connection_check_out_failed(self, event):
+        address = self._address(event)
+        self._observe_wait(address)
+        mongo_pool_checkout_failures_total.inc(address, str(event.reason))
+
+    def connection_checked_out(self, event):
+        address = self._address(event)
+        self._observe_wait(address)
+        mongo_pool_checked_out.inc(address)
+
+    def connection_checked_in(self, event):
+        mongo_pool_checked_out.dec(self._address(event))
+
+
+def pool_snapshot(max_pool_size: int) -> dict:
+    """Current pool usage per server, for sizing the pool under load."""
+    servers = {}
+    checked_out = mongo_pool_checked_out.values()
+    waits = mongo_pool_checkout_wait_seconds.summary()
+    for (address,), open_connections in mongo_pool_connections.values().items():
+        in_use = checked_out.get((address,), 0)
+        wait = waits.get((address,), {"count": 0, "mean": 0.0})
+        servers[address] = {
+            "open_connections": open_connections,
+            "checked_out": in_use,
+            "utilisation": round(in_use / max_pool_size, 4) if max_pool_size else None,
+            "checkouts": wait["count"],
+            "mean_checkout_wait_ms": round(wait["mean"] * 1000, 3),
+        }
+    failures = {f"{address} {reason}": count for (address, reason), count in mongo_pool_checkout_failures_total.values().items()}
+    return {"max_pool_size": max_pool_size, "servers": servers, "checkout_failures": failures}
+
+
+class MetricsRoute(APIRoute):
+    """APIRoute that counts its requests in flight, labelled by its own path template.
+
+    Counted here rather than in MetricsMiddleware because only the router
+    knows which route a request matched before it runs.
+    """
+
+    async def handle(self, scope, receive, send):
+        method = scope["method"]
+        http_requests_in_flight.inc(self.path, method)
+        try:
+            await super().handle(scope, receive, send)
+        finally:
+            http_requests_in_flight.dec(self.path, method)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route request count and latency.
+
+    Routes are labelled by their path template (e.g. /api/jobs/{job_id}) so
+    ids never become label values. The router leaves the route it matched in
+    `scope["route"]`; only requests no route matched, or answered before
+    routing (an open circuit, a CORS preflight), are matched against the
+    routes here. Unmatched paths share one label.
+    """
+
+    def __init__(self, app, routes_provider):
+        self.app = app
+        self._routes_provider = routes_provider
+        self._routes: Optional[list] = None
+
+    def _route_label(self, scope) -> str:
+        route = scope.get("route")
+        if route is not None:
+            return route.path
+        if self._routes is None:
+            self._routes = [
+                (route.path_regex, getattr(route, "methods", None), route.path)
+                for route in self._routes_provider()
+                if hasattr(route, "path_regex")
+            ]
+        path = scope["path"]
+        method = scope["method"]
+        for regex, methods, template in self._routes:
+            if (not methods or method in methods) and regex.match(path):
+                return template
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_code[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = self._route_label(scope)
+            http_request_duration_seconds.observe(route, method, value=time.perf_counter() - start)
+            http_requests_total.inc(route, method, str(status_code[0]))
@@ -0,0 +1,72 @@
+import asyncio
+from typing import Callable, Iterable
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+DUPLICATE_KEY = 11000
+
+
+async def convert_string_fields(db, migration_id: str, collection: str, fields: Iterable[str],
+                                convert: Callable, batch_size: int = 1000, pause: float = 0) -> dict:
+    """Rewrite string values of `fields` in one collection as `convert(value)`, in batches.
+
+    Documents are walked in _id order and each one is only updated if the
+    strings are unchanged since the batch read them, so writes the server
+    makes in the meantime are never overwritten. Progress is checkpointed in
+    the `migrations` document `migration_id`, so an interrupted run resumes
+    where it stopped. Values `convert` rejects with ValueError, and updates a
+    unique index refuses, are counted and left alone.
+    """
+    fields = tuple(fields)
+    counts = {"converted": 0, "skipped": 0, "invalid": 0, "conflicts": 0}
+    checkpoint = await db.migrations.find_one({"_id": migration_id}, {f"progress.{collection}": 1}) or {}
+    progress = checkpoint.get("progress", {}).get(collection, {})
+    if progress.get("done"):
+        return counts
+
+    last_id = progress.get("last_id")
+    legacy = {"$or": [{field: {"$type": "string"}} for field in fields]}
+    while True:
+        query = {"$and": [legacy, {"_id": {"$gt": last_id}}]} if last_id is not None else legacy
+        batch = await db[collection].find(query, {field: 1 for field in fields}).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+
+        operations = []
+        for document in batch:
+            strings = {field: document[field] for field in fields if isinstance(document.get(field), str)}
+            converted = {}
+            for field, value in strings.items():
+                try:
+                    converted[field] = convert(value)
+                except ValueError:
+                    counts["invalid"] += 1
+            if converted:
+                operations.append(UpdateOne(
+                    {"_id": document["_id"], **{field: strings[field] for field in converted}},
+                    {"$set": converted},
+                ))
+        if operations:
+            try:
+                result = await db[collection].bulk_write(operations, ordered=False)
+                details = result.bulk_api_result
+            except BulkWriteError as e:
+                details = e.details
+                if any(error["code"] != DUPLICATE_KEY for error in details["writeErrors"]):
+                    raise
+                counts["conflicts"] += len(details["writeErrors"])
+            counts["converted"] += details["nModified"]
+            counts["skipped"] += len(operations) - details["nMatched"] - len(details.get("writeErrors", []))
+
+        last_id = batch[-1]["_id"]
+        await db.migrations.update_one(
+            {"_id": migration_id}, {"$set": {f"progress.{collection}.last_id": last_id}}, upsert=True
+        )
+        if pause:
+            await asyncio.sleep(pause)
+
+    await db.migrations.update_one(
+        {"_id": migration_id}, {"$set": {f"progress.{collection}.done": True}}, upsert=True
+    )
+    return counts
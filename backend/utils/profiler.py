@@ -0,0 +1,219 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, List, Optional
+
+from pymongo import monitoring
+
+# Driver-added fields that must not be sent back inside an explain
+DRIVER_FIELDS = {
+    "lsid", "$db", "$clusterTime", "$readPreference", "txnNumber", "autocommit",
+    "startTransaction", "readConcern", "writeConcern", "apiVersion", "apiStrict",
+}
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+EXPLAIN_COOLDOWN_SECONDS = 300
+
+
+def redact(value):
+    """Replace literal values with '?' while keeping field names and operators."""
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        # Logical operators hold sub-filters; anything else is a literal list
+        if value and isinstance(value[0], dict):
+            return [redact(item) for item in value]
+        return ["?"]
+    return "?"
+
+
+def command_filter(command_name: str, command: dict) -> dict:
+    """The query filter a command applies, or {} if it has none."""
+    if command_name == "find":
+        return command.get("filter") or {}
+    if command_name in ("count", "distinct", "findAndModify"):
+        return command.get("query") or {}
+    if command_name == "update":
+        updates = command.get("updates") or [{}]
+        return updates[0].get("q") or {}
+    if command_name == "delete":
+        deletes = command.get("deletes") or [{}]
+        return deletes[0].get("q") or {}
+    if command_name == "aggregate":
+        for stage in command.get("pipeline") or []:
+            if "$match" in stage:
+                return stage["$match"]
+    return {}
+
+
+def filter_fields(query: dict) -> List[str]:
+    """Field paths a filter constrains, including those nested in $and/$or."""
+    fields = []
+    for key, value in query.items():
+        if key in ("$and", "$or", "$nor") and isinstance(value, list):
+            for clause in value:
+                if isinstance(clause, dict):
+                    fields.extend(f for f in filter_fields(clause) if f not in fields)
+        elif not key.startswith("$") and key not in fields:
+            fields.append(key)
+    return fields
+
+
+def plan_stages(explain: dict) -> List[str]:
+    """All stage names in the winning plan(s) of an explain result."""
+    stages = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            for key, item in node.items():
+                if key == "rejectedPlans":
+                    continue
+                if key == "stage" and isinstance(item, str):
+                    stages.append(item)
+                else:
+                    walk(item)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+
+    walk(explain)
+    return stages
+
+
+class SlowQueryProfiler(monitoring.CommandListener):
+    """Records MongoDB commands slower than a threshold and explains them.
+
+    Runs inside pymongo's command monitoring, so the only per-command cost is
+    remembering the command until it finishes. Slow commands land in a bounded
+    ring buffer; explains run later on the event loop, at most once per query
+    shape per cooldown, and collection scans become named findings.
+    """
+
+    def __init__(self, threshold_ms: float = 100, buffer_size: int = 200):
+        self.threshold_ms = threshold_ms
+        self.entries: Deque[dict] = deque(maxlen=buffer_size)
+        self.findings: Dict[str, dict] = {}
+        self._pending: Dict[tuple, tuple] = {}
+        self._explained: Dict[str, float] = {}
+        self._shape_findings: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._client = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def attach(self, client, loop: asyncio.AbstractEventLoop):
+        """Enable background explains using this Motor client and event loop."""
+        self._client = client
+        self._loop = loop
+
+    def started(self, event):
+        if event.command_name == "explain":
+            return
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (
+                event.command_name, event.command, event.database_name
+            )
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event)
+
+    def _finish(self, event):
+        with self._lock:
+            pending = self._pending.pop((event.connection_id, event.request_id), None)
+        duration_ms = event.duration_micros / 1000
+        if pending is None or duration_ms < self.threshold_ms:
+            return
+
+        command_name, command, database_name = pending
+        collection = command.get(command_name) if command_name != "getMore" else command.get("collection")
+        query = command_filter(command_name, command)
+        shape = redact(query)
+        entry = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "database": database_name,
+            "collection": collection if isinstance(collection, str) else None,
+            "operation": command_name,
+            "duration_ms": round(duration_ms, 2),
+            "filter_shape": shape,
+            "plan_stages": None,
+            "collscan": None,
+        }
+        if command_name == "aggregate":
+            entry["pipeline_stages"] = [next(iter(stage)) for stage in command.get("pipeline") or [] if stage]
+        self.entries.append(entry)
+
+        shape_key = f"{database_name}.{collection}:{command_name}:{shape}"
+        with self._lock:
+            finding_key = self._shape_findings.get(shape_key)
+            if finding_key in self.findings:
+                self._count_finding(self.findings[finding_key], entry)
+
+        now = time.monotonic()
+        if (
+            command_name in EXPLAINABLE_COMMANDS
+            and self._client is not None
+            and now - self._explained.get(shape_key, -EXPLAIN_COOLDOWN_SECONDS) >= EXPLAIN_COOLDOWN_SECONDS
+        ):
+            self._explained[shape_key] = now
+            explain_command = {k: v for k, v in command.items() if k not in DRIVER_FIELDS}
+            # Explain accepts a single write statement
+            for batch_field in ("updates", "deletes"):
+                if batch_field in explain_command:
+                    explain_command[batch_field] = explain_command[batch_field][:1]
+            self._loop.call_soon_threadsafe(
+                lambda: asyncio.ensure_future(self._explain(entry, shape_key, database_name, explain_command, query))
+            )
+
+    def _count_finding(self, finding: dict, entry: dict):
+        finding["occurrences"] += 1
+        finding["max_duration_ms"] = max(finding["max_duration_ms"], entry["duration_ms"])
+        finding["last_seen"] = entry["timestamp"]
+
+    async def _explain(self, entry: dict, shape_key: str, database_name: str, command: dict, query: dict):
+        try:
+            result = await self._client[database_name].command(
+                {"explain": command, "verbosity": "queryPlanner"}
+            )
+        except Exception as e:
+            entry["explain_error"] = str(e)
+            return
+
+        stages = plan_stages(result)
+        entry["plan_stages"] = stages
+        entry["collscan"] = "COLLSCAN" in stages
+        if entry["collscan"] and entry["collection"]:
+            fields = filter_fields(query)
+            key = f"{entry['collection']}.{','.join(fields) or '*'}"
+            with self._lock:
+                self._shape_findings[shape_key] = key
+                finding = self.findings.setdefault(key, {
+                    "finding": "missing_index" if fields else "unfiltered_scan",
+                    "collection": entry["collection"],
+                    "fields": fields,
+                    "operation": entry["operation"],
+                    "message": (
+                        f"COLLSCAN on {entry['collection']} filtering by {', '.join(fields)}; "
+                        f"consider an index on {entry['collection']}.{'+'.join(fields)}"
+                        if fields else f"COLLSCAN on {entry['collection']} without a filter"
+                    ),
+                    "occurrences": 0,
+                    "max_duration_ms": 0,
+                })
+                self._count_finding(finding, entry)
+
+    def report(self) -> dict:
+        return {
+            "threshold_ms": self.threshold_ms,
+            "entries": list(reversed(self.entries)),
+            "findings": sorted(self.findings.values(), key=lambda f: f["max_duration_ms"], reverse=True),
+        }
+
+    def clear(self):
+        self.entries.clear()
+        with self._lock:
+            self.findings.clear()
+            self._shape_findings.clear()
+        self._explained.clear()
@@ -0,0 +1,16 @@
+import base64
+from io import BytesIO
+
+import qrcode
+
+
+def render_qr_data_uri(data: str) -> str:
+    """Render a QR code for `data` as a base64 PNG data URI."""
+    qr = qrcode.QRCode(version=1, box_size=10, border=5)
+    qr.add_data(data)
+    qr.make(fit=True)
+    
+    img = qr.make_image(fill_color="black", back_color="white")
+    buffered = BytesIO()
+    img.save(buffered, format="PNG")
+    return f"data:image/png;base64,{base64.b64encode(buffered.getvalue()).decode()}"
@@ -0,0 +1,333 @@
+import asyncio
+import bisect
+import math
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from pymongo.errors import BulkWriteError
+
+from utils.dates import day_key, to_datetime
+
+# Typical bay time per service type, in minutes. Matched case-insensitively
+# against the start of Appointment.service_type.
+SERVICE_DURATIONS = {
+    "diagnostics": 60,
+    "service": 60,
+    "ecu tuning": 120,
+    "stage 1": 120,
+    "stage 2": 180,
+    "stage 3": 240,
+    "dyno": 90,
+    "retune": 90,
+}
+DEFAULT_SERVICE_DURATION = 60
+# Shortest bookable appointment
+MIN_DURATION_MINUTES = 15
+
+INACTIVE_STATUSES = ("cancelled",)
+MAX_CACHED_DAYS = 400
+DUPLICATE_KEY = 11000
+
+
+class SlotUnavailableError(Exception):
+    """Raised when an appointment overlaps an existing booking."""
+
+
+def parse_time(value: str) -> int:
+    """Convert an 'HH:MM' string to minutes since midnight."""
+    hours, minutes = value.strip()[:5].split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def format_time(minutes: int) -> str:
+    """Convert minutes since midnight to an 'HH:MM' string."""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def service_duration(service_type: str, duration_minutes: Optional[int] = None) -> int:
+    """Resolve the bay time for an appointment."""
+    if duration_minutes:
+        return duration_minutes
+    service = (service_type or "").strip().lower()
+    for prefix, minutes in SERVICE_DURATIONS.items():
+        if service.startswith(prefix):
+            return minutes
+    return DEFAULT_SERVICE_DURATION
+
+
+class IntervalIndex:
+    """Sorted, non-overlapping [start, end) intervals booked on one resource for one day.
+
+    Because the intervals never overlap, ends are sorted in the same order as
+    starts, so an overlap check only has to look at the closest interval that
+    starts before the candidate ends. Appointments from before bookings were
+    checked can overlap each other; those are kept out of the sorted list in
+    `_overflow` and checked one by one.
+    """
+
+    def __init__(self):
+        self._starts: List[int] = []
+        self._intervals: List[Tuple[int, int, str]] = []
+        self._overflow: List[Tuple[int, int, str]] = []
+
+    def __len__(self):
+        return len(self._intervals) + len(self._overflow)
+
+    def overlaps(self, start: int, end: int) -> bool:
+        i = bisect.bisect_left(self._starts, end)
+        if i > 0 and self._intervals[i - 1][1] > start:
+            return True
+        return any(s < end and e > start for s, e, _ in self._overflow)
+
+    def add(self, start: int, end: int, appointment_id: uuid.UUID):
+        if self.overlaps(start, end):
+            self._overflow.append((start, end, appointment_id))
+            return
+        i = bisect.bisect_left(self._starts, start)
+        self._starts.insert(i, start)
+        self._intervals.insert(i, (start, end, appointment_id))
+
+    def remove(self, appointment_id: uuid.UUID) -> bool:
+        for i, interval in enumerate(self._overflow):
+            if interval[2] == appointment_id:
+                del self._overflow[i]
+                return True
+        for i, interval in enumerate(self._intervals):
+            if interval[2] == appointment_id:
+                del self._starts[i]
+                del self._intervals[i]
+                return True
+        return False
+
+    def free_windows(self, opening: int, closing: int) -> List[Tuple[int, int]]:
+        """Gaps between bookings inside opening hours."""
+        windows = []
+        cursor = opening
+        intervals = sorted(self._intervals + self._overflow) if self._overflow else self._intervals
+        for start, end, _ in intervals:
+            if start > cursor:
+                windows.append((cursor, min(start, closing)))
+            cursor = max(cursor, end)
+            if cursor >= closing:
+                break
+        if cursor < closing:
+            windows.append((cursor, closing))
+        return [w for w in windows if w[1] > w[0]]
+
+
+class SlotEngine:
+    """Books appointments onto workshop bays (and technicians) without overlaps.
+
+    Each day keeps an in-process IntervalIndex per resource, loaded lazily from
+    the appointments collection, so conflict checks are O(log n). Bookings in
+    one process are serialised by a per-day lock; across worker processes the
+    `appointment_slots` collection holds one document per occupied
+    granularity block under a unique index, so a concurrent double booking
+    fails with a duplicate key instead of being written.
+
+    `on_change`, if set, is called with the date of every booking or release
+    so other processes can drop their cached index for that day.
+    """
+
+    def __init__(self, bays: List[str], opening_time: str = "09:00", closing_time: str = "18:00", granularity: int = 30):
+        self.bays = bays
+        self.opening = parse_time(opening_time)
+        self.closing = parse_time(closing_time)
+        self.granularity = granularity
+        self._days: Dict[str, Dict[str, IntervalIndex]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.on_change: Optional[Callable[[str], None]] = None
+
+    async def ensure_indexes(self, db):
+        await db.appointment_slots.create_index(
+            [("resource", 1), ("date", 1), ("slot", 1)], unique=True
+        )
+        await db.appointment_slots.create_index("appointment_id")
+        await db.appointment_slots.create_index("date")
+
+    def invalidate(self, day: Optional[str] = None):
+        """Drop the cached index for a day, or for every day when None."""
+        if day is None:
+            self._days.clear()
+        else:
+            self._days.pop(day, None)
+
+    def _changed(self, day: str):
+        if self.on_change is not None:
+            self.on_change(day)
+
+    def _lock(self, day: str) -> asyncio.Lock:
+        if day not in self._locks:
+            self._locks[day] = asyncio.Lock()
+        return self._locks[day]
+
+    def _resources(self, appointment: dict) -> List[str]:
+        resources = [f"bay:{appointment['bay']}"]
+        if appointment.get("technician_name"):
+            resources.append(f"technician:{appointment['technician_name']}")
+        return resources
+
+    def _interval(self, appointment: dict) -> Tuple[int, int]:
+        start = parse_time(appointment["appointment_time"])
+        duration = service_duration(appointment.get("service_type"), appointment.get("duration_minutes"))
+        return start, start + duration
+
+    async def _load_day(self, db, day: str) -> Dict[str, IntervalIndex]:
+        if day in self._days:
+            return self._days[day]
+        indexes: Dict[str, IntervalIndex] = {}
+        start = to_datetime(day)
+        appointments = await db.appointments.find(
+            {
+                "appointment_date": {"$gte": start, "$lt": start + timedelta(days=1)},
+                "status": {"$nin": list(INACTIVE_STATUSES)},
+            },
+            {"_id": 0, "id": 1, "bay": 1, "technician_name": 1, "appointment_time": 1,
+             "service_type": 1, "duration_minutes": 1}
+        ).to_list(None)
+        for appointment in appointments:
+            start, end = self._interval(appointment)
+            if not appointment.get("bay"):
+                # Appointments booked before bays existed take the first bay that fits
+                appointment["bay"] = next(
+                    (b for b in self.bays if not indexes.get(f"bay:{b}", IntervalIndex()).overlaps(start, end)),
+                    self.bays[0],
+                )
+            for resource in self._resources(appointment):
+                indexes.setdefault(resource, IntervalIndex()).add(start, end, appointment["id"])
+        if len(self._days) >= MAX_CACHED_DAYS:
+            self._days.pop(next(iter(self._days)))
+        self._days[day] = indexes
+        return indexes
+
+    def _fits(self, indexes: Dict[str, IntervalIndex], appointment: dict, start: int, end: int) -> bool:
+        return not any(
+            indexes.get(resource) is not None and indexes[resource].overlaps(start, end)
+            for resource in self._resources(appointment)
+        )
+
+    def slot_documents(self, appointment: dict, start: int, end: int) -> List[dict]:
+        """The `appointment_slots` documents reserving [start, end) for the appointment's resources."""
+        first = start // self.granularity
+        last = math.ceil(end / self.granularity)
+        created_at = datetime.now(timezone.utc)
+        return [
+            {
+                "resource": resource,
+                "date": day_key(appointment["appointment_date"]),
+                "slot": slot,
+                "appointment_id": appointment["id"],
+                "created_at": created_at,
+            }
+            for resource in self._resources(appointment)
+            for slot in range(first, last)
+        ]
+
+    async def book(self, db, appointment: dict) -> dict:
+        """Assign a bay if needed and reserve the appointment's interval.
+
+        Mutates and returns the appointment dict. Raises SlotUnavailableError
+        when every candidate bay (or the requested technician) is taken.
+        """
+        day = day_key(appointment["appointment_date"])
+        start, end = self._interval(appointment)
+        if start < self.opening or end > self.closing:
+            raise SlotUnavailableError(
+                f"Appointment must fall within opening hours {format_time(self.opening)}-{format_time(self.closing)}"
+            )
+
+        async with self._lock(day):
+            indexes = await self._load_day(db, day)
+            candidates = [appointment["bay"]] if appointment.get("bay") else self.bays
+            for bay in candidates:
+                candidate = {**appointment, "bay": bay}
+                if not self._fits(indexes, candidate, start, end):
+                    continue
+                slots = self.slot_documents(candidate, start, end)
+                try:
+                    await db.appointment_slots.insert_many(slots, ordered=True)
+                except BulkWriteError as e:
+                    if any(error["code"] != DUPLICATE_KEY for error in e.details["writeErrors"]):
+                        raise
+                    # Another worker reserved an overlapping block first; drop
+                    # the blocks inserted before the conflict and try the next bay
+                    await db.appointment_slots.delete_many({"appointment_id": appointment["id"]})
+                    self._days.pop(day, None)
+                    indexes = await self._load_day(db, day)
+                    continue
+                appointment["bay"] = bay
+                appointment["duration_minutes"] = end - start
+                for resource in self._resources(appointment):
+                    indexes.setdefault(resource, IntervalIndex()).add(start, end, appointment["id"])
+                self._changed(day)
+                return appointment
+
+        raise SlotUnavailableError(
+            f"No bay available on {day} from {format_time(start)} to {format_time(end)}"
+        )
+
+    async def release(self, db, appointment: dict):
+        """Free the interval held by an appointment."""
+        day = day_key(appointment["appointment_date"])
+        async with self._lock(day):
+            await db.appointment_slots.delete_many({"appointment_id": appointment["id"]})
+            for index in self._days.get(day, {}).values():
+                index.remove(appointment["id"])
+        self._changed(day)
+
+    async def sweep_orphans(self, db, older_than: timedelta = timedelta(minutes=10)) -> int:
+        """Free upcoming slots whose appointment was never written or is no longer active.
+
+        A booking reserves slots before the appointment is inserted, so slots
+        younger than `older_than` are left alone.
+        """
+        pipeline = [
+            {"$match": {
+                "date": {"$gte": date.today().isoformat()},
+                "created_at": {"$lt": datetime.now(timezone.utc) - older_than},
+            }},
+            {"$group": {"_id": "$appointment_id", "date": {"$first": "$date"}}},
+            {"$lookup": {
+                "from": "appointments",
+                "localField": "_id",
+                "foreignField": "id",
+                "as": "appointment",
+            }},
+            {"$match": {"$or": [
+                {"appointment": {"$size": 0}},
+                {"appointment.status": {"$in": list(INACTIVE_STATUSES)}},
+            ]}},
+        ]
+        orphans = await db.appointment_slots.aggregate(pipeline).to_list(None)
+        if not orphans:
+            return 0
+        await db.appointment_slots.delete_many({"appointment_id": {"$in": [o["_id"] for o in orphans]}})
+        for day in {o["date"] for o in orphans}:
+            async with self._lock(day):
+                self.invalidate(day)
+            self._changed(day)
+        return len(orphans)
+
+    async def availability(self, db, start_day: date, end_day: date, duration: int) -> List[dict]:
+        """Free slots of at least `duration` minutes per bay between two dates, inclusive."""
+        slots = []
+        day = start_day
+        while day <= end_day:
+            key = day.isoformat()
+            indexes = await self._load_day(db, key)
+            for bay in self.bays:
+                index = indexes.get(f"bay:{bay}", IntervalIndex())
+                for window_start, window_end in index.free_windows(self.opening, self.closing):
+                    # Align candidate starts to the booking granularity
+                    slot_start = math.ceil(window_start / self.granularity) * self.granularity
+                    while slot_start + duration <= window_end:
+                        slots.append({
+                            "date": key,
+                            "bay": bay,
+                            "start_time": format_time(slot_start),
+                            "end_time": format_time(slot_start + duration),
+                        })
+                        slot_start += self.granularity
+            day += timedelta(days=1)
+        return slots
@@ -0,0 +1,158 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+from pymongo import ReturnDocument, UpdateOne
+
+from utils.archive import ARCHIVED_COLLECTIONS, archive_name
+from utils.documents import to_api
+
+# Collections tablets replicate; users stay server-side
+SYNC_COLLECTIONS = ("customers", "vehicles", "jobs", "tune_revisions", "billing", "reminders", "appointments")
+
+
+class SyncTokenExpired(Exception):
+    """Raised when a token predates pruned tombstones, so deletes could be missed."""
+
+
+def _utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class ChangeLog:
+    """Monotonic change sequence for delta sync.
+
+    The `changes` collection holds one entry per synced document: its
+    collection, id, the sequence number of its latest change and whether it
+    was deleted (a tombstone). Handlers call `record` after every write, which
+    takes the next numbers from the `counters` document, so a client that
+    last saw sequence N only needs the entries above N, in order.
+
+    Numbers are taken before the entry is written, so an entry can land
+    after one with a higher number. Entries younger than `settle_seconds` are
+    therefore held back, together with everything after them, until such a
+    late write would have landed. Tombstones older than `tombstone_retention`
+    are pruned; tokens from before the pruning are refused.
+    """
+
+    def __init__(self, settle_seconds: float = 2.0, tombstone_retention: timedelta = timedelta(days=30)):
+        self.settle = timedelta(seconds=settle_seconds)
+        self.tombstone_retention = tombstone_retention
+
+    async def _allocate(self, db, count: int) -> int:
+        """Reserve `count` sequence numbers and return the first."""
+        counter = await db.counters.find_one_and_update(
+            {"_id": "changes"},
+            {"$inc": {"seq": count}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return counter["seq"] - count + 1
+
+    async def record(self, db, collection: str, ids: Iterable[Optional[uuid.UUID]], deleted: bool = False):
+        """Note that these documents were written (or deleted) just now."""
+        ids = list(dict.fromkeys(i for i in ids if i))
+        if not ids:
+            return
+        first = await self._allocate(db, len(ids))
+        now = datetime.now(timezone.utc)
+        # $max keeps an entry at its newest number and keeps a tombstone a
+        # tombstone when concurrent writes land out of order
+        await db.changes.bulk_write([
+            UpdateOne(
+                {"collection": collection, "id": document_id},
+                {"$max": {"seq": first + n, "deleted": deleted, "at": now}},
+                upsert=True,
+            )
+            for n, document_id in enumerate(ids)
+        ], ordered=False)
+
+    async def backfill(self, db, force: bool = False, batch_size: int = 1000):
+        """Give documents written before the change log existed (or seeded around it) an entry.
+
+        Runs once per database unless forced; existing entries are left alone.
+        """
+        state = await db.counters.find_one({"_id": "changes"}, {"backfilled_at": 1})
+        if state and state.get("backfilled_at") and not force:
+            return
+        now = datetime.now(timezone.utc)
+        for collection in SYNC_COLLECTIONS:
+            cursor = db[collection].find({}, {"_id": 0, "id": 1}).batch_size(batch_size)
+            batch = []
+            async for document in cursor:
+                batch.append(document["id"])
+                if len(batch) == batch_size:
+                    await self._backfill_batch(db, collection, batch, now)
+                    batch = []
+            await self._backfill_batch(db, collection, batch, now)
+        await db.counters.update_one({"_id": "changes"}, {"$set": {"backfilled_at": now}}, upsert=True)
+
+    async def _backfill_batch(self, db, collection: str, ids: list, now: datetime):
+        if not ids:
+            return
+        first = await self._allocate(db, len(ids))
+        await db.changes.bulk_write([
+            UpdateOne(
+                {"collection": collection, "id": document_id},
+                {"$setOnInsert": {"seq": first + n, "deleted": False, "at": now}},
+                upsert=True,
+            )
+            for n, document_id in enumerate(ids)
+        ], ordered=False)
+
+    async def prune(self, db):
+        """Drop tombstones past retention, refusing tokens older than the newest one dropped."""
+        cutoff = datetime.now(timezone.utc) - self.tombstone_retention
+        newest = await db.changes.find_one(
+            {"deleted": True, "at": {"$lt": cutoff}}, {"_id": 0, "seq": 1}, sort=[("seq", -1)]
+        )
+        if newest is None:
+            return
+        # Raise the floor before deleting, so no client syncs across the gap
+        await db.counters.update_one({"_id": "changes"}, {"$max": {"pruned_through": newest["seq"]}}, upsert=True)
+        await db.changes.delete_many({"deleted": True, "at": {"$lt": cutoff}, "seq": {"$lte": newest["seq"]}})
+
+    async def changes(self, db, since: int, limit: int) -> dict:
+        """Up to `limit` changes after token `since` (0 for everything), with the current documents."""
+        state = await db.counters.find_one({"_id": "changes"}, {"pruned_through": 1}) or {}
+        if since and since < state.get("pruned_through", 0):
+            raise SyncTokenExpired("Sync token is too old; start again from since=0")
+
+        entries = await db.changes.find(
+            {"seq": {"$gt": since}}, {"_id": 0, "collection": 1, "id": 1, "seq": 1, "deleted": 1, "at": 1}
+        ).sort("seq", 1).limit(limit).to_list(limit)
+        settled = datetime.now(timezone.utc) - self.settle
+        served = []
+        for entry in entries:
+            if _utc(entry["at"]) > settled:
+                break
+            served.append(entry)
+
+        deleted = {name: [] for name in SYNC_COLLECTIONS}
+        wanted = {name: [] for name in SYNC_COLLECTIONS}
+        for entry in served:
+            (deleted if entry.get("deleted") else wanted)[entry["collection"]].append(entry["id"])
+
+        names = [name for name in SYNC_COLLECTIONS if wanted[name]]
+        found = await asyncio.gather(*(
+            db[name].find({"id": {"$in": wanted[name]}}, {"_id": 0}).to_list(None) for name in names
+        ))
+        changes = {name: [] for name in SYNC_COLLECTIONS}
+        for name, documents in zip(names, found):
+            present = {document["id"] for document in documents}
+            missing = [i for i in wanted[name] if i not in present]
+            if missing and name in ARCHIVED_COLLECTIONS:
+                # Archived documents still exist as far as clients are concerned
+                documents += await db[archive_name(name)].find({"id": {"$in": missing}}, {"_id": 0}).to_list(None)
+                present = {document["id"] for document in documents}
+            changes[name] = [to_api(document) for document in documents]
+            # Deleted since the entry was read; its tombstone follows in a later page
+            deleted[name].extend(i for i in wanted[name] if i not in present)
+
+        return {
+            "token": served[-1]["seq"] if served else since,
+            "has_more": len(served) == limit,
+            "changes": changes,
+            "deleted": deleted,
+        }
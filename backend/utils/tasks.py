@@ -0,0 +1,262 @@
+import asyncio
+import logging
+import multiprocessing
+import traceback
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Awaitable, Callable, Dict, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+from utils.cluster import worker_id
+from utils.ids import new_id
+from utils.metrics import background_tasks_total, background_task_duration_seconds
+
+logger = logging.getLogger(__name__)
+
+# Highest first; handlers pick a level by how soon a user will look for the result
+PRIORITY_HIGH = 10
+PRIORITY_NORMAL = 0
+PRIORITY_LOW = -10
+# Fields a status lookup may show
+PUBLIC_FIELDS = ("name", "status", "priority", "attempts", "max_attempts", "error", "result",
+                 "created_at", "started_at", "finished_at")
+
+
+def create_executor(kind: str, workers: int) -> Executor:
+    """Thread pool for blocking I/O, or a process pool for CPU-bound work that would hold the GIL."""
+    if kind == "process":
+        # Forking a process that runs Motor's threads can deadlock the child
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    if kind == "thread":
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="task")
+    raise ValueError(f"Unknown task executor {kind!r}, expected 'thread' or 'process'")
+
+
+class WorkerPool:
+    """A `create_executor` pool that only exists in the process using it.
+
+    gunicorn imports the app once and forks the workers from it
+    (preload_app), and a process pool created before the fork would leave
+    every worker sharing the master's call queue and management thread. So
+    nothing is created at import: each worker calls `start` from its startup
+    hook and `shutdown` when it stops.
+    """
+
+    def __init__(self, kind: str, workers: int):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown task executor {kind!r}, expected 'thread' or 'process'")
+        self.kind = kind
+        self.workers = workers
+        self._executor: Optional[Executor] = None
+
+    def start(self):
+        if self._executor is None:
+            self._executor = create_executor(self.kind, self.workers)
+
+    def shutdown(self, wait: bool = False):
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    async def run(self, func: Callable, *args):
+        """Run a blocking function on the pool. With processes, it and its arguments must be picklable."""
+        if self._executor is None:
+            raise RuntimeError("WorkerPool.start() has not been called in this process")
+        return await asyncio.get_running_loop().run_in_executor(self._executor, partial(func, *args))
+
+
+class TaskQueue:
+    """Background work persisted in the `tasks` collection.
+
+    `enqueue` inserts a queued task and returns its id straight away. Workers
+    claim the highest-priority due task with one find_one_and_update that
+    also sets a lease on the server's clock, so two workers never run the
+    same task, and a worker that dies loses its tasks to another once the
+    lease expires. A running task's lease is renewed every `lease / 3`
+    seconds. A failed task is retried with exponential backoff until it has
+    been attempted `max_attempts` times. Handlers must therefore be
+    idempotent. They are coroutines; blocking or CPU-heavy steps go through
+    `offload`, which runs them on the thread or process pool.
+    """
+
+    def __init__(self, db, pool: WorkerPool, concurrency: int = 4, lease: float = 60.0,
+                 max_attempts: int = 5, retry_delay: float = 5.0, poll_interval: float = 1.0):
+        self.db = db
+        self.pool = pool
+        self.concurrency = concurrency
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.poll_interval = poll_interval
+        self._handlers: Dict[str, Callable[[dict], Awaitable]] = {}
+        self._wake = asyncio.Event()
+
+    def handler(self, name: str):
+        """Register the coroutine function that runs tasks called `name`; it gets the task's payload."""
+        def register(func: Callable[[dict], Awaitable]):
+            self._handlers[name] = func
+            return func
+        return register
+
+    async def enqueue(self, name: str, payload: Optional[dict] = None, priority: int = PRIORITY_NORMAL,
+                      max_attempts: Optional[int] = None):
+        """Queue a task and return its id."""
+        if name not in self._handlers:
+            raise ValueError(f"No handler registered for task {name!r}")
+        now = datetime.now(timezone.utc)
+        task_id = new_id()
+        await self.db.tasks.insert_one({
+            "_id": task_id,
+            "name": name,
+            "payload": payload or {},
+            "status": "queued",
+            "priority": priority,
+            "attempts": 0,
+            "max_attempts": max_attempts or self.max_attempts,
+            "run_at": now,
+            "created_at": now,
+        })
+        # A worker in this process picks it up without waiting for its next poll
+        self._wake.set()
+        return task_id
+
+    async def status(self, task_id) -> Optional[dict]:
+        task = await self.db.tasks.find_one({"_id": task_id}, {field: 1 for field in PUBLIC_FIELDS})
+        if task is None:
+            return None
+        task["id"] = task.pop("_id")
+        return task
+
+    async def offload(self, func: Callable, *args):
+        """Run a blocking function on the pool. With processes, it and its arguments must be picklable."""
+        return await self.pool.run(func, *args)
+
+    async def _claim(self) -> Optional[dict]:
+        lease_ms = int(self.lease * 1000)
+        return await self.db.tasks.find_one_and_update(
+            {"name": {"$in": list(self._handlers)}, "$or": [
+                {"status": "queued", "$expr": {"$lte": ["$run_at", "$$NOW"]}},
+                # A worker that stopped renewing its lease has gone away
+                {"status": "running", "$expr": {"$and": [
+                    {"$lt": ["$lease_until", "$$NOW"]},
+                    {"$lt": ["$attempts", "$max_attempts"]},
+                ]}},
+            ]},
+            [{"$set": {
+                "status": "running",
+                "worker": worker_id(),
+                "lease_until": {"$add": ["$$NOW", lease_ms]},
+                "started_at": "$$NOW",
+                "attempts": {"$add": ["$attempts", 1]},
+            }}],
+            sort=[("priority", -1), ("run_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _fail_abandoned(self):
+        """Fail tasks whose worker went away on their last attempt, e.g. because the task crashed it."""
+        result = await self.db.tasks.update_many(
+            {"name": {"$in": list(self._handlers)}, "status": "running", "$expr": {"$and": [
+                {"$lt": ["$lease_until", "$$NOW"]},
+                {"$gte": ["$attempts", "$max_attempts"]},
+            ]}},
+            [{"$set": {"status": "failed", "error": "Worker stopped while running the task", "finished_at": "$$NOW"}}],
+        )
+        if result.modified_count:
+            logger.error(f"{result.modified_count} tasks failed for good after their worker stopped")
+
+    async def _renew(self, task_id):
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                await self.db.tasks.update_one(
+                    {"_id": task_id, "status": "running", "worker": worker_id()},
+                    [{"$set": {"lease_until": {"$add": ["$$NOW", int(self.lease * 1000)]}}}],
+                )
+            except PyMongoError as e:
+                logger.warning(f"Renewing the lease on task {task_id} failed: {e}")
+
+    async def _finish(self, task: dict, update: dict):
+        # Only the current lease holder may settle a task; if this fails the
+        # lease runs out and the task is run again
+        try:
+            await self.db.tasks.update_one(
+                {"_id": task["_id"], "status": "running", "worker": worker_id()}, {"$set": update}
+            )
+        except PyMongoError as e:
+            logger.warning(f"Recording the outcome of task {task['_id']} failed: {e}")
+
+    async def _execute(self, task: dict):
+        name = task["name"]
+        started = asyncio.get_running_loop().time()
+        renewal = asyncio.create_task(self._renew(task["_id"]))
+        try:
+            result = await self._handlers[name](task["payload"])
+        except asyncio.CancelledError:
+            # Shutting down: hand the task back without using up an attempt
+            renewal.cancel()
+            await asyncio.shield(self._finish(task, {
+                "status": "queued", "worker": None, "attempts": task["attempts"] - 1,
+                "run_at": datetime.now(timezone.utc),
+            }))
+            raise
+        except Exception as e:
+            renewal.cancel()
+            error = "".join(traceback.format_exception_only(type(e), e)).strip()
+            if task["attempts"] >= task["max_attempts"]:
+                logger.error(f"Task {name} {task['_id']} failed for good: {error}")
+                background_tasks_total.inc(name, "failed")
+                await self._finish(task, {"status": "failed", "error": error,
+                                          "finished_at": datetime.now(timezone.utc)})
+            else:
+                delay = self.retry_delay * 2 ** (task["attempts"] - 1)
+                logger.warning(f"Task {name} {task['_id']} failed, retrying in {delay:.0f}s: {error}")
+                background_tasks_total.inc(name, "retried")
+                await self._finish(task, {"status": "queued", "error": error, "worker": None,
+                                          "run_at": datetime.now(timezone.utc) + timedelta(seconds=delay)})
+        else:
+            renewal.cancel()
+            background_tasks_total.inc(name, "succeeded")
+            # The payload is not needed any more and may be large (file contents)
+            await self._finish(task, {"status": "done", "result": result, "error": None, "payload": None,
+                                      "finished_at": datetime.now(timezone.utc)})
+        finally:
+            background_task_duration_seconds.observe(name, value=asyncio.get_running_loop().time() - started)
+
+    async def run(self):
+        """Claim and run tasks, up to `concurrency` at once, until cancelled."""
+        slots = asyncio.Semaphore(self.concurrency)
+        running = set()
+        loop = asyncio.get_running_loop()
+        swept_at = 0.0
+        try:
+            while True:
+                await slots.acquire()
+                try:
+                    task = await self._claim()
+                    # Leases are what expire, so checking once per lease period is enough
+                    if task is None and loop.time() - swept_at >= self.lease:
+                        swept_at = loop.time()
+                        await self._fail_abandoned()
+                except PyMongoError as e:
+                    logger.warning(f"Claiming a task failed: {e}")
+                    task = None
+                if task is None:
+                    slots.release()
+                    self._wake.clear()
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                runner = asyncio.create_task(self._execute(task))
+                running.add(runner)
+                runner.add_done_callback(running.discard)
+                runner.add_done_callback(lambda _: slots.release())
+        finally:
+            for runner in running:
+                runner.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
@@ -0,0 +1,300 @@
+import asyncio
+import contextvars
+import json
+import logging
+import random
+import re
+import threading
+import time
+import urllib.request
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, List, Optional
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+SERVICE_NAME = "ignitionlab-dynamics"
+
+current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None, kind: str = "internal"):
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes: Dict[str, object] = {}
+        self.error = None
+
+    def child(self, name: str, kind: str = "internal") -> "Span":
+        return Span(name, self.trace_id, self.span_id, kind)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1_000_000, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class SpanExporter:
+    """Buffers finished spans and writes them out in batches.
+
+    Spans go to a JSONL file, or to an OTLP/HTTP JSON endpoint when one is
+    configured. `finish` only appends to a deque, so it is safe from pymongo's
+    monitoring threads; the flush loop does all the I/O off the event loop.
+    """
+
+    def __init__(self, path: Optional[Path] = None, otlp_endpoint: Optional[str] = None,
+                 batch_size: int = 512, flush_interval: float = 5.0, max_queue: int = 10000):
+        self.path = path
+        self.otlp_endpoint = otlp_endpoint
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: Deque[Span] = deque(maxlen=max_queue)
+
+    def finish(self, span: Span):
+        span.end_ns = time.time_ns()
+        self._queue.append(span)
+
+    def _drain(self) -> List[Span]:
+        batch = []
+        while self._queue and len(batch) < self.batch_size:
+            batch.append(self._queue.popleft())
+        return batch
+
+    def _write(self, spans: List[Span]):
+        if self.otlp_endpoint:
+            request = urllib.request.Request(
+                self.otlp_endpoint,
+                data=json.dumps(to_otlp(spans)).encode(),
+                headers={"Content-Type": "application/json"},
+                method="POST",
+            )
+            urllib.request.urlopen(request, timeout=5).close()
+        elif self.path:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a") as f:
+                for span in spans:
+                    f.write(json.dumps(span.to_dict(), default=str) + "\n")
+
+    async def flush(self):
+        while self._queue:
+            batch = self._drain()
+            try:
+                await asyncio.to_thread(self._write, batch)
+            except Exception as e:
+                logger.warning(f"Dropped {len(batch)} spans: {e}")
+                return
+
+    async def run(self):
+        """Flush periodically until cancelled, then flush what is left."""
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush()
+        finally:
+            await self.flush()
+
+
+def to_otlp(spans: List[Span]) -> dict:
+    """Encode spans as an OTLP/HTTP JSON export request."""
+    kinds = {"internal": 1, "server": 2, "client": 3}
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+        "scopeSpans": [{
+            "scope": {"name": "utils.tracing"},
+            "spans": [{
+                "traceId": span.trace_id,
+                "spanId": span.span_id,
+                "parentSpanId": span.parent_id or "",
+                "name": span.name,
+                "kind": kinds.get(span.kind, 1),
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns),
+                "attributes": [
+                    {"key": key, "value": {"stringValue": str(value)}} for key, value in span.attributes.items()
+                ],
+                "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+            } for span in spans],
+        }],
+    }]}
+
+
+class Tracer:
+    def __init__(self, sample_rate: float, exporter: SpanExporter):
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+
+    def start_request_span(self, name: str, traceparent: Optional[str]) -> Optional[Span]:
+        """Root span for an incoming request, or None when it is not sampled.
+
+        A caller that marks its traceparent as sampled is always traced;
+        otherwise the request is sampled at `sample_rate` and, if the header is
+        present, joins the caller's trace id.
+        """
+        match = TRACEPARENT_RE.match(traceparent) if traceparent else None
+        sampled = bool(match) and int(match.group(3), 16) & 1
+        if not sampled and (self.sample_rate <= 0 or random.random() >= self.sample_rate):
+            return None
+        if match:
+            return Span(name, match.group(1), match.group(2), kind="server")
+        return Span(name, f"{random.getrandbits(128):032x}", kind="server")
+
+
+class _NoopSpan:
+    """Returned by trace_span when nothing is being traced."""
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class _ActiveSpan:
+    def __init__(self, span: Span, exporter: SpanExporter):
+        self.span = span
+        self.exporter = exporter
+        self._token = None
+
+    def __enter__(self):
+        self._token = current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        current_span.reset(self._token)
+        if exc is not None:
+            self.span.error = repr(exc)
+        self.exporter.finish(self.span)
+        return False
+
+
+_tracer: Optional[Tracer] = None
+
+
+def configure(tracer: Tracer):
+    global _tracer
+    _tracer = tracer
+
+
+def trace_span(name: str, **attributes):
+    """Context manager for a child span of the current request, e.g. around CPU-heavy work.
+
+    Costs one context variable lookup when the request is not sampled.
+    """
+    parent = current_span.get()
+    if parent is None or _tracer is None:
+        return _NOOP
+    span = parent.child(name)
+    span.attributes.update(attributes)
+    return _ActiveSpan(span, _tracer.exporter)
+
+
+class TracingMiddleware:
+    """ASGI middleware opening a root span per sampled request."""
+
+    def __init__(self, app, tracer: Tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for key, value in scope["headers"]:
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        span = self.tracer.start_request_span(f"{scope['method']} {scope['path']}", traceparent)
+        if span is None:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_code[0] = message["status"]
+            await send(message)
+
+        token = current_span.set(span)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            span.error = repr(e)
+            raise
+        finally:
+            current_span.reset(token)
+            route = scope.get("route")
+            if route is not None:
+                span.name = f"{scope['method']} {route.path}"
+            span.attributes.update({
+                "http.method": scope["method"],
+                "http.target": scope["path"],
+                "http.status_code": status_code[0],
+            })
+            self.tracer.exporter.finish(span)
+
+
+class CommandTracingListener(monitoring.CommandListener):
+    """Child spans for MongoDB commands issued inside a sampled request.
+
+    Motor copies the caller's context into its executor threads, so the
+    request span is visible here.
+    """
+
+    def __init__(self):
+        self._spans: Dict[tuple, Span] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        parent = current_span.get()
+        if parent is None:
+            return
+        span = parent.child(f"mongo.{event.command_name}", kind="client")
+        collection = event.command.get(event.command_name)
+        span.attributes.update({
+            "db.system": "mongodb",
+            "db.name": event.database_name,
+            "db.operation": event.command_name,
+            "db.mongodb.collection": collection if isinstance(collection, str) else "",
+        })
+        with self._lock:
+            self._spans[(event.connection_id, event.request_id)] = span
+
+    def _finish(self, event, error: Optional[str] = None):
+        with self._lock:
+            span = self._spans.pop((event.connection_id, event.request_id), None)
+        if span is None or _tracer is None:
+            return
+        span.error = error
+        _tracer.exporter.finish(span)
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event, str(event.failure))
+
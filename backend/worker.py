@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""Run queued background tasks in a process of their own.
+
+By default every web worker also runs tasks. To keep request handling and
+heavy work apart, turn that off and run one or more of these instead:
+
+    TASK_WORKER_IN_APP=false gunicorn -c gunicorn.conf.py server:app
+    python worker.py
+    python worker.py --concurrency 8
+
+Tasks are claimed through MongoDB, so any number of workers on any number
+of hosts can run side by side.
+Uses the same backend/.env settings as the server.
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+
+import server
+from utils.ids import binary_ids_ready
+
+
+async def work(args):
+    if not await binary_ids_ready(server.db):
+        raise SystemExit("Ids are still stored as strings. Run `python migrate_ids.py` first.")
+    if args.concurrency:
+        server.task_queue.concurrency = args.concurrency
+    # Cache invalidations from tasks reach the web workers through the
+    # invalidation channel, and live events through the event log
+    await server.invalidations.ensure()
+    await server.event_bus.ensure()
+    server.task_queue.pool.start()
+    shared = [asyncio.create_task(server.invalidations.run()), asyncio.create_task(server.event_bus.run())]
+    logging.getLogger(__name__).info(f"Running tasks, {server.task_queue.concurrency} at a time")
+    try:
+        await server.task_queue.run()
+    finally:
+        for task in shared:
+            task.cancel()
+        await asyncio.gather(*shared, return_exceptions=True)
+        server.task_queue.pool.shutdown(wait=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=0,
+                        help="tasks run at once (default: TASK_CONCURRENCY)")
+    try:
+        asyncio.run(work(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""Async load test for the IgnitionLab Dynamics API.
+
+Drives a weighted mix of realistic requests from many concurrent clients and
+reports p50/p95/p99 latency, throughput and error rate per endpoint. Results
+are written as JSON so two runs can be compared:
+
+    python backend_load_test.py --start-local --users 50 --duration 60 --output run.json
+    python backend_load_test.py --base-url http://localhost:8001 --compare run.json
+
+With --start-local a throwaway mongod and a uvicorn server are started on
+free ports and stopped afterwards.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+ROOT_DIR = Path(__file__).parent
+BACKEND_DIR = ROOT_DIR / "backend"
+
+# Workload name -> relative weight in the mix
+DEFAULT_MIX = {
+    "login": 2,
+    "dashboard": 10,
+    "list_jobs": 15,
+    "list_customers": 10,
+    "list_vehicles": 10,
+    "search": 10,
+    "get_vehicle": 20,
+    "create_job": 5,
+    "upload": 2,
+}
+
+SEARCH_TERMS = ["BMW", "Golf", "Stage", "KA01", "EDC17", "98765", "Sharma"]
+MAKES = [("Volkswagen", "Polo GT", "CZCA", "Bosch MED17"), ("BMW", "330i", "B48", "Bosch MG1"),
+         ("Skoda", "Octavia RS", "DKZA", "Simos 18"), ("Hyundai", "i20 N Line", "G4LD", "Kefico")]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class LocalStack:
+    """A throwaway mongod plus uvicorn serving backend/server.py."""
+
+    def __init__(self, workers: int = 1):
+        self.workers = workers
+        self.data_dir = Path(tempfile.mkdtemp(prefix="ignitionlab-loadtest-"))
+        self.mongo_port = free_port()
+        self.api_port = free_port()
+        self.processes: List[subprocess.Popen] = []
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.api_port}"
+
+    def start(self):
+        if not shutil.which("mongod"):
+            raise RuntimeError("mongod not found on PATH")
+        self.processes.append(subprocess.Popen(
+            ["mongod", "--dbpath", str(self.data_dir), "--port", str(self.mongo_port), "--bind_ip", "127.0.0.1"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        ))
+        env = {
+            **os.environ,
+            "MONGO_URL": f"mongodb://127.0.0.1:{self.mongo_port}",
+            "DB_NAME": "ignitionlab_loadtest",
+        }
+        self.processes.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1",
+             "--port", str(self.api_port), "--workers", str(self.workers), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env,
+        ))
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            try:
+                if httpx.get(f"{self.base_url}/health", timeout=2).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.5)
+        self.stop()
+        raise RuntimeError("Local stack did not become healthy within 60s")
+
+    def stop(self):
+        for process in reversed(self.processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+
+
+class LoadTester:
+    def __init__(self, base_url: str, username: str, password: str, users: int, duration: float,
+                 mix: Dict[str, int], seed: int, timeout: float):
+        self.base_url = base_url.rstrip("/")
+        self.username = username
+        self.password = password
+        self.users = users
+        self.duration = duration
+        self.mix = mix
+        self.seed = seed
+        self.timeout = timeout
+        self.token: Optional[str] = None
+        self.fixtures = {"customers": [], "vehicles": []}
+        self.latencies: Dict[str, List[float]] = {name: [] for name in mix}
+        self.errors: Dict[str, int] = {name: 0 for name in mix}
+
+    def headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.token}"}
+
+    async def setup(self, client: httpx.AsyncClient):
+        """Log in once and create a small set of customers and vehicles to work against."""
+        response = await client.post("/api/auth/login", json={"username": self.username, "password": self.password})
+        response.raise_for_status()
+        self.token = response.json()["access_token"]
+
+        rng = random.Random(self.seed)
+        for i in range(10):
+            response = await client.post("/api/customers", headers=self.headers(), json={
+                "full_name": f"Load Test Customer {i}",
+                "phone_number": f"+91-98765{i:05d}",
+            })
+            response.raise_for_status()
+            customer = response.json()
+            self.fixtures["customers"].append(customer["id"])
+            make, model, engine, ecu = rng.choice(MAKES)
+            response = await client.post("/api/vehicles", headers=self.headers(), json={
+                "customer_id": customer["id"], "make": make, "model": model, "variant": "Base",
+                "engine_code": engine, "ecu_type": ecu, "vin": f"LOADTEST{i:09d}",
+                "registration_number": f"KA01LT{i:04d}", "year": 2018 + i % 6,
+                "fuel_type": "Petrol", "gearbox": "Manual",
+            })
+            response.raise_for_status()
+            self.fixtures["vehicles"].append((response.json()["id"], customer["id"]))
+
+    async def run_workload(self, client: httpx.AsyncClient, name: str, rng: random.Random) -> httpx.Response:
+        if name == "login":
+            return await client.post("/api/auth/login", json={"username": self.username, "password": self.password})
+        if name == "dashboard":
+            return await client.get("/api/dashboard/stats", headers=self.headers())
+        if name == "list_jobs":
+            return await client.get("/api/jobs", headers=self.headers())
+        if name == "list_customers":
+            return await client.get("/api/customers", headers=self.headers())
+        if name == "list_vehicles":
+            return await client.get("/api/vehicles", headers=self.headers())
+        if name == "search":
+            return await client.get(f"/api/search/{rng.choice(SEARCH_TERMS)}", headers=self.headers())
+        if name == "get_vehicle":
+            vehicle_id, _ = rng.choice(self.fixtures["vehicles"])
+            return await client.get(f"/api/vehicles/{vehicle_id}", headers=self.headers())
+        if name == "create_job":
+            vehicle_id, customer_id = rng.choice(self.fixtures["vehicles"])
+            return await client.post("/api/jobs", headers=self.headers(), json={
+                "vehicle_id": vehicle_id, "customer_id": customer_id,
+                "date": datetime.now(timezone.utc).date().isoformat(),
+                "technician_name": rng.choice(["Arjun", "Priya", "Rahul"]),
+                "tune_stage": rng.choice(["Stage 1", "Stage 2"]),
+                "odometer_at_visit": rng.randint(5000, 120000),
+            })
+        if name == "upload":
+            content = os.urandom(rng.randint(10_000, 200_000))
+            return await client.post("/api/upload", headers=self.headers(),
+                                     files={"file": ("dyno.bin", content, "application/octet-stream")})
+        raise ValueError(f"Unknown workload: {name}")
+
+    async def virtual_user(self, client: httpx.AsyncClient, user_index: int, deadline: float):
+        rng = random.Random(self.seed + user_index)
+        names = list(self.mix)
+        weights = [self.mix[name] for name in names]
+        while time.monotonic() < deadline:
+            name = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                response = await self.run_workload(client, name, rng)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            self.latencies[name].append(time.perf_counter() - start)
+            if not ok:
+                self.errors[name] += 1
+
+    async def run(self) -> dict:
+        limits = httpx.Limits(max_connections=self.users, max_keepalive_connections=self.users)
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=limits) as client:
+            print(f"\n🔧 Preparing fixtures against {self.base_url}...")
+            await self.setup(client)
+            print(f"🚀 Running {self.users} concurrent users for {self.duration:.0f}s...")
+            started = time.monotonic()
+            deadline = started + self.duration
+            await asyncio.gather(*(self.virtual_user(client, i, deadline) for i in range(self.users)))
+            elapsed = time.monotonic() - started
+        return self.summarise(elapsed)
+
+    def summarise(self, elapsed: float) -> dict:
+        endpoints = {}
+        total_requests = total_errors = 0
+        for name, samples in self.latencies.items():
+            if not samples:
+                continue
+            samples.sort()
+            total_requests += len(samples)
+            total_errors += self.errors[name]
+            endpoints[name] = {
+                "requests": len(samples),
+                "errors": self.errors[name],
+                "error_rate": round(self.errors[name] / len(samples), 4),
+                "throughput_rps": round(len(samples) / elapsed, 2),
+                "p50_ms": round(percentile(samples, 50) * 1000, 2),
+                "p95_ms": round(percentile(samples, 95) * 1000, 2),
+                "p99_ms": round(percentile(samples, 99) * 1000, 2),
+                "max_ms": round(samples[-1] * 1000, 2),
+            }
+        return {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_commit": git_commit(),
+            "config": {"base_url": self.base_url, "users": self.users, "duration_s": self.duration,
+                       "mix": self.mix, "seed": self.seed},
+            "elapsed_s": round(elapsed, 2),
+            "total": {
+                "requests": total_requests,
+                "errors": total_errors,
+                "error_rate": round(total_errors / total_requests, 4) if total_requests else 0,
+                "throughput_rps": round(total_requests / elapsed, 2),
+            },
+            "endpoints": endpoints,
+        }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(result: dict):
+    print("\n" + "=" * 86)
+    print(f"{'endpoint':<16}{'requests':>10}{'rps':>10}{'err %':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>12}")
+    print("-" * 86)
+    for name, stats in result["endpoints"].items():
+        print(f"{name:<16}{stats['requests']:>10}{stats['throughput_rps']:>10}{stats['error_rate'] * 100:>8.2f}"
+              f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}{stats['max_ms']:>12}")
+    total = result["total"]
+    print("-" * 86)
+    print(f"Total: {total['requests']} requests, {total['throughput_rps']} req/s, "
+          f"{total['error_rate'] * 100:.2f}% errors")
+
+
+def compare(result: dict, baseline: dict, threshold: float) -> bool:
+    """Print per-endpoint p95/p99 changes; return False if any regressed beyond threshold percent."""
+    print(f"\n📊 Comparison with baseline {baseline.get('git_commit') or ''} ({baseline['timestamp']})")
+    ok = True
+    for name, stats in result["endpoints"].items():
+        base = baseline["endpoints"].get(name)
+        if not base:
+            continue
+        for metric in ("p95_ms", "p99_ms"):
+            if not base[metric]:
+                continue
+            change = (stats[metric] - base[metric]) / base[metric] * 100
+            regressed = change > threshold
+            ok = ok and not regressed
+            marker = "❌" if regressed else "✅"
+            print(f"{marker} {name:<16}{metric:<8}{base[metric]:>10} -> {stats[metric]:<10} ({change:+.1f}%)")
+        if stats["error_rate"] > base["error_rate"] + 0.01:
+            ok = False
+            print(f"❌ {name:<16}error rate {base['error_rate']:.2%} -> {stats['error_rate']:.2%}")
+    return ok
+
+
+def parse_mix(value: Optional[str]) -> Dict[str, int]:
+    """Parse 'dashboard=10,list_jobs=5' overrides onto the default mix."""
+    mix = dict(DEFAULT_MIX)
+    if value:
+        for part in value.split(","):
+            name, weight = part.split("=")
+            if name not in DEFAULT_MIX:
+                raise argparse.ArgumentTypeError(f"Unknown workload: {name}")
+            mix[name] = int(weight)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--start-local", action="store_true", help="start a throwaway mongod + uvicorn")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers with --start-local")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin")
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(None), help="e.g. dashboard=20,upload=0")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--output", type=Path, help="write the JSON result here")
+    parser.add_argument("--compare", type=Path, help="baseline JSON result to compare against")
+    parser.add_argument("--threshold", type=float, default=10, help="allowed p95/p99 regression in percent")
+    args = parser.parse_args()
+
+    stack = None
+    if args.start_local:
+        stack = LocalStack(workers=args.workers)
+        stack.start()
+    try:
+        tester = LoadTester(stack.base_url if stack else args.base_url, args.username, args.password,
+                            args.users, args.duration, args.mix, args.seed, args.timeout)
+        result = asyncio.run(tester.run())
+    finally:
+        if stack:
+            stack.stop()
+
+    print_report(result)
+    if args.output:
+        args.output.write_text(json.dumps(result, indent=2))
+        print(f"\n💾 Results written to {args.output}")
+    if args.compare:
+        return 0 if compare(result, json.loads(args.compare.read_text()), args.threshold) else 1
+    return 0 if result["total"]["error_rate"] < 0.01 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
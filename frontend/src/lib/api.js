@@ -6,6 +6,16 @@ const api = axios.create({
   baseURL: `${API_URL}/api`,
 });
 
+const randomHex = (bytes) =>
+  Array.from(crypto.getRandomValues(new Uint8Array(bytes)), (b) => b.toString(16).padStart(2, '0')).join('');
+
+// W3C trace context. The backend samples on its own unless tracing is forced
+// for this browser with localStorage.setItem('traceRequests', '1').
+const traceparent = () => {
+  const flags = localStorage.getItem('traceRequests') === '1' ? '01' : '00';
+  return `00-${randomHex(16)}-${randomHex(8)}-${flags}`;
+};
+
 // Add token to requests
 api.interceptors.request.use(
   (config) => {
@@ -13,6 +23,7 @@ api.interceptors.request.use(
     if (token) {
       config.headers.Authorization = `Bearer ${token}`;
     }
+    config.headers.traceparent = traceparent();
     return config;
   },
   (error) => Promise.reject(error)
@@ -30,4 +41,65 @@ api.interceptors.response.use(
   }
 );
 
+// Fetch several API paths (relative to /api) in one round trip. Resolves to
+// their response bodies in order, or rejects with the first failed item.
+export const batchGet = async (paths) => {
+  const { data } = await api.post('/batch', {
+    requests: paths.map((path) => ({ path: `/api${path}` })),
+  });
+  const failed = data.results.find((result) => result.status >= 400);
+  if (failed) {
+    const error = new Error(failed.body?.detail || `Batched request failed with ${failed.status}`);
+    error.response = { status: failed.status, data: failed.body };
+    throw error;
+  }
+  return data.results.map((result) => result.body);
+};
+
+// Subscribe to the server's live change feed. `handlers` maps event types
+// (e.g. 'job.created') to callbacks; 'resync' fires when missed events could
+// not be replayed and the caller should refetch. Returns an unsubscribe function.
+export const subscribeToEvents = (handlers) => {
+  const types = Object.keys(handlers).filter((type) => type !== 'resync').join(',');
+  let source = null;
+  let lastEventId = '';
+  let retryTimer = null;
+  let closed = false;
+
+  // EventSource cannot send an Authorization header, so each connection opens
+  // with a short-lived ticket instead of the login token (which would land in
+  // access logs). The browser's own reconnect would reuse an expired ticket,
+  // so reconnects go through here and resume from the last event received.
+  const connect = async () => {
+    let ticket;
+    try {
+      ({ data: { ticket } } = await api.post('/events/ticket'));
+    } catch (error) {
+      if (!closed) retryTimer = setTimeout(connect, 3000);
+      return;
+    }
+    if (closed) return;
+    const params = new URLSearchParams({ types, ticket });
+    if (lastEventId) params.set('last_event_id', lastEventId);
+    source = new EventSource(`${API_URL}/api/events?${params}`);
+    Object.entries(handlers).forEach(([type, handler]) => {
+      source.addEventListener(type, (event) => {
+        if (event.lastEventId) lastEventId = event.lastEventId;
+        handler(JSON.parse(event.data));
+      });
+    });
+    source.onerror = () => {
+      source.close();
+      if (!closed) retryTimer = setTimeout(connect, 3000);
+    };
+  };
+
+  connect();
+  return () => {
+    closed = true;
+    clearTimeout(retryTimer);
+    if (source) source.close();
+  };
+};
+
 export default api;
\ No newline at end of file
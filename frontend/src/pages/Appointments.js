@@ -20,7 +20,7 @@ import {
   SelectTrigger,
   SelectValue,
 } from '../components/ui/select';
-import api from '../lib/api';
+import api, { subscribeToEvents } from '../lib/api';
 import { toast } from 'sonner';
 import { formatDate } from '../lib/utils';
 import { Calendar, Clock, Plus, User, Car, Check, X, Trash2 } from 'lucide-react';
@@ -43,6 +43,18 @@ export default function Appointments() {
 
   useEffect(() => {
     fetchData();
+    return subscribeToEvents({
+      'appointment.status_changed': (change) => {
+        setAppointments((current) =>
+          current.map((appointment) =>
+            appointment.id === change.id ? { ...appointment, status: change.status } : appointment
+          )
+        );
+      },
+      'appointment.created': fetchData,
+      'appointment.deleted': fetchData,
+      resync: fetchData,
+    });
   }, []);
 
   const fetchData = async () => {
@@ -12,7 +12,7 @@ import {
   DialogHeader,
   DialogTitle,
 } from '../components/ui/dialog';
-import api from '../lib/api';
+import api, { batchGet } from '../lib/api';
 import { toast } from 'sonner';
 import { formatDate } from '../lib/utils';
 import {
@@ -54,12 +54,12 @@ export default function CustomerDetail() {
 
   const fetchCustomerData = async () => {
     try {
-      const [customerRes, vehiclesRes] = await Promise.all([
-        api.get(`/customers/${customerId}`),
-        api.get(`/vehicles?customer_id=${customerId}`),
+      const [customerData, vehiclesData] = await batchGet([
+        `/customers/${customerId}`,
+        `/vehicles?customer_id=${customerId}`,
       ]);
-      setCustomer(customerRes.data);
-      setVehicles(vehiclesRes.data);
+      setCustomer(customerData);
+      setVehicles(vehiclesData);
     } catch (error) {
       console.error('Failed to fetch customer data:', error);
       toast.error('Failed to load customer details');
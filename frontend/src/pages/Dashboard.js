@@ -2,7 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
 import DashboardLayout from '../components/DashboardLayout';
 import { Card } from '../components/ui/card';
-import api from '../lib/api';
+import api, { subscribeToEvents } from '../lib/api';
 import { formatDate, formatCurrency } from '../lib/utils';
 import { useAuth } from '../contexts/AuthContext';
 import {
@@ -24,6 +24,12 @@ export default function Dashboard() {
 
   useEffect(() => {
     fetchStats();
+    // Refresh only when something the dashboard shows has changed
+    return subscribeToEvents({
+      'job.created': fetchStats,
+      'billing.paid': fetchStats,
+      resync: fetchStats,
+    });
   }, []);
 
   const fetchStats = async () => {
@@ -22,27 +22,18 @@ export default function Reminders() {
 
   const fetchReminders = async () => {
     try {
-      const remindersRes = await api.get(`/reminders${filter !== 'all' ? `?status=${filter}` : ''}`);
+      const params = new URLSearchParams({ expand: 'customer,vehicle' });
+      if (filter !== 'all') params.set('status', filter);
+      const remindersRes = await api.get(`/reminders?${params}`);
       const remindersData = remindersRes.data;
       setReminders(remindersData);
 
-      // Fetch vehicles and customers for reminders
-      const vehicleIds = [...new Set(remindersData.map(r => r.vehicle_id))];
-      const customerIds = [...new Set(remindersData.map(r => r.customer_id))];
-
-      const [vehiclesRes, customersRes] = await Promise.all([
-        Promise.all(vehicleIds.map(id => api.get(`/vehicles/${id}`).catch(() => null))),
-        Promise.all(customerIds.map(id => api.get(`/customers/${id}`).catch(() => null))),
-      ]);
-
+      // Vehicles and customers arrive embedded in each reminder
       const vehiclesMap = {};
-      vehiclesRes.forEach(res => {
-        if (res?.data) vehiclesMap[res.data.id] = res.data;
-      });
-
       const customersMap = {};
-      customersRes.forEach(res => {
-        if (res?.data) customersMap[res.data.id] = res.data;
+      remindersData.forEach(r => {
+        if (r.vehicle) vehiclesMap[r.vehicle.id] = r.vehicle;
+        if (r.customer) customersMap[r.customer.id] = r.customer;
       });
 
       setVehicles(vehiclesMap);
@@ -32,12 +32,17 @@ import {
   Trash2
 } from 'lucide-react';
 
+// Jobs fetched per timeline page
+const JOBS_PAGE_SIZE = 20;
+
 export default function VehicleDetail() {
   const { vehicleId } = useParams();
   const navigate = useNavigate();
   const [vehicle, setVehicle] = useState(null);
   const [customer, setCustomer] = useState(null);
   const [jobs, setJobs] = useState([]);
+  const [totalJobs, setTotalJobs] = useState(0);
+  const [loadingMoreJobs, setLoadingMoreJobs] = useState(false);
   const [tuneRevisions, setTuneRevisions] = useState([]);
   const [loading, setLoading] = useState(true);
   const [revisionDialogOpen, setRevisionDialogOpen] = useState(false);
@@ -86,18 +91,16 @@ export default function VehicleDetail() {
 
   const fetchVehicleData = async () => {
     try {
-      const vehicleRes = await api.get(`/vehicles/${vehicleId}`);
-      const vehicleData = vehicleRes.data;
-      setVehicle(vehicleData);
-
-      const [customerRes, jobsRes, revisionsRes] = await Promise.all([
-        api.get(`/customers/${vehicleData.customer_id}`),
-        api.get(`/jobs?vehicle_id=${vehicleId}`),
+      // Vehicle, owner and the newest jobs in one request; revisions cover
+      // every job, not just the ones on the first page
+      const [{ data }, revisionsRes] = await Promise.all([
+        api.get(`/vehicles/${vehicleId}/timeline?limit=${JOBS_PAGE_SIZE}&include_qr=true`),
         api.get(`/tune-revisions?vehicle_id=${vehicleId}`),
       ]);
-
-      setCustomer(customerRes.data);
-      setJobs(jobsRes.data);
+      setVehicle(data.vehicle);
+      setCustomer(data.customer);
+      setJobs(data.jobs);
+      setTotalJobs(data.total_jobs);
       setTuneRevisions(revisionsRes.data);
     } catch (error) {
       console.error('Failed to fetch vehicle data:', error);
@@ -107,6 +110,33 @@ export default function VehicleDetail() {
     }
   };
 
+  // Start the job list again from the newest page, e.g. after an edit
+  const refreshJobs = async () => {
+    const { data } = await api.get(`/vehicles/${vehicleId}/timeline?limit=${JOBS_PAGE_SIZE}`);
+    setJobs(data.jobs);
+    setTotalJobs(data.total_jobs);
+  };
+
+  const handleLoadMoreJobs = async () => {
+    setLoadingMoreJobs(true);
+    try {
+      const { data } = await api.get(
+        `/vehicles/${vehicleId}/timeline?skip=${jobs.length}&limit=${JOBS_PAGE_SIZE}`
+      );
+      // A job created meanwhile shifts the pages; skip any already shown
+      setJobs((loaded) => {
+        const seen = new Set(loaded.map((job) => job.id));
+        return [...loaded, ...data.jobs.filter((job) => !seen.has(job.id))];
+      });
+      setTotalJobs(data.total_jobs);
+    } catch (error) {
+      console.error('Failed to load more jobs:', error);
+      toast.error('Failed to load more jobs');
+    } finally {
+      setLoadingMoreJobs(false);
+    }
+  };
+
   const handleCopyQR = () => {
     if (vehicle?.qr_code) {
       toast.success('QR code image copied to clipboard');
@@ -227,8 +257,7 @@ export default function VehicleDetail() {
       });
 
       // Refresh jobs
-      const jobsRes = await api.get(`/jobs?vehicle_id=${vehicleId}`);
-      setJobs(jobsRes.data);
+      await refreshJobs();
     } catch (error) {
       console.error('Failed to update job:', error);
       toast.error('Failed to update job');
@@ -245,11 +274,10 @@ export default function VehicleDetail() {
       toast.success('Job deleted successfully');
       
       // Refresh jobs and tune revisions
-      const [jobsRes, revisionsRes] = await Promise.all([
-        api.get(`/jobs?vehicle_id=${vehicleId}`),
+      const [, revisionsRes] = await Promise.all([
+        refreshJobs(),
         api.get(`/tune-revisions?vehicle_id=${vehicleId}`)
       ]);
-      setJobs(jobsRes.data);
       setTuneRevisions(revisionsRes.data);
     } catch (error) {
       console.error('Failed to delete job:', error);
@@ -317,6 +345,10 @@ export default function VehicleDetail() {
 
   const generatePDF = async () => {
     try {
+      // The report covers the whole history, not just the pages loaded so far
+      const allJobs = jobs.length < totalJobs
+        ? (await api.get(`/jobs?vehicle_id=${vehicleId}`)).data
+        : jobs;
       const doc = new jsPDF();
       const pageWidth = doc.internal.pageSize.getWidth();
       const pageHeight = doc.internal.pageSize.getHeight();
@@ -465,16 +497,16 @@ export default function VehicleDetail() {
       }
 
       // Job History
-      if (jobs.length > 0) {
+      if (allJobs.length > 0) {
         checkNewPage(30);
 
         doc.setFontSize(14);
         doc.setFont('helvetica', 'bold');
         doc.setTextColor(245, 158, 11);
-        doc.text(`Job History (${jobs.length})`, margin, yPos);
+        doc.text(`Job History (${allJobs.length})`, margin, yPos);
         yPos += 10;
 
-        jobs.forEach((job, index) => {
+        allJobs.forEach((job, index) => {
           checkNewPage(40);
 
           // Job Header
@@ -852,7 +884,7 @@ export default function VehicleDetail() {
             {/* Job History Timeline */}
             <div>
               <h2 className="font-heading text-2xl font-bold text-white tracking-tight mb-4">
-                Job History ({jobs.length})
+                Job History ({totalJobs})
               </h2>
               {jobs.length > 0 ? (
                 <div className="space-y-4">
@@ -999,6 +1031,17 @@ export default function VehicleDetail() {
                       </div>
                     </Card>
                   ))}
+                  {jobs.length < totalJobs && (
+                    <Button
+                      variant="outline"
+                      onClick={handleLoadMoreJobs}
+                      disabled={loadingMoreJobs}
+                      data-testid="load-more-jobs-button"
+                      className="w-full border-zinc-700 text-zinc-300 hover:bg-zinc-800"
+                    >
+                      {loadingMoreJobs ? 'Loading...' : `Load more jobs (${totalJobs - jobs.length} older)`}
+                    </Button>
+                  )}
                 </div>
               ) : (
                 <Card className="bg-zinc-900/50 border-zinc-800 p-12 text-center">